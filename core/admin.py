@@ -1,26 +1,123 @@
 # core/admin.py
 
-from django.contrib import admin
-from django.utils.html import format_html
+import datetime
+
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Now
+from django.http import StreamingHttpResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
+from .cache import bump_content_version
+from .forms import SubscriberImportForm
+from .newsletter_csv import export_rows, queue_import
+from .popularity import decayed
 from .models import (
     NewsletterSubscriber,
+    Campaign,
+    Delivery,
     Experience,
     NowItem,
     Skill,
     Article,
+    ArticleViewDay,
     GalleryItem,
     RecentActivity,
     Resume,
-    ContactMessage
+    ContactMessage,
+    Job,
+    Tag,
+    normalize_tag,
 )
 
 
+# Window of the article view trend
+TREND_DAYS = datetime.timedelta(days=7)
+
+
+def is_changelist(request):
+    """True when the admin request is for a model's list page"""
+    match = request.resolver_match
+    return bool(match and match.url_name and match.url_name.endswith('_changelist'))
+
+
 @admin.register(NewsletterSubscriber)
 class NewsletterSubscriberAdmin(admin.ModelAdmin):
     list_display = ['email', 'subscribed_at', 'is_active']
     list_filter = ['is_active', 'subscribed_at']
     search_fields = ['email']
     date_hierarchy = 'subscribed_at'
+    change_list_template = 'admin/core/newslettersubscriber/change_list.html'
+    actions = ['export_csv']
+    
+    def get_urls(self):
+        return [
+            path(
+                'import/',
+                self.admin_site.admin_view(self.import_csv),
+                name='core_newslettersubscriber_import',
+            ),
+        ] + super().get_urls()
+    
+    def export_csv(self, request, queryset):
+        response = StreamingHttpResponse(export_rows(queryset.order_by('id')), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="subscribers-{timezone.localdate()}.csv"'
+        return response
+    export_csv.short_description = "Export selected subscribers as CSV"
+    
+    def import_csv(self, request):
+        """Queue the import of an uploaded CSV (see core.newsletter_csv)"""
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = SubscriberImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            job = queue_import(form.cleaned_data['csv_file'])
+            self.message_user(request, (
+                f"Import queued as job {job.pk}. Subscribers are added once the worker (runworker) has run it; "
+                f"its log has the counts."
+            ), messages.SUCCESS)
+            return redirect('admin:core_newslettersubscriber_changelist')
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Import subscribers',
+            'opts': self.model._meta,
+            'form': form,
+        }
+        return TemplateResponse(request, 'admin/core/newslettersubscriber/import.html', context)
+
+
+@admin.register(Campaign)
+class CampaignAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'status', 'delivery_progress', 'created_at', 'finished_at']
+    list_filter = ['status']
+    search_fields = ['subject']
+    readonly_fields = ['status', 'delivery_progress', 'started_at', 'finished_at']
+    fieldsets = (
+        (None, {
+            'fields': ('subject', 'body_text', 'body_html'),
+        }),
+        ('Delivery', {
+            'fields': ('status', 'delivery_progress', 'started_at', 'finished_at'),
+            'description': 'Send with: python manage.py send_campaign &lt;id&gt;. Running it again resumes.',
+        }),
+    )
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            delivered=Count('deliveries', filter=Q(deliveries__status=Delivery.SENT)),
+            undelivered=Count('deliveries', filter=Q(deliveries__status=Delivery.FAILED)),
+            recipients=Count('deliveries'),
+        )
+    
+    def delivery_progress(self, obj):
+        if obj.pk is None or not obj.recipients:
+            return '-'
+        return f'{obj.delivered} / {obj.recipients} sent, {obj.undelivered} failed'
+    delivery_progress.short_description = 'Progress'
 
 
 @admin.register(Experience)
@@ -31,6 +128,12 @@ class ExperienceAdmin(admin.ModelAdmin):
     ordering = ['-start_date']
     list_editable = ['order']
     
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if is_changelist(request):
+            queryset = queryset.listing()
+        return queryset
+    
     fieldsets = (
         ('Basic Information', {
             'fields': ('type', 'title', 'organization', 'location')
@@ -86,14 +189,28 @@ class ArticleAdmin(admin.ModelAdmin):
         'published_date', 
         'read_time',
         'is_featured',
+        'views',
+        'views_last_week',
         'view_count'
     ]
     list_filter = ['status', 'article_type', 'is_featured', 'published_date']
+    readonly_fields = ['views', 'view_trend', 'popularity_score']
     search_fields = ['title', 'excerpt', 'content']
     prepopulated_fields = {'slug': ('title',)}
     date_hierarchy = 'published_date'
     list_editable = ['is_featured']
     
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        # The changelist only shows metadata; keep essay bodies out of it
+        if is_changelist(request):
+            # A subquery rather than a join, so the outer query needs no GROUP BY
+            week = ArticleViewDay.objects.filter(
+                article=OuterRef('pk'), date__gt=timezone.localdate() - TREND_DAYS,
+            ).values('article').annotate(total=Sum('views')).values('total')
+            queryset = queryset.listing().annotate(views_week=Coalesce(Subquery(week), 0))
+        return queryset
+    
     fieldsets = (
         ('Basic Information', {
             'fields': ('title', 'slug', 'article_type', 'status')
@@ -118,6 +235,10 @@ class ArticleAdmin(admin.ModelAdmin):
         ('Publishing', {
             'fields': ('published_date', 'is_featured'),
         }),
+        ('Statistics', {
+            'fields': ('views', 'view_trend', 'popularity_score'),
+            'description': 'Counted per worker and written every few seconds, so recent views may be missing',
+        }),
     )
     
     def article_type_badge(self, obj):
@@ -152,6 +273,36 @@ class ArticleAdmin(admin.ModelAdmin):
         )
     status_badge.short_description = 'Status'
     
+    def views_last_week(self, obj):
+        return obj.views_week
+    views_last_week.short_description = 'Last 7 days'
+    views_last_week.admin_order_field = 'views_week'
+    
+    def view_trend(self, obj):
+        """Bar per day for the last week, newest on the right"""
+        if obj.pk is None:
+            return '-'
+        today = timezone.localdate()
+        days = [today - datetime.timedelta(days=offset) for offset in range(TREND_DAYS.days - 1, -1, -1)]
+        counts = dict(obj.view_days.filter(date__gte=days[0]).values_list('date', 'views'))
+        peak = max(counts.values(), default=0) or 1
+        return format_html(
+            '<div style="display: flex; align-items: flex-end; gap: 4px; height: 60px;">{}</div>',
+            format_html_join('', (
+                '<div title="{}: {}" style="width: 18px; height: {}%; min-height: 1px; '
+                'background: #3b82f6; border-radius: 2px;"></div>'
+            ), (
+                (day.strftime('%a %d %b'), counts.get(day, 0), round(100 * counts.get(day, 0) / peak))
+                for day in days
+            )),
+        )
+    view_trend.short_description = 'Last 7 days'
+    
+    def popularity_score(self, obj):
+        return f'{decayed(obj.popularity):.1f}'
+    popularity_score.short_description = 'Popularity'
+    popularity_score.help_text = 'Views, each counting half as much per half-life of age (update_popularity)'
+    
     def view_count(self, obj):
         return format_html(
             '<a href="{}" target="_blank">View →</a>',
@@ -169,17 +320,21 @@ class ArticleAdmin(admin.ModelAdmin):
     actions = ['make_published', 'make_draft', 'make_featured']
     
     def make_published(self, request, queryset):
-        updated = queryset.update(status='published')
+        # Keep the first publication date; the essays listing sorts by it
+        updated = queryset.update(status='published', published_date=Coalesce('published_date', Now()))
+        bump_content_version()  # update() sends no post_save
         self.message_user(request, f'{updated} article(s) published.')
     make_published.short_description = "Publish selected articles"
     
     def make_draft(self, request, queryset):
         updated = queryset.update(status='draft')
+        bump_content_version()  # update() sends no post_save
         self.message_user(request, f'{updated} article(s) marked as draft.')
     make_draft.short_description = "Mark as draft"
     
     def make_featured(self, request, queryset):
         updated = queryset.update(is_featured=True)
+        bump_content_version()  # update() sends no post_save
         self.message_user(request, f'{updated} article(s) marked as featured.')
     make_featured.short_description = "Mark as featured"
 
@@ -336,6 +491,55 @@ class ContactMessageAdmin(admin.ModelAdmin):
     mark_as_unread.short_description = "Mark selected as unread"
 
 
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ['name', 'key']
+    search_fields = ['name', 'key']
+    readonly_fields = ['key']
+    
+    def save_model(self, request, obj, form, change):
+        obj.key = normalize_tag(obj.name)
+        super().save_model(request, obj, form, change)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'status_badge', 'attempts', 'run_after', 'locked_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'kind']
+    search_fields = ['kind', 'last_error']
+    date_hierarchy = 'created_at'
+    readonly_fields = [
+        'kind', 'payload', 'status', 'attempts', 'max_attempts', 'run_after',
+        'last_error', 'locked_by', 'locked_at', 'created_at', 'finished_at',
+    ]
+    actions = ['retry_jobs']
+    
+    def has_add_permission(self, request):
+        return False  # Jobs are enqueued by the app
+    
+    def status_badge(self, obj):
+        colors = {
+            Job.PENDING: '#6b7280',
+            Job.RUNNING: '#3b82f6',
+            Job.DONE: '#10b981',
+            Job.FAILED: '#ef4444',
+        }
+        return format_html(
+            '<span style="background-color: {}; color: white; padding: 3px 10px; '
+            'border-radius: 3px; font-size: 11px;">{}</span>',
+            colors.get(obj.status, '#6b7280'),
+            obj.get_status_display()
+        )
+    status_badge.short_description = 'Status'
+    
+    def retry_jobs(self, request, queryset):
+        updated = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.PENDING, attempts=0, run_after=timezone.now(), finished_at=None,
+        )
+        self.message_user(request, f'{updated} job(s) queued again.')
+    retry_jobs.short_description = "Retry selected jobs now"
+
+
 # ============================================
 # ADMIN SITE CUSTOMIZATION
 # ============================================
@@ -6,5 +6,13 @@ class CoreConfig(AppConfig):
     name = 'core'
 
     def ready(self):
-        """Import signals when app is ready"""
+        """Import signals and background job handlers when app is ready"""
         import core.signals
+        import core.tasks
+        from PIL import Image
+        from core.images import pixel_limit
+        # Pillow refuses images over twice this before open_checked can;
+        # follow IMAGE_MAX_PIXELS so it can be set above Pillow's default
+        Image.MAX_IMAGE_PIXELS = pixel_limit()
+        from core.counters import install_shutdown_flush
+        install_shutdown_flush()
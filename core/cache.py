@@ -0,0 +1,386 @@
+"""
+HTTP caching for public pages
+
+Full-page cache for anonymous visitors: cache keys embed a global content
+version. Any save/delete of a model that feeds the public pages bumps the
+version (see core.signals), so every cached page is invalidated at once
+without tracking which page shows which row. Old entries simply expire.
+CSRF tokens are stored as a placeholder and filled in per request, so a
+page rendered for one visitor never leaks its token to another.
+
+Conditional GET: `conditional_page` answers If-None-Match/If-Modified-Since
+with 304 from a row timestamp plus the content and template versions,
+before the view renders anything.
+
+Stale-while-revalidate: `stale_while_revalidate` keeps serving an expired
+copy while a single background thread re-renders it, so a traffic spike
+never makes every worker render the same page at once. A copy rendered
+before the last content edit is never served: it may show an essay that
+has since been unpublished or deleted.
+"""
+import copy
+import datetime
+import hashlib
+import logging
+import re
+import threading
+import time
+from functools import lru_cache, wraps
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.db import close_old_connections
+from django.http import Http404, HttpResponse
+from django.middleware.csrf import get_token
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+
+CONTENT_VERSION_KEY = 'core:content-version'
+CONTENT_MODIFIED_KEY = 'core:content-modified'
+
+logger = logging.getLogger(__name__)
+
+CSRF_PLACEHOLDER = '__CSRF_TOKEN__'
+CSRF_INPUT_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def page_cache():
+    return caches[getattr(settings, 'PAGE_CACHE_ALIAS', 'default')]
+
+
+def get_content_version():
+    """
+    Current content version
+
+    A cache may drop the counter at any time (FileBasedCache culls entries
+    at random once MAX_ENTRIES is reached, whatever their timeout). It is
+    re-seeded from the clock rather than from 1, so it never comes back to
+    a value that cached pages, microcache entries or ETags still carry.
+    """
+    cache = page_cache()
+    version = cache.get(CONTENT_VERSION_KEY)
+    if version is None:
+        seed = time.time_ns()
+        cache.add(CONTENT_VERSION_KEY, seed, timeout=None)
+        version = cache.get(CONTENT_VERSION_KEY, seed)
+    return version
+
+
+def bump_content_version():
+    """Invalidate every cached page; call after edits that skip signals"""
+    cache = page_cache()
+    cache.set(CONTENT_MODIFIED_KEY, timezone.now().timestamp(), timeout=None)
+    try:
+        return cache.incr(CONTENT_VERSION_KEY)
+    except ValueError:
+        # Key missing (first edit, or evicted): re-seed as get_content_version does
+        cache.add(CONTENT_VERSION_KEY, time.time_ns(), timeout=None)
+        return cache.incr(CONTENT_VERSION_KEY)
+
+
+def get_content_modified():
+    """When the content version was last bumped, or None if never"""
+    timestamp = page_cache().get(CONTENT_MODIFIED_KEY)
+    if timestamp is None:
+        return None
+    return datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc)
+
+
+@lru_cache(maxsize=None)
+def template_version():
+    """
+    Fingerprint of the project templates, computed once per process
+
+    Deploys restart the workers, so a template change yields new ETags.
+    """
+    digest = hashlib.md5()
+    for directory in settings.TEMPLATES[0]['DIRS']:
+        for path in sorted(Path(directory).rglob('*.html')):
+            stat = path.stat()
+            digest.update(f'{path}:{stat.st_mtime_ns}:{stat.st_size}'.encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+
+def page_cache_key(request, prefix='page'):
+    path = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+    return f'{prefix}:{get_content_version()}:{request.method}:{path}'
+
+
+def is_anonymous_get(request):
+    """
+    GET/HEAD from a visitor with no session and no pending flash messages
+
+    Checks the session cookie rather than request.user so a cache hit
+    never has to load the session.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if settings.SESSION_COOKIE_NAME in request.COOKIES:
+        return False
+    return not len(get_messages(request))
+
+
+def is_cacheable_response(response):
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    cache_control = response.get('Cache-Control', '')
+    return 'private' not in cache_control and 'no-store' not in cache_control
+
+
+def freeze_response(response):
+    """Cacheable copy of a response, with CSRF tokens swapped for a placeholder"""
+    content = response.content.decode(response.charset)
+    content = CSRF_INPUT_RE.sub(rf'\g<1>{CSRF_PLACEHOLDER}\g<2>', content)
+    return {
+        'content': content,
+        'content_type': response['Content-Type'],
+    }
+
+
+def thaw_response(request, entry):
+    """Rebuild a response from a cache entry for this request"""
+    content = entry['content']
+    if CSRF_PLACEHOLDER in content:
+        content = content.replace(CSRF_PLACEHOLDER, get_token(request))
+    return HttpResponse(content, content_type=entry['content_type'])
+
+
+def cache_public_page(view=None, timeout=None):
+    """
+    Cache a view's rendered page for anonymous GETs until content changes
+
+        @cache_public_page
+        def about(request): ...
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not is_anonymous_get(request):
+                return view(request, *args, **kwargs)
+
+            cache = page_cache()
+            key = page_cache_key(request)
+            entry = cache.get(key)
+            if entry is not None:
+                response = thaw_response(request, entry)
+                response['X-Page-Cache'] = 'hit'
+                return response
+
+            response = view(request, *args, **kwargs)
+            if is_cacheable_response(response):
+                cache.set(
+                    key,
+                    freeze_response(response),
+                    timeout if timeout is not None else getattr(settings, 'PAGE_CACHE_TIMEOUT', 3600),
+                )
+                response['X-Page-Cache'] = 'miss'
+            return response
+        return wrapper
+
+    if view is not None:
+        return decorator(view)
+    return decorator
+
+
+def content_etag(request, *args, **kwargs):
+    """
+    ETag for a response that depends only on its URL and the content version
+
+        @condition(etag_func=content_etag)
+        def gallery_api(request): ...
+    """
+    source = f'{request.get_full_path()}:{get_content_version()}'
+    return hashlib.md5(source.encode('utf-8')).hexdigest()
+
+
+def conditional_page(timestamp_func):
+    """
+    ETag/Last-Modified validators for a detail view
+
+    `timestamp_func(request, *args, **kwargs)` returns the updated_at of the
+    row the page is about (one indexed query), or None if there is no such
+    row, in which case the view runs normally and 404s. The lookup is
+    shared by the ETag and Last-Modified checks.
+
+        @conditional_page(article_timestamp)
+        def article_detail(request, slug): ...
+
+    A stale copy from an inner stale_while_revalidate predates the row the
+    validators describe, so it goes out without them.
+    """
+    def lookup(request, *args, **kwargs):
+        cached = getattr(request, '_conditional_timestamp', None)
+        if cached is None:
+            # Skip validators when flash messages are waiting to be shown
+            timestamp = None
+            if not len(get_messages(request)):
+                timestamp = timestamp_func(request, *args, **kwargs)
+            cached = request._conditional_timestamp = (timestamp,)
+        return cached[0]
+
+    def etag(request, *args, **kwargs):
+        timestamp = lookup(request, *args, **kwargs)
+        if timestamp is None:
+            return None
+        source = f'{timestamp.isoformat()}:{get_content_version()}:{template_version()}'
+        return hashlib.md5(source.encode('utf-8')).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        timestamp = lookup(request, *args, **kwargs)
+        if timestamp is None:
+            return None
+        # Pages also show other rows (related items, experience lists)
+        content_modified = get_content_modified()
+        if content_modified and content_modified > timestamp:
+            return content_modified
+        return timestamp
+
+    def decorator(view):
+        conditional = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            if response.get('X-Microcache') == 'stale':
+                response.headers.pop('ETag', None)
+                response.headers.pop('Last-Modified', None)
+            return response
+        return wrapper
+    return decorator
+
+
+class MicrocacheStats:
+    """Per-process counters for stale_while_revalidate views"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, name, outcome=None, duration=None):
+        """Count a served response (outcome) and/or a render that took duration seconds"""
+        with self._lock:
+            stats = self._views.setdefault(name, {
+                'fresh': 0,
+                'stale': 0,
+                'miss': 0,
+                'regenerations': 0,
+                'regeneration_ms_total': 0.0,
+                'regeneration_ms_max': 0.0,
+            })
+            if outcome is not None:
+                stats[outcome] += 1
+            if duration is not None:
+                ms = duration * 1000
+                stats['regenerations'] += 1
+                stats['regeneration_ms_total'] += ms
+                stats['regeneration_ms_max'] = max(stats['regeneration_ms_max'], ms)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._views.items()}
+
+
+microcache_stats = MicrocacheStats()
+
+
+def stale_while_revalidate(soft_ttl=30, hard_ttl=600, name=None):
+    """
+    Microcache a view for anonymous GETs with a soft and a hard TTL
+
+    - younger than soft_ttl: served as is
+    - older: served stale, and whichever request wins the lock re-renders
+      it in a background thread
+    - older than hard_ttl (evicted), never rendered, or rendered before
+      the last content edit: rendered inline
+
+    A render that is not a cacheable 200 or raises (the row is gone, or no
+    longer published) drops the cached copy instead of leaving it to be
+    served.
+
+        @stale_while_revalidate(soft_ttl=30, hard_ttl=600)
+        def home(request): ...
+    """
+    def decorator(view):
+        view_name = name or view.__name__
+
+        def render(request, args, kwargs):
+            started = time.perf_counter()
+            response = view(request, *args, **kwargs)
+            return response, time.perf_counter() - started
+
+        def store(key, response):
+            if not is_cacheable_response(response):
+                page_cache().delete(key)
+                return
+            entry = freeze_response(response)
+            entry['created'] = time.time()
+            entry['version'] = get_content_version()
+            page_cache().set(key, entry, hard_ttl)
+
+        def regenerate(request, key, lock_key, args, kwargs):
+            try:
+                response, duration = render(request, args, kwargs)
+                store(key, response)
+                microcache_stats.record(view_name, duration=duration)
+                stats = microcache_stats.snapshot()[view_name]
+                logger.info(
+                    'Regenerated %s in %.1fms (stale served %d, regenerations %d, max %.1fms)',
+                    view_name, duration * 1000, stats['stale'], stats['regenerations'],
+                    stats['regeneration_ms_max'],
+                )
+            except Exception as exc:
+                page_cache().delete(key)
+                if not isinstance(exc, Http404):
+                    logger.exception('Background regeneration of %s failed', view_name)
+            finally:
+                page_cache().delete(lock_key)
+                close_old_connections()
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not is_anonymous_get(request):
+                return view(request, *args, **kwargs)
+
+            cache = page_cache()
+            # Unversioned key: the render after an edit replaces the old copy
+            path = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+            key = f'swr:{view_name}:{request.method}:{path}'
+            entry = cache.get(key)
+
+            if entry is None or entry['version'] != get_content_version():
+                response, duration = render(request, args, kwargs)
+                store(key, response)
+                microcache_stats.record(view_name, 'miss', duration)
+                response['X-Microcache'] = 'miss'
+                return response
+
+            response = thaw_response(request, entry)
+
+            if time.time() - entry['created'] < soft_ttl:
+                microcache_stats.record(view_name, 'fresh')
+                response['X-Microcache'] = 'fresh'
+                return response
+
+            microcache_stats.record(view_name, 'stale')
+            response['X-Microcache'] = 'stale'
+            # Browsers must not keep the outdated copy; next time they ask again
+            patch_cache_control(response, no_cache=True)
+
+            # Single flight: only the request that wins the lock re-renders
+            lock_key = f'{key}:lock'
+            if cache.add(lock_key, 1, timeout=max(int(soft_ttl), 10)):
+                background_request = copy.copy(request)
+                background_request.META = request.META.copy()
+                threading.Thread(
+                    target=regenerate,
+                    args=(background_request, key, lock_key, args, kwargs),
+                    name='microcache-regenerate',
+                    daemon=True,
+                ).start()
+            return response
+        return wrapper
+    return decorator
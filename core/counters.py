@@ -0,0 +1,154 @@
+"""
+Buffered article view counters
+
+Counting a view with an UPDATE per request would take SQLite's write lock
+on every page load. Instead each process adds hits to an in-memory buffer
+and writes them in one transaction: when ARTICLE_VIEWS_FLUSH_HITS hits
+have piled up, every ARTICLE_VIEWS_FLUSH_INTERVAL seconds from a
+background thread, and at exit (atexit, plus SIGTERM when nothing else
+handles it). Totals read from Article.views and ArticleViewDay are
+therefore up to one interval behind, and reading them never waits on a
+writer.
+
+    @count_article_view
+    def article_detail(request, slug): ...
+
+Hits are buffered by slug, so counting a page served from the page cache
+costs no query; slugs are resolved to published articles when flushing.
+"""
+import atexit
+import logging
+import signal
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .models import Article, ArticleViewDay
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    """Per-process buffer of article views, keyed by (slug, day)"""
+
+    def __init__(self):
+        # Reentrant: the SIGTERM handler may flush while the main thread is in hit()
+        self._lock = threading.RLock()
+        self._pending = Counter()
+        self._hits = 0
+        self._flusher = None
+
+    def hit(self, slug):
+        with self._lock:
+            self._pending[(slug, timezone.localdate())] += 1
+            self._hits += 1
+            due = self._hits >= getattr(settings, 'ARTICLE_VIEWS_FLUSH_HITS', 100)
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._flush_periodically, name='article-view-flusher', daemon=True,
+                )
+                self._flusher.start()
+        if due:
+            self.flush()
+
+    def pending(self):
+        """Hits not yet written, as {(slug, day): count}"""
+        with self._lock:
+            return dict(self._pending)
+
+    def discard(self):
+        with self._lock:
+            self._pending = Counter()
+            self._hits = 0
+
+    def flush(self):
+        """Write the buffered hits in one transaction; returns how many were written"""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._hits = 0
+        if not pending:
+            return 0
+        try:
+            write_views(pending)
+        except Exception:
+            # Keep the hits for the next flush rather than lose them
+            logger.exception('Could not flush %d article view(s)', sum(pending.values()))
+            with self._lock:
+                self._pending.update(pending)
+            return 0
+        return sum(pending.values())
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(getattr(settings, 'ARTICLE_VIEWS_FLUSH_INTERVAL', 30))
+            self.flush()
+            connection.close()
+
+
+def write_views(pending):
+    """Add {(slug, day): count} to the article totals and daily rows"""
+    slugs = {slug for slug, _ in pending}
+    ids = dict(Article.objects.published().filter(slug__in=slugs).values_list('slug', 'id'))
+    totals = Counter()
+    days = {}
+    for (slug, day), count in pending.items():
+        if slug in ids:
+            totals[ids[slug]] += count
+            days.setdefault(day, Counter())[ids[slug]] += count
+    if not totals:
+        return
+
+    with transaction.atomic():
+        Article.objects.filter(pk__in=totals).update(views=F('views') + increments('pk', totals))
+        for day, counts in days.items():
+            ArticleViewDay.objects.bulk_create(
+                [ArticleViewDay(article_id=pk, date=day) for pk in counts], ignore_conflicts=True,
+            )
+            ArticleViewDay.objects.filter(date=day, article_id__in=counts).update(
+                views=F('views') + increments('article_id', counts)
+            )
+
+
+def increments(field, counts):
+    """CASE expression giving each row's count, so one UPDATE covers them all"""
+    return Case(*[When(**{field: pk}, then=Value(count)) for pk, count in counts.items()], default=Value(0))
+
+
+view_counter = ViewCounter()
+
+
+def count_article_view(view):
+    """
+    Count successful GETs of an article page (including 304 revalidations)
+
+    Goes outside the caching decorators so cached responses count too.
+    """
+    @wraps(view)
+    def wrapper(request, slug, *args, **kwargs):
+        response = view(request, slug, *args, **kwargs)
+        if request.method == 'GET' and response.status_code in (200, 304):
+            view_counter.hit(slug)
+        return response
+    return wrapper
+
+
+def install_shutdown_flush():
+    """Flush on interpreter exit, and on SIGTERM unless something else handles it"""
+    atexit.register(view_counter.flush)
+    if threading.current_thread() is not threading.main_thread():
+        return
+    if signal.getsignal(signal.SIGTERM) is not signal.SIG_DFL:
+        return
+
+    def on_sigterm(signum, frame):
+        view_counter.flush()
+        signal.signal(signum, signal.SIG_DFL)
+        signal.raise_signal(signum)
+
+    signal.signal(signal.SIGTERM, on_sigterm)
@@ -1,5 +1,5 @@
 from django import forms
-from .models import NewsletterSubscriber, ContactMessage
+from .models import NewsletterSubscriber, ContactMessage, normalize_email
 
 class NewsletterForm(forms.ModelForm):
     class Meta:
@@ -12,6 +12,9 @@ class NewsletterForm(forms.ModelForm):
             })
         }
 
+    def clean_email(self):
+        return normalize_email(self.cleaned_data['email'])
+
 
 class ContactForm(forms.ModelForm):
     class Meta:
@@ -31,4 +34,11 @@ class ContactForm(forms.ModelForm):
                 'rows': 5,
                 'class': 'w-full px-4 py-3 rounded-lg border border-neutral-300 focus:border-accent focus:outline-none focus:ring-2 focus:ring-accent/20 transition-all resize-none',
             }),
-        }
\ No newline at end of file
+        }
+
+
+class SubscriberImportForm(forms.Form):
+    csv_file = forms.FileField(
+        label='CSV file',
+        help_text='One address per row, in the column headed "email" or else the first column.',
+    )
\ No newline at end of file
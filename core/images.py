@@ -0,0 +1,275 @@
+"""
+Image processing for gallery and article uploads
+
+Pure Pillow helpers: they take a file and return encoded bytes. Saving the
+result onto a model is left to the caller (see core.tasks), which runs in
+the background worker rather than the request thread.
+
+Memory stays bounded by the output size, not the upload: JPEGs are decoded
+with DCT scaling (draft) close to the largest size needed, other formats
+are shrunk with Image.reduce straight after decoding, and transparency is
+flattened only once the image is small. Uploads over IMAGE_MAX_PIXELS or
+IMAGE_MAX_BYTES are refused before any pixel is decoded.
+
+EXIF orientation is read from the header and applied after downscaling, so
+phone photos come out upright and dimensions are the displayed ones.
+"""
+import base64
+import math
+import os
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image
+
+try:
+    import pillow_avif  # noqa: F401  Registers an AVIF encoder on older Pillow
+except ImportError:
+    pass
+
+
+THUMBNAIL_SIZE = (400, 400)
+THUMBNAIL_QUALITY = 85
+
+# Format name -> (Pillow format, save options)
+VARIANT_ENCODERS = {
+    'avif': ('AVIF', {'quality': 55, 'speed': 6}),
+    'webp': ('WEBP', {'quality': 78, 'method': 5}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+LQIP_SIZE = (16, 16)  # Inline blur placeholder, a few hundred bytes as JPEG
+
+# EXIF orientation -> transpose that makes the image upright
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+# Reduce to no less than this multiple of the target before the final
+# LANCZOS resample, as Image.thumbnail(reducing_gap=...) does
+REDUCING_GAP = 2
+
+
+class ImageTooLarge(ValueError):
+    """The upload exceeds IMAGE_MAX_PIXELS or IMAGE_MAX_BYTES"""
+
+
+def source_bytes(source):
+    """Size in bytes of a path or file object"""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    size = getattr(source, 'size', None)
+    if size is None:
+        position = source.tell()
+        size = source.seek(0, os.SEEK_END)
+        source.seek(position)
+    return size
+
+
+def pixel_limit():
+    """Largest width * height accepted (IMAGE_MAX_PIXELS)"""
+    return getattr(settings, 'IMAGE_MAX_PIXELS', 80_000_000)
+
+
+def open_checked(source):
+    """Open `source` (header only) after enforcing the byte and pixel ceilings"""
+    max_bytes = getattr(settings, 'IMAGE_MAX_BYTES', 50 * 1024 * 1024)
+    size = source_bytes(source)
+    if size > max_bytes:
+        raise ImageTooLarge(f'{size} bytes is over the {max_bytes} byte limit')
+
+    try:
+        img = Image.open(source)
+    except Image.DecompressionBombError as exc:
+        # Pillow's own check (twice Image.MAX_IMAGE_PIXELS, see CoreConfig) fires first
+        raise ImageTooLarge(str(exc)) from exc
+    max_pixels = pixel_limit()
+    if img.width * img.height > max_pixels:
+        img.close()
+        raise ImageTooLarge(f'{img.width}x{img.height} is over the {max_pixels} pixel limit')
+    return img
+
+
+def exif_orientation(img):
+    """EXIF orientation tag of an opened image (1 = upright)"""
+    try:
+        return img.getexif().get(0x0112, 1)
+    except (OSError, ValueError):
+        return 1
+
+
+def display_size(img, orientation):
+    """(width, height) as shown, once the EXIF orientation is applied"""
+    if orientation in (5, 6, 7, 8):
+        return img.height, img.width
+    return img.size
+
+
+def orient(img, orientation):
+    """Apply an EXIF orientation to a (downscaled) image"""
+    method = ORIENTATION_TRANSPOSE.get(orientation)
+    return img.transpose(method) if method is not None else img
+
+
+def decode_at(img, size):
+    """
+    Decode an opened image at roughly `size`, never much smaller
+
+    JPEG: draft picks the smallest 1/2, 1/4 or 1/8 DCT scale that still
+    covers `size`, so the full bitmap is never allocated. Others: an
+    integer box reduce right after decoding. Either way the result stays
+    at least REDUCING_GAP times the target for a clean final resample.
+    """
+    target = (size[0] * REDUCING_GAP, size[1] * REDUCING_GAP)
+    if img.format == 'JPEG':
+        img.draft('RGB', target)
+    if img.mode == 'P':
+        # Palettes cannot be resampled; keep any transparency for flatten()
+        img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+    factor = math.floor(min(img.width / target[0], img.height / target[1]))
+    if factor >= 2:
+        img = img.reduce(factor)
+    return img
+
+
+def flatten(img, background=(255, 255, 255)):
+    """Composite transparent images onto a solid background as RGB"""
+    if img.mode in ('RGBA', 'LA', 'P'):
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        flat = Image.new('RGB', img.size, background)
+        flat.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
+        return flat
+    if img.mode != 'RGB':
+        return img.convert('RGB')
+    return img
+
+
+def fit(source, size):
+    """Upright RGB image of `source` (a path or file) fitted inside `size`"""
+    with open_checked(source) as img:
+        orientation = exif_orientation(img)
+        width, height = display_size(img, orientation)
+        scale = min(size[0] / width, size[1] / height, 1)
+        box = (max(1, round(width * scale)), max(1, round(height * scale)))
+        if orientation in (5, 6, 7, 8):
+            box = box[::-1]  # decode_at works on the stored, unrotated pixels
+        img = orient(decode_at(img, box), orientation)
+        img.thumbnail(size, Image.Resampling.LANCZOS)
+        return flatten(img)
+
+
+def make_thumbnail(source, size=THUMBNAIL_SIZE, quality=THUMBNAIL_QUALITY):
+    """JPEG bytes of `source` (a path or file) fitted inside `size`"""
+    output = BytesIO()
+    fit(source, size).save(output, format='JPEG', quality=quality, optimize=True)
+    return output.getvalue()
+
+
+def make_resized(source, size, fmt='jpeg'):
+    """Bytes of `source` fitted inside `size`, encoded like the variants of `fmt`"""
+    pillow_format, options = VARIANT_ENCODERS[fmt]
+    output = BytesIO()
+    fit(source, size).save(output, format=pillow_format, **options)
+    return output.getvalue()
+
+
+def thumbnail_name(image_name):
+    """gallery/photo.png -> photo_thumb.jpg"""
+    name_without_ext = os.path.splitext(os.path.basename(image_name))[0]
+    return f"{name_without_ext}_thumb.jpg"
+
+
+def variant_formats():
+    """The configured variant formats this Pillow build can encode"""
+    Image.init()
+    wanted = getattr(settings, 'IMAGE_VARIANT_FORMATS', ('avif', 'webp', 'jpeg'))
+    return [fmt for fmt in wanted if fmt in VARIANT_ENCODERS and VARIANT_ENCODERS[fmt][0] in Image.SAVE]
+
+
+def variant_widths(original_width):
+    """Configured widths narrower than the original, plus the original if it is smaller"""
+    widths = sorted(set(getattr(settings, 'IMAGE_VARIANT_WIDTHS', (320, 640, 960, 1280, 1920))))
+    fitting = [width for width in widths if width < original_width]
+    if len(fitting) < len(widths):
+        fitting.append(original_width)  # Never upscale; the widest variant is the original size
+    return fitting
+
+
+def make_variants(source, formats=None):
+    """
+    Yield (format, width, height, bytes) for every width/format pair
+
+    Decodes once, near the widest variant, and resizes from there down so
+    each step resamples an already-reduced image.
+    """
+    formats = variant_formats() if formats is None else formats
+    with open_checked(source) as img:
+        orientation = exif_orientation(img)
+        original_width, original_height = display_size(img, orientation)
+        widths = sorted(variant_widths(original_width), reverse=True)
+        box = (widths[0], math.ceil(original_height * widths[0] / original_width))
+        if orientation in (5, 6, 7, 8):
+            box = box[::-1]  # decode_at works on the stored, unrotated pixels
+        img = orient(decode_at(img, box), orientation)
+        for width in widths:
+            height = max(1, round(original_height * width / original_width))
+            if img.size != (width, height):
+                img = img.resize((width, height), Image.Resampling.LANCZOS)
+            flat = flatten(img)
+            for fmt in formats:
+                pillow_format, options = VARIANT_ENCODERS[fmt]
+                output = BytesIO()
+                flat.save(output, format=pillow_format, **options)
+                yield fmt, width, height, output.getvalue()
+
+
+def variant_name(source_name, width, fmt):
+    """gallery/photo.png, 640, webp -> variants/gallery/photo_640w.webp"""
+    stem = os.path.splitext(source_name)[0]
+    extension = 'jpg' if fmt == 'jpeg' else fmt
+    return f"variants/{stem}_{width}w.{extension}"
+
+
+def describe(source):
+    """
+    Layout metadata for an image, from one small decode
+
+    Returns width/height as displayed, 'landscape'/'portrait'/'square',
+    the dominant colour as #rrggbb and a base64 JPEG data URI placeholder.
+    """
+    with open_checked(source) as img:
+        orientation = exif_orientation(img)
+        width, height = display_size(img, orientation)
+        img = orient(decode_at(img, (64, 64)), orientation)
+        img.thumbnail((64, 64), Image.Resampling.LANCZOS)
+        img = flatten(img)
+
+    # Most common colour of a 5-colour quantization, not the muddy average
+    palette = img.quantize(colors=5)
+    count, index = max(palette.getcolors())
+    red, green, blue = palette.getpalette()[index * 3:index * 3 + 3]
+
+    placeholder = img.copy()
+    placeholder.thumbnail(LQIP_SIZE, Image.Resampling.LANCZOS)
+    output = BytesIO()
+    placeholder.save(output, format='JPEG', quality=50)
+
+    if width == height:
+        shape = 'square'
+    else:
+        shape = 'landscape' if width > height else 'portrait'
+    return {
+        'width': width,
+        'height': height,
+        'orientation': shape,
+        'color': f'#{red:02x}{green:02x}{blue:02x}',
+        'lqip': 'data:image/jpeg;base64,' + base64.b64encode(output.getvalue()).decode('ascii'),
+    }
@@ -0,0 +1,238 @@
+"""
+In-process inverted index for essay search
+
+Database-agnostic alternative to the SQLite FTS5 table: works the same on
+PostgreSQL. Each worker builds the index from published Articles on first
+use (or at start-up, see portfolio/wsgi.py) and keeps it current through
+post_save/post_delete signals. Postings are stored as parallel `array`s
+of doc ids and term frequencies, ranked with BM25.
+"""
+import math
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have i if in into is it its of on
+or our so that the their then there these they this to was we were what when
+which who will with you your
+""".split())
+
+# Field weights: a hit in the title counts as much as three in the body
+FIELD_WEIGHTS = (
+    ('title', 3),
+    ('excerpt', 2),
+    ('tags', 3),
+    ('content', 1),
+)
+
+MAX_TF = 65535  # array('H')
+
+
+@lru_cache(maxsize=65536)
+def stem(token):
+    """
+    Light suffix stripping
+
+    Folds plurals and the common -ing/-ed/-ly endings so that "designs",
+    "designed" and "designing" meet, without a full Porter stemmer.
+    """
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith('ies') and len(token) > 4:
+        return token[:-3] + 'y'
+    if token.endswith('sses'):
+        return token[:-2]
+    if token.endswith('ing') and len(token) > 5:
+        token = token[:-3]
+    elif token.endswith('ed') and len(token) > 4:
+        token = token[:-2]
+    elif token.endswith('ly') and len(token) > 4:
+        return token[:-2]
+    elif token.endswith('s') and not token.endswith(('ss', 'us', 'is')):
+        return token[:-1]
+    else:
+        return token
+    # Undouble "running" -> "runn" -> "run"
+    if len(token) > 3 and token[-1] == token[-2] and token[-1] not in 'lsz':
+        token = token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Lowercase, split on non-word characters, drop stopwords and stem"""
+    if not text:
+        return []
+    return [
+        stem(token)
+        for token in TOKEN_RE.findall(text.lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+def article_terms(article):
+    """Weighted term frequencies for an Article-like object"""
+    counts = Counter()
+    for field, weight in FIELD_WEIGHTS:
+        value = getattr(article, field, '')
+        if isinstance(value, (list, tuple)):
+            value = ' '.join(str(v) for v in value)
+        for token in tokenize(value):
+            counts[token] += weight
+    return counts
+
+
+class InvertedIndex:
+    """
+    BM25-ranked inverted index
+
+    postings[term] = (array('L') of doc ids, array('H') of term frequencies)
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.doc_lengths = {}
+        self.doc_terms = {}
+        self.total_length = 0
+        self.built_at = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    @property
+    def loaded(self):
+        return self.built_at is not None
+
+    def clear(self):
+        with self._lock:
+            self.postings = {}
+            self.doc_lengths = {}
+            self.doc_terms = {}
+            self.total_length = 0
+            self.built_at = None
+
+    def add(self, doc_id, terms):
+        """Index a document from a {term: tf} mapping, replacing any previous version"""
+        with self._lock:
+            self.remove(doc_id)
+            if not terms:
+                return
+            for term, tf in terms.items():
+                entry = self.postings.get(term)
+                if entry is None:
+                    entry = self.postings[term] = (array('L'), array('H'))
+                entry[0].append(doc_id)
+                entry[1].append(min(tf, MAX_TF))
+            length = sum(terms.values())
+            self.doc_lengths[doc_id] = length
+            self.doc_terms[doc_id] = tuple(terms)
+            self.total_length += length
+
+    def remove(self, doc_id):
+        with self._lock:
+            terms = self.doc_terms.pop(doc_id, None)
+            if terms is None:
+                return
+            for term in terms:
+                doc_ids, tfs = self.postings[term]
+                position = doc_ids.index(doc_id)
+                del doc_ids[position]
+                del tfs[position]
+                if not doc_ids:
+                    del self.postings[term]
+            self.total_length -= self.doc_lengths.pop(doc_id)
+
+    def add_article(self, article):
+        self.add(article.pk, article_terms(article))
+
+    def build(self, articles):
+        """Rebuild from an iterable of Article-like objects"""
+        with self._lock:
+            self.clear()
+            for article in articles:
+                self.add_article(article)
+            self.built_at = time.monotonic()
+
+    def search(self, query, limit=None):
+        """Return [(doc_id, score), ...] best first, ties broken by doc id"""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        with self._lock:
+            doc_count = len(self.doc_lengths)
+            if not doc_count:
+                return []
+            avg_length = self.total_length / doc_count
+            k1, b = self.k1, self.b
+            lengths = self.doc_lengths
+            scores = {}
+
+            for term in terms:
+                entry = self.postings.get(term)
+                if entry is None:
+                    continue
+                doc_ids, tfs = entry
+                df = len(doc_ids)
+                idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+                for doc_id, tf in zip(doc_ids, tfs):
+                    norm = k1 * (1 - b + b * lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit] if limit else ranked
+
+
+INDEXED_FIELDS = ('id', 'title', 'excerpt', 'tags', 'content')
+
+_article_index = InvertedIndex()
+
+
+def get_article_index():
+    """
+    The worker's index of published Articles, built lazily
+
+    Edits made in other workers arrive via their own signals only, so the
+    index is also rebuilt once it is older than ESSAY_SEARCH_INDEX_MAX_AGE
+    seconds.
+    """
+    max_age = getattr(settings, 'ESSAY_SEARCH_INDEX_MAX_AGE', 300)
+    index = _article_index
+    if not index.loaded or (max_age and time.monotonic() - index.built_at > max_age):
+        load_article_index()
+    return index
+
+
+def load_article_index():
+    """(Re)build the worker's index from the database"""
+    from .models import Article
+
+    articles = Article.objects.filter(status='published').only(*INDEXED_FIELDS)
+    _article_index.build(articles.iterator(chunk_size=500))
+    return _article_index
+
+
+def update_article(article):
+    """Apply a saved Article to the index, if this worker has built one"""
+    if not _article_index.loaded:
+        return
+    if article.status == 'published':
+        _article_index.add_article(article)
+    else:
+        _article_index.remove(article.pk)
+
+
+def remove_article(article):
+    if _article_index.loaded:
+        _article_index.remove(article.pk)
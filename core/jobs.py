@@ -0,0 +1,124 @@
+"""
+Database-backed job queue
+
+Request code calls `enqueue(kind, **payload)`, which only inserts a row.
+The runworker command claims due jobs, runs their registered handler and
+records the outcome. A failed job is retried with exponential backoff up to
+its max_attempts, and then marked failed with the traceback; handlers raise
+PermanentJobError to fail at once when a retry cannot help.
+
+    @register('gallery.thumbnail')
+    def gallery_thumbnail(pk): ...
+
+    enqueue('gallery.thumbnail', pk=item.pk)
+
+A job is claimed with a conditional UPDATE (status pending -> running),
+so several workers can poll the same table without running a job twice.
+Jobs left running by a worker that died are handed out again once their
+lock is older than JOB_LOCK_TIMEOUT.
+"""
+import datetime
+import traceback
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+
+HANDLERS = {}
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying cannot help; the job fails at once"""
+
+
+def register(kind):
+    """Decorator registering a function as the handler for a job kind"""
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, **payload):
+    """
+    Queue a job, unless an identical one is already waiting
+
+    Returns the Job (new or existing).
+    """
+    existing = Job.objects.filter(kind=kind, payload=payload, status=Job.PENDING).first()
+    if existing is not None:
+        return existing
+    return Job.objects.create(
+        kind=kind,
+        payload=payload,
+        max_attempts=getattr(settings, 'JOB_MAX_ATTEMPTS', 5),
+    )
+
+
+def retry_delay(attempts):
+    """Backoff before the next attempt: 30s, 1m, 2m, ... capped at an hour"""
+    return datetime.timedelta(seconds=min(30 * 2 ** (attempts - 1), 3600))
+
+
+def release_stale():
+    """Hand jobs locked by a dead worker back to the queue; returns the count"""
+    timeout = getattr(settings, 'JOB_LOCK_TIMEOUT', 600)
+    cutoff = timezone.now() - datetime.timedelta(seconds=timeout)
+    return Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff).update(
+        status=Job.PENDING, locked_by='', locked_at=None,
+    )
+
+
+def claim(worker, limit):
+    """Atomically take up to `limit` due jobs for this worker"""
+    now = timezone.now()
+    candidates = list(
+        Job.objects.filter(status=Job.PENDING, run_after__lte=now)
+        .order_by('run_after', 'id')
+        .values_list('pk', flat=True)[:limit * 2]
+    )
+    claimed = []
+    for pk in candidates:
+        if len(claimed) == limit:
+            break
+        # Losing the race to another worker updates zero rows
+        taken = Job.objects.filter(pk=pk, status=Job.PENDING).update(
+            status=Job.RUNNING,
+            locked_by=worker,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if taken:
+            claimed.append(pk)
+    return list(Job.objects.filter(pk__in=claimed).order_by('run_after', 'id'))
+
+
+def run(job):
+    """Run a claimed job and record success, a retry or the final failure"""
+    handler = HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise PermanentJobError(f'No handler registered for job kind {job.kind!r}')
+        handler(**job.payload)
+    except Exception as exc:
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts or isinstance(exc, PermanentJobError):
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.FAILED, last_error=error, locked_by='', locked_at=None,
+                finished_at=timezone.now(),
+            )
+            return Job.FAILED
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.PENDING, last_error=error, locked_by='', locked_at=None,
+            run_after=timezone.now() + retry_delay(job.attempts),
+        )
+        return Job.PENDING
+
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.DONE, last_error='', locked_by='', locked_at=None,
+        finished_at=timezone.now(),
+    )
+    return Job.DONE
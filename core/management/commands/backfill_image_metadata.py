@@ -0,0 +1,54 @@
+"""
+Management command to backfill image layout metadata
+
+Fills width, height, orientation, dominant colour and the blur placeholder
+(core.images.describe) for gallery images and article featured images that
+were uploaded before these fields existed. New uploads get them from the
+images.variants job.
+
+Usage: python manage.py backfill_image_metadata [--all]
+"""
+from django.core.management.base import BaseCommand
+from core.cache import bump_content_version
+from core.images import ImageTooLarge
+from core.tasks import IMAGE_METADATA_FIELDS, METADATA_KEYS, read_metadata
+
+
+class Command(BaseCommand):
+    help = 'Records dimensions, orientation, colour and placeholder for existing images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Recompute rows that already have metadata')
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        total = failed = 0
+        for model, field in IMAGE_METADATA_FIELDS:
+            columns = [f'{field}_{key}' for key in METADATA_KEYS]
+            rows = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            if not options['all']:
+                rows = rows.filter(**{f'{field}_width__isnull': True})
+
+            batch = []
+            for obj in rows.only('id', field).order_by('id').iterator(chunk_size=options['batch_size']):
+                try:
+                    metadata = read_metadata(getattr(obj, field).name)
+                except (ImageTooLarge, OSError) as exc:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(f'✗ {model.__name__} #{obj.pk}: {exc}'))
+                    continue
+                for key, value in metadata.items():
+                    setattr(obj, f'{field}_{key}', value)
+                batch.append(obj)
+                if len(batch) >= options['batch_size']:
+                    model.objects.bulk_update(batch, columns)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                model.objects.bulk_update(batch, columns)
+                total += len(batch)
+            self.stdout.write(f'  {model._meta.verbose_name_plural}: done')
+
+        if total:
+            bump_content_version()
+        self.stdout.write(self.style.SUCCESS(f'✓ Recorded metadata for {total} image(s), {failed} failed'))
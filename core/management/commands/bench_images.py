@@ -0,0 +1,140 @@
+"""
+Management command to benchmark memory and time of the image pipeline
+
+Writes synthetic photos of each size class to a temporary directory, then
+makes a thumbnail and the responsive variants of each twice: with the old
+full-resolution decode, and with core.images' draft/reduce decode. Every run
+happens in a forked child so its peak RSS (Linux VmHWM) is measured alone.
+
+Usage: python manage.py bench_images [--megapixels 2 12 24 50] [--format jpeg png] [--pipeline thumbnail variants]
+"""
+import math
+import multiprocessing
+import os
+import tempfile
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+from core import images
+
+
+def read_status(field):
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def naive_thumbnail(path):
+    """The pre-bounded pipeline: flatten and resample the full bitmap"""
+    with Image.open(path) as img:
+        img = images.flatten(img)
+        img.thumbnail(images.THUMBNAIL_SIZE, Image.Resampling.LANCZOS, reducing_gap=None)
+        img.save(BytesIO(), format='JPEG', quality=images.THUMBNAIL_QUALITY, optimize=True)
+
+
+def naive_variants(path):
+    with Image.open(path) as img:
+        img = images.flatten(img)
+        for width in sorted(images.variant_widths(img.width), reverse=True):
+            img = img.resize((width, max(1, round(img.height * width / img.width))), Image.Resampling.LANCZOS)
+            for fmt in images.variant_formats():
+                pillow_format, options = images.VARIANT_ENCODERS[fmt]
+                img.save(BytesIO(), format=pillow_format, **options)
+
+
+def bounded_thumbnail(path):
+    images.make_thumbnail(path)
+
+
+def bounded_variants(path):
+    for _ in images.make_variants(path):
+        pass
+
+
+PIPELINES = {
+    'thumbnail': (naive_thumbnail, bounded_thumbnail),
+    'variants': (naive_variants, bounded_variants),
+}
+
+
+def measure(func, path, results):
+    # Reset the peak RSS counter so only this run's allocations count
+    with open('/proc/self/clear_refs', 'w') as clear_refs:
+        clear_refs.write('5')
+    baseline = read_status('VmRSS')
+    started = time.perf_counter()
+    try:
+        func(path)
+    except images.ImageTooLarge:
+        results.put((None, None))  # Refused by the ceilings, before decoding
+        return
+    results.put((time.perf_counter() - started, read_status('VmHWM') - baseline))
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks peak memory and time of thumbnail/variant generation per image size'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--megapixels', type=float, nargs='+', default=[2, 12, 24, 50])
+        parser.add_argument('--format', nargs='+', default=['jpeg', 'png'], choices=['jpeg', 'png'])
+        parser.add_argument('--pipeline', nargs='+', default=list(PIPELINES), choices=list(PIPELINES))
+
+    def handle(self, *args, **options):
+        if not os.path.exists('/proc/self/clear_refs'):
+            raise CommandError('Peak RSS is read from /proc; run this benchmark on Linux')
+        context = multiprocessing.get_context('fork')
+
+        self.stdout.write(self.style.SUCCESS('\n🖼  Image pipeline benchmark\n'))
+        self.stdout.write(
+            f'{"size":>14} {"format":<6} {"pipeline":<10} {"naive":>9} {"bounded":>9} '
+            f'{"naive RSS":>10} {"bounded RSS":>12}'
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            for megapixels in options['megapixels']:
+                width = round(math.sqrt(megapixels * 1_000_000 * 3 / 2))
+                height = round(width * 2 / 3)
+                for fmt in options['format']:
+                    path = os.path.join(directory, f'{megapixels}mp.{fmt}')
+                    self.make_photo(path, (width, height), fmt)
+                    for name in options['pipeline']:
+                        naive, bounded = PIPELINES[name]
+                        naive_time, naive_rss = self.run(context, naive, path)
+                        bounded_time, bounded_rss = self.run(context, bounded, path)
+                        self.stdout.write(
+                            f'{f"{width}x{height}":>14} {fmt:<6} {name:<10} '
+                            f'{self.format_time(naive_time):>9} {self.format_time(bounded_time):>9} '
+                            f'{self.format_rss(naive_rss):>10} {self.format_rss(bounded_rss):>12}'
+                        )
+                    os.remove(path)
+
+        self.stdout.write('')
+
+    def run(self, context, func, path):
+        results = context.Queue()
+        child = context.Process(target=measure, args=(func, path, results))
+        child.start()
+        outcome = results.get()
+        child.join()
+        return outcome
+
+    def format_time(self, seconds):
+        return 'refused' if seconds is None else f'{seconds * 1000:.0f}ms'
+
+    def format_rss(self, size):
+        return '-' if size is None else f'{size / 2 ** 20:.0f}MB'
+
+    def make_photo(self, path, size, fmt):
+        """Gradient plus noise: compresses like a photo, not like a flat fill"""
+        noise = Image.effect_noise(size, 40)
+        gradient = Image.linear_gradient('L').resize(size)
+        img = Image.merge('RGB', (gradient, noise, Image.blend(gradient, noise, 0.5)))
+        if fmt == 'png':
+            img.putalpha(gradient)
+            img.save(path, format='PNG', compress_level=1)
+        else:
+            img.save(path, format='JPEG', quality=90)
@@ -0,0 +1,110 @@
+"""
+Management command to benchmark essay search engines
+
+Generates synthetic published articles inside a transaction that is rolled
+back at the end, then times the icontains scan, the SQLite FTS5 index (when
+available) and the in-process inverted index on the same queries.
+
+Usage: python manage.py bench_search [--sizes 1000 10000 100000] [--queries 20]
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from core.inverted_index import InvertedIndex, INDEXED_FIELDS
+from core.models import Article
+from core.search import fts_available, fts_search, icontains_search
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks icontains vs FTS5 vs in-process inverted index essay search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+        parser.add_argument('--queries', type=int, default=20, help='Queries timed per engine')
+        parser.add_argument('--words', type=int, default=300, help='Words per synthetic article body')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = [self.make_word(rng) for _ in range(5000)]
+        # Zipf-like weights so a few words are common and most are rare
+        weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+
+        self.stdout.write(self.style.SUCCESS('\n🔎 Essay search benchmark\n'))
+        self.stdout.write(
+            f'{"articles":>9}  {"engine":<10} {"build":>9} {"avg query":>10} {"p95 query":>10} {"hits":>7}'
+        )
+
+        for size in options['sizes']:
+            try:
+                with transaction.atomic():
+                    self.bench_size(size, options, rng, vocabulary, weights)
+                    raise Rollback
+            except Rollback:
+                pass
+
+        self.stdout.write('')
+
+    def bench_size(self, size, options, rng, vocabulary, weights):
+        now = timezone.now()
+        batch = []
+        for i in range(size):
+            words = rng.choices(vocabulary, weights, k=options['words'])
+            batch.append(Article(
+                title=' '.join(rng.choices(vocabulary, weights, k=6)),
+                slug=f'bench-{size}-{i}',
+                excerpt=' '.join(words[:30]),
+                content=' '.join(words),
+                tags=rng.sample(vocabulary[:50], 3),
+                status='published',
+                published_date=now,
+            ))
+            if len(batch) >= 1000:
+                Article.objects.bulk_create(batch)
+                batch = []
+        Article.objects.bulk_create(batch)
+
+        # Mid-frequency words: common enough to match, rare enough to matter
+        queries = rng.sample(vocabulary[20:2000], options['queries'])
+        published = Article.objects.filter(status='published')
+
+        def run_queryset(search):
+            def run(query):
+                return len(list(search(published, query).values_list('id', flat=True)[:50]))
+            return run
+
+        self.report(size, 'icontains', None, queries, run_queryset(icontains_search))
+
+        if fts_available():
+            self.report(size, 'fts5', None, queries, run_queryset(fts_search))
+
+        index = InvertedIndex()
+        started = time.perf_counter()
+        index.build(published.only(*INDEXED_FIELDS).iterator(chunk_size=1000))
+        build_time = time.perf_counter() - started
+        self.report(size, 'inverted', build_time, queries, lambda query: len(index.search(query, limit=50)))
+
+    def report(self, size, engine, build_time, queries, run):
+        timings = []
+        hits = 0
+        for query in queries:
+            started = time.perf_counter()
+            hits += run(query)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        average = sum(timings) / len(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        build = f'{build_time * 1000:7.0f}ms' if build_time is not None else f'{"-":>9}'
+        self.stdout.write(
+            f'{size:>9}  {engine:<10} {build} {average * 1000:8.2f}ms {p95 * 1000:8.2f}ms {hits:>7}'
+        )
+
+    def make_word(self, rng):
+        return ''.join(rng.choices('abcdefghijklmnoprstuvwy', k=rng.randint(4, 9)))
@@ -0,0 +1,107 @@
+"""
+Management command to compute related essays by TF-IDF similarity
+
+Vectorizes every published article (title, tags, content) and stores its
+top-k cosine neighbours in RelatedArticle. By default only articles whose
+text changed since the last run are recomputed, plus any article whose
+stored neighbours are affected by those changes.
+
+Usage: python manage.py compute_related_articles [--full] [--top-k 3]
+"""
+from collections import defaultdict
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.cache import bump_content_version
+from core.models import Article, RelatedArticle
+from core.similarity import TfidfMatrix, similarity_hash, similarity_text
+
+
+class Command(BaseCommand):
+    help = 'Computes related essays from TF-IDF cosine similarity'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute every article')
+        parser.add_argument('--top-k', type=int, default=3, help='Neighbours stored per article')
+        parser.add_argument('--max-features', type=int, default=20000, help='Vocabulary size cap')
+
+    def handle(self, *args, **options):
+        top_k = options['top_k']
+
+        articles = list(
+            Article.objects.filter(status='published')
+            .only('id', 'title', 'tags', 'content', 'content_hash', 'related_hash')
+            .order_by('id')
+        )
+        row_of = {article.pk: row for row, article in enumerate(articles)}
+
+        self.stdout.write(f'Vectorizing {len(articles)} article(s)...')
+        matrix = TfidfMatrix(
+            [similarity_text(article) for article in articles],
+            max_features=options['max_features'],
+        )
+
+        current = defaultdict(list)
+        for link in RelatedArticle.objects.order_by('article_id', 'rank'):
+            current[link.article_id].append((link.related_id, link.score))
+
+        hashes = {article.pk: similarity_hash(article) for article in articles}
+        if options['full']:
+            dirty = set(row_of)
+        else:
+            dirty = {article.pk for article in articles if article.related_hash != hashes[article.pk]}
+
+        # Articles that lost published status or were deleted
+        gone = {pk for pk in current if pk not in row_of}
+        for pk, neighbours in current.items():
+            if pk in gone:
+                continue
+            if any(other in gone or other in dirty for other, _ in neighbours):
+                dirty.add(pk)
+
+        # A changed article may now outrank a clean article's weakest neighbour
+        # (similarity is symmetric, so the changed rows tell us that directly)
+        threshold = np.zeros(len(articles))
+        for pk, neighbours in current.items():
+            if pk in row_of and len(neighbours) >= top_k:
+                threshold[row_of[pk]] = neighbours[top_k - 1][1]
+
+        results = {}
+        for pk in [pk for pk in dirty if pk in row_of]:
+            row = row_of[pk]
+            sims = matrix.similarities(row)
+            results[pk] = matrix.top_k(row, top_k, sims)
+            for other_row in np.flatnonzero(sims > threshold):
+                dirty.add(articles[other_row].pk)
+
+        for pk in dirty:
+            if pk in row_of and pk not in results:
+                results[pk] = matrix.top_k(row_of[pk], top_k)
+
+        with transaction.atomic():
+            RelatedArticle.objects.filter(article_id__in=set(results) | gone).delete()
+            RelatedArticle.objects.bulk_create(
+                [
+                    RelatedArticle(
+                        article_id=pk,
+                        related_id=articles[other_row].pk,
+                        score=score,
+                        rank=rank,
+                    )
+                    for pk, neighbours in results.items()
+                    for rank, (other_row, score) in enumerate(neighbours)
+                ],
+                batch_size=1000,
+            )
+            stale = [article for article in articles if article.pk in results]
+            for article in stale:
+                article.related_hash = hashes[article.pk]
+            Article.objects.bulk_update(stale, ['related_hash'], batch_size=500)
+        if results or gone:
+            bump_content_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Recomputed neighbours for {len(results)} article(s), '
+            f'cleared {len(gone)} unpublished'
+        ))
@@ -0,0 +1,219 @@
+"""
+Management command to export the public site as static HTML
+
+Renders every public page (home, about, resume, essays, projects, gallery,
+tlw and each published essay and project) into an output directory as
+<path>/index.html, with precompressed .gz (and .br when the brotli package
+is installed) siblings for the static file server to pick.
+
+Runs are incremental: a build manifest stores a fingerprint per page. Detail
+pages are re-rendered when their row, their related rows or the templates
+change; listing pages when any public row or the templates change. Rows
+are read from the database, not the cache's content version, which can be
+lost and start over.
+Pages whose row was deleted or unpublished are removed.
+
+A static host cannot answer ?cursor= queries, so listings are rendered with
+every row on one page (no "Load more"), and /gallery/api/ is exported as a
+single page of every item (`next` is null) for the lightbox to fetch. Like
+every page it is written to <path>/index.html so the same URL resolves;
+fetch() parses the JSON whatever the Content-Type.
+
+Static pages carry no CSRF token, so the newsletter and contact forms still
+need the Django app (or a form handler) behind them. Serve collectstatic's
+STATIC_ROOT and MEDIA_ROOT alongside the output.
+
+Usage: python manage.py export_static_site [--output build] [--base-url https://example.com] [--full]
+"""
+import gzip
+import hashlib
+import inspect
+import json
+import os
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.urls import resolve, reverse
+from core.cache import CSRF_INPUT_RE, template_version
+from core.models import Article, Experience, RelatedArticle, RelatedProject
+from core.signals import PAGE_CACHE_EXEMPT
+
+try:
+    import brotli
+except ImportError:  # Optional: only .gz siblings are written without it
+    brotli = None
+
+
+MANIFEST_NAME = '.manifest.json'
+
+# Pages that aggregate many rows: rebuilt whenever any public row changes
+LISTING_PAGES = ('home', 'about', 'resume', 'kiota', 'small_bets', 'gallery', 'gallery_api', 'tlw')
+
+# Page size while exporting: larger than any listing, so nothing needs a cursor
+ALL_ROWS = 10 ** 9
+
+# Columns no page shows; view counts change on every flush
+IGNORED_COLUMNS = {(Article, 'views')}
+
+
+def fingerprint(*parts):
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def content_state():
+    """
+    Digest of every row the public pages can show
+
+    Whole rows are hashed: most models have no updated_at, and
+    queryset.update() leaves it alone where they do.
+    """
+    digest = hashlib.sha256()
+    for model in apps.get_app_config('core').get_models():
+        if issubclass(model, PAGE_CACHE_EXEMPT):
+            continue
+        columns = [
+            field.attname for field in model._meta.concrete_fields
+            if (model, field.name) not in IGNORED_COLUMNS
+        ]
+        digest.update(model._meta.label.encode('utf-8'))
+        for row in model.objects.order_by('pk').values_list(*columns).iterator(chunk_size=2000):
+            digest.update(json.dumps(row, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class Command(BaseCommand):
+    help = 'Renders every public page to static HTML with .gz/.br siblings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=str(settings.BASE_DIR / 'build'), help='Output directory')
+        parser.add_argument('--base-url', default='http://localhost', help='Scheme and host for absolute links')
+        parser.add_argument('--full', action='store_true', help='Ignore the manifest and render every page')
+
+    def handle(self, *args, **options):
+        output = Path(options['output'])
+        base = urlsplit(options['base_url'])
+        if base.scheme not in ('http', 'https') or not base.hostname:
+            raise CommandError('--base-url must look like https://example.com')
+
+        manifest_path = output / MANIFEST_NAME
+        manifest = {}
+        if manifest_path.exists() and not options['full']:
+            manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+
+        pages = self.collect_pages(options['base_url'])
+        factory = RequestFactory(
+            SERVER_NAME=base.hostname,
+            SERVER_PORT=str(base.port or (443 if base.scheme == 'https' else 80)),
+        )
+        rendered = skipped = 0
+
+        with override_settings(
+            ALLOWED_HOSTS=[base.hostname],
+            ESSAYS_PER_PAGE=ALL_ROWS,
+            GALLERY_PER_PAGE=ALL_ROWS,
+            GALLERY_API_MAX_LIMIT=ALL_ROWS,
+        ):
+            for url, page_fingerprint in pages.items():
+                if manifest.get(url, {}).get('fingerprint') == page_fingerprint:
+                    skipped += 1
+                    continue
+                html = self.render(factory, url, secure=base.scheme == 'https')
+                self.write_page(output, url, html)
+                manifest[url] = {'fingerprint': page_fingerprint}
+                rendered += 1
+
+        removed = [url for url in manifest if url not in pages]
+        for url in removed:
+            self.remove_page(output, url)
+            del manifest[url]
+
+        output.mkdir(parents=True, exist_ok=True)
+        self.write_atomic(manifest_path, json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Rendered {rendered} page(s), {skipped} unchanged, removed {len(removed)} '
+            f'into {output}'
+        ))
+        if brotli is None:
+            self.stdout.write(self.style.WARNING('brotli is not installed; wrote .gz siblings only'))
+
+    def collect_pages(self, base_url):
+        """{url: fingerprint} for every page that should exist"""
+        # Absolute share links embed the base URL
+        templates = (template_version(), base_url)
+        state = content_state()
+        pages = {reverse(name): fingerprint(name, templates, state) for name in LISTING_PAGES}
+
+        related_articles = {}
+        for link in RelatedArticle.objects.select_related('related').only(
+            'article_id', 'rank', 'related__id', 'related__updated_at',
+        ).order_by('article_id', 'rank'):
+            related_articles.setdefault(link.article_id, []).append((link.related_id, link.related.updated_at))
+
+        for pk, slug, updated_at in Article.objects.published().values_list('pk', 'slug', 'updated_at'):
+            # Without stored neighbours the page falls back to the latest essays
+            related = related_articles.get(pk) or state
+            pages[reverse('article_detail', args=[slug])] = fingerprint(
+                'article', templates, updated_at, related,
+            )
+
+        related_projects = {}
+        for link in RelatedProject.objects.select_related('related').only(
+            'project_id', 'overlap', 'related__id', 'related__updated_at',
+        ).order_by('project_id', 'related_id'):
+            related_projects.setdefault(link.project_id, []).append(
+                (link.related_id, link.overlap, link.related.updated_at)
+            )
+
+        for pk, updated_at in Experience.objects.filter(type='project').values_list('pk', 'updated_at'):
+            related = related_projects.get(pk) or state
+            pages[reverse('project_detail', args=[pk])] = fingerprint(
+                'project', templates, updated_at, related,
+            )
+        return pages
+
+    def render(self, factory, url, secure):
+        request = factory.get(url, secure=secure)
+        match = resolve(url)
+        # Skip the page-cache and conditional-GET decorators; always render fresh
+        view = inspect.unwrap(match.func)
+        response = view(request, *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        if response.status_code != 200:
+            raise CommandError(f'{url} returned {response.status_code}')
+        html = response.content.decode(response.charset)
+        # A baked-in token would be shared by every visitor and never validate
+        return CSRF_INPUT_RE.sub(r'\g<1>\g<2>', html)
+
+    def page_path(self, output, url):
+        return output / url.strip('/') / 'index.html'
+
+    def write_page(self, output, url, html):
+        path = self.page_path(output, url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = html.encode('utf-8')
+        self.write_atomic(path, data)
+        self.write_atomic(path.with_name(path.name + '.gz'), gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            self.write_atomic(path.with_name(path.name + '.br'), brotli.compress(data))
+
+    def remove_page(self, output, url):
+        path = self.page_path(output, url)
+        for candidate in (path, path.with_name(path.name + '.gz'), path.with_name(path.name + '.br')):
+            candidate.unlink(missing_ok=True)
+        try:
+            path.parent.rmdir()
+        except OSError:
+            pass  # Not empty (nested pages) or already gone
+
+    def write_atomic(self, path, data):
+        tmp = path.with_name(path.name + '.tmp')
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
@@ -0,0 +1,100 @@
+"""
+Management command to delete media blobs nothing references
+
+Uploads are content-addressed and shared between rows (core.storage), so
+deleting a row or replacing its file leaves the blob behind. This removes
+the blobs no row points at, with their generated thumbnail and responsive
+variants. Files younger than --min-age hours are kept, since the row that
+will reference them may still be being saved.
+
+Usage: python manage.py gc_media [--dry-run] [--min-age 24]
+"""
+import os
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db.models import FileField
+from core.models import GalleryItem, ImageVariant
+from core.storage import ContentAddressedStorage, content_addressed_storage, is_blob_name
+from core.tasks import generated_thumbnail_name
+
+
+class Command(BaseCommand):
+    help = 'Deletes unreferenced content-addressed media and its derivatives'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='List what would be deleted')
+        parser.add_argument('--min-age', type=float, default=24, help='Hours before an orphan may be deleted')
+
+    def handle(self, *args, **options):
+        storage = content_addressed_storage
+        cutoff = time.time() - options['min_age'] * 3600
+        directories, referenced = self.references()
+
+        orphans = []
+        for name, path in self.walk(storage, directories):
+            try:
+                modified = os.path.getmtime(path)
+            except FileNotFoundError:
+                continue
+            if modified > cutoff:
+                continue
+            if os.path.basename(name).startswith('.upload-'):
+                orphans.append(name)  # Left behind by an interrupted upload
+            elif is_blob_name(name) and name not in referenced:
+                orphans.append(name)
+
+        thumbnails = set(GalleryItem.objects.exclude(thumbnail='').values_list('thumbnail', flat=True))
+        freed = 0
+        for name in orphans:
+            derived = [variant.file.name for variant in ImageVariant.objects.filter(source=name)]
+            thumbnail = generated_thumbnail_name(name)
+            if thumbnail not in thumbnails and storage.exists(thumbnail):
+                derived.append(thumbnail)
+
+            if options['dry_run']:
+                self.stdout.write(f'  {name}' + (f' (+{len(derived)} derived)' if derived else ''))
+                continue
+            for file_name in [name] + derived:
+                try:
+                    freed += storage.size(file_name)
+                except FileNotFoundError:
+                    continue
+                storage.delete(file_name)
+            ImageVariant.objects.filter(source=name).delete()
+
+        if options['dry_run']:
+            self.stdout.write(f'{len(orphans)} orphaned file(s) would be deleted')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Deleted {len(orphans)} orphaned file(s), freed {freed / 1024 / 1024:.1f} MB'
+        ))
+
+    def references(self):
+        """Upload directories of content-addressed fields, and every name they store"""
+        directories = set()
+        referenced = set()
+        for model in apps.get_app_config('core').get_models():
+            for field in model._meta.get_fields():
+                if not isinstance(field, FileField) or not isinstance(field.storage, ContentAddressedStorage):
+                    continue
+                directories.add(field.upload_to)
+                referenced.update(
+                    model.objects.exclude(**{field.name: ''}).exclude(**{f'{field.name}__isnull': True})
+                    .values_list(field.name, flat=True)
+                )
+        return directories, referenced
+
+    def walk(self, storage, directories):
+        """(storage name, filesystem path) of every file under the directories"""
+        seen = set()
+        for directory in sorted(directories):
+            root = storage.path(directory)
+            for dirpath, _, filenames in os.walk(root):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    name = os.path.relpath(path, storage.location).replace(os.sep, '/')
+                    if name not in seen:
+                        seen.add(name)
+                        yield name, path
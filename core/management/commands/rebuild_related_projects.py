@@ -0,0 +1,18 @@
+"""
+Management command to rebuild the related-projects table
+
+Usage: python manage.py rebuild_related_projects
+"""
+from django.core.management.base import BaseCommand
+from core.cache import bump_content_version
+from core.models import RelatedProject
+
+
+class Command(BaseCommand):
+    help = 'Recomputes tech-stack overlap between all projects'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write('Rebuilding related projects...')
+        count = RelatedProject.rebuild_all()
+        bump_content_version()
+        self.stdout.write(self.style.SUCCESS(f'✓ Stored {count} related-project link(s)'))
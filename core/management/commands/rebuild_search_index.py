@@ -0,0 +1,26 @@
+"""
+Management command to rebuild the essay full-text search index
+
+Sync triggers dropped by a table rebuild are re-created first.
+
+Usage: python manage.py rebuild_search_index
+"""
+from django.core.management.base import BaseCommand, CommandError
+from core.search import fts_available, rebuild_fts_index, restore_fts_triggers
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the SQLite FTS5 index used by essay search'
+
+    def handle(self, *args, **kwargs):
+        restored = restore_fts_triggers()
+        if restored:
+            self.stdout.write(self.style.WARNING(f'Restored missing sync trigger(s): {", ".join(restored)}'))
+        if not fts_available():
+            raise CommandError(
+                'FTS index not found. It is only created on SQLite; run migrate first.'
+            )
+
+        self.stdout.write('Rebuilding FTS index...')
+        count = rebuild_fts_index()
+        self.stdout.write(self.style.SUCCESS(f'✓ Indexed {count} article(s)'))
@@ -0,0 +1,185 @@
+"""
+Management command to regenerate image derivatives in bulk
+
+Rebuilds gallery thumbnails and the responsive variants of gallery images
+and article featured images, e.g. after changing THUMBNAIL_SIZE or the
+IMAGE_VARIANT_* settings. Images are decoded and encoded on a process pool
+(one worker per core by default); the database is written in batches with
+bulk_update/bulk_create.
+
+Rows sharing a deduplicated upload (core.storage) share one task: the
+derivatives are rendered once and recorded on every row, so no two
+workers ever write the same file names.
+
+Progress is checkpointed after every batch. An interrupted run started
+again with the same options skips the images already done; pass --restart
+to start over. Thumbnails uploaded by hand are never replaced.
+
+Usage: python manage.py regenerate_images [--only-missing] [--since 2025-01-01] [--dry-run] [--workers 4]
+"""
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from core.cache import bump_content_version
+from core.models import Article, GalleryItem, ImageVariant
+from core.tasks import is_generated_thumbnail, render_thumbnail, render_variants, save_variants
+
+
+CHECKPOINT = settings.BASE_DIR / '.regenerate_images.json'
+
+
+def parse_since(value):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        moment = timezone.datetime.combine(day, timezone.datetime.min.time())
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def process(task):
+    """Runs in a pool process: write the files, return what to record"""
+    image_name, thumbnail_pks, variants = task
+    result = {
+        'source': image_name, 'thumbnail_pks': thumbnail_pks, 'thumbnail': None, 'variants': None, 'error': None,
+    }
+    try:
+        if thumbnail_pks:
+            result['thumbnail'] = render_thumbnail(image_name)
+        if variants:
+            result['variants'] = render_variants(image_name)
+    except Exception as exc:  # One bad image must not stop the run
+        result['error'] = f'{type(exc).__name__}: {exc}'
+    return result
+
+
+class Command(BaseCommand):
+    help = 'Regenerates thumbnails and responsive variants on a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only-missing', action='store_true', help='Only create derivatives that do not exist')
+        parser.add_argument('--since', type=parse_since, help='Only images added/edited since this date')
+        parser.add_argument('--dry-run', action='store_true', help='List what would be regenerated')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--batch-size', type=int, default=50, help='Results per database write/checkpoint')
+        parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint of an interrupted run')
+
+    def handle(self, *args, **options):
+        tasks = self.collect_tasks(options)
+
+        run_id = hashlib.sha256(json.dumps(
+            [options['only_missing'], str(options['since'])], sort_keys=True,
+        ).encode('utf-8')).hexdigest()
+        done = set()
+        if CHECKPOINT.exists() and not options['restart']:
+            checkpoint = json.loads(CHECKPOINT.read_text(encoding='utf-8'))
+            if checkpoint.get('run') == run_id:
+                done = set(checkpoint['done'])
+                self.stdout.write(f'Resuming: {len(done)} image(s) already done')
+            else:
+                self.stdout.write(self.style.WARNING('Ignoring checkpoint from a run with other options'))
+        tasks = [task for task in tasks if task[0] not in done]
+
+        thumbnails = sum(1 for task in tasks if task[1])
+        variants = sum(1 for task in tasks if task[2])
+        self.stdout.write(
+            f'{len(tasks)} image(s) to process: {thumbnails} thumbnail(s), {variants} variant set(s)'
+        )
+        if options['dry_run']:
+            for image_name, thumbnail_pks, variant in tasks:
+                parts = [
+                    part for part, wanted in (
+                        (f'thumbnail for {len(thumbnail_pks)} item(s)', thumbnail_pks), ('variants', variant),
+                    ) if wanted
+                ]
+                self.stdout.write(f'  {image_name} ({", ".join(parts)})')
+            return
+        if not tasks:
+            CHECKPOINT.unlink(missing_ok=True)
+            self.stdout.write(self.style.SUCCESS('✓ Nothing to regenerate'))
+            return
+
+        # Forked workers must not share the parent's database connection
+        connections.close_all()
+        pending = []
+        failed = 0
+        with ProcessPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            futures = [pool.submit(process, task) for task in tasks]
+            for completed, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                if result['error']:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(f'✗ {result["source"]}: {result["error"]}'))
+                else:
+                    pending.append(result)
+                if len(pending) >= options['batch_size'] or completed == len(futures):
+                    self.flush(pending, done, run_id)
+                    pending = []
+                    self.stdout.write(f'  {completed}/{len(futures)} processed')
+
+        CHECKPOINT.unlink(missing_ok=True)
+        bump_content_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Regenerated {len(tasks) - failed} image(s), {failed} failed'
+        ))
+
+    def collect_tasks(self, options):
+        """[(image name, ids of gallery items needing its thumbnail, variants?), ...], one per image"""
+        gallery = GalleryItem.objects.exclude(image='').only('id', 'image', 'thumbnail')
+        articles = Article.objects.exclude(featured_image='').exclude(featured_image__isnull=True).only(
+            'id', 'featured_image',
+        )
+        if options['since']:
+            gallery = gallery.filter(created_at__gte=options['since'])
+            articles = articles.filter(updated_at__gte=options['since'])
+
+        thumbnail_pks = {}
+        for item in gallery.order_by('id'):
+            pks = thumbnail_pks.setdefault(item.image.name, [])
+            if item.thumbnail and not is_generated_thumbnail(item):
+                continue  # Uploaded by hand
+            if not (options['only_missing'] and item.thumbnail):
+                pks.append(item.pk)
+        for article in articles.order_by('id'):
+            thumbnail_pks.setdefault(article.featured_image.name, [])
+        with_variants = set(
+            ImageVariant.objects.filter(source__in=list(thumbnail_pks))
+            .values_list('source', flat=True).distinct()
+        )
+
+        tasks = []
+        for image_name, pks in thumbnail_pks.items():
+            variants = not (options['only_missing'] and image_name in with_variants)
+            if pks or variants:
+                tasks.append((image_name, pks, variants))
+        return tasks
+
+    def flush(self, results, done, run_id):
+        """Record a batch of results, then checkpoint them"""
+        thumbnails = {
+            pk: result['thumbnail']
+            for result in results if result['thumbnail']
+            for pk in result['thumbnail_pks']
+        }
+        if thumbnails:
+            items = list(GalleryItem.objects.filter(pk__in=thumbnails).only('id', 'thumbnail'))
+            for item in items:
+                item.thumbnail = thumbnails[item.pk]
+            GalleryItem.objects.bulk_update(items, ['thumbnail'], batch_size=500)
+
+        variants = {result['source']: result['variants'] for result in results if result['variants'] is not None}
+        if variants:
+            save_variants(variants)
+
+        done.update(result['source'] for result in results)
+        CHECKPOINT.write_text(json.dumps({'run': run_id, 'done': sorted(done)}), encoding='utf-8')
@@ -0,0 +1,54 @@
+"""
+Management command to backfill pre-rendered article HTML
+
+Usage: python manage.py render_articles [--force]
+"""
+from django.core.management.base import BaseCommand
+from core.cache import bump_content_version
+from core.models import Article
+
+
+class Command(BaseCommand):
+    help = 'Renders Article markdown into content_html for rows with a stale or missing hash'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Re-render every article, even if its hash is current',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of rows written per bulk update',
+        )
+
+    def handle(self, *args, **options):
+        force = options['force']
+        batch_size = options['batch_size']
+
+        self.stdout.write('Rendering article content...')
+
+        articles = Article.objects.only('id', 'content', 'content_html', 'content_hash')
+        pending = []
+        rendered = 0
+
+        for article in articles.iterator(chunk_size=batch_size):
+            if article.refresh_content_html(force=force):
+                pending.append(article)
+            if len(pending) >= batch_size:
+                rendered += self.flush(pending)
+        rendered += self.flush(pending)
+        if rendered:
+            bump_content_version()
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Rendered {rendered} article(s)'))
+
+    def flush(self, pending):
+        # bulk_update skips save(), so updated_at is left untouched
+        count = len(pending)
+        if pending:
+            Article.objects.bulk_update(pending, ['content_html', 'content_hash'])
+            pending.clear()
+        return count
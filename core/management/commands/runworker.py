@@ -0,0 +1,97 @@
+"""
+Management command to run background jobs from the database queue
+
+Polls core.Job for due jobs and runs up to --concurrency of them at once
+on a thread pool. Failed jobs are retried with backoff (see core.jobs).
+Ctrl-C / SIGTERM stops claiming new jobs and waits for running ones.
+
+Usage: python manage.py runworker [--concurrency 2] [--poll 2] [--once]
+"""
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from core import jobs
+from core.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (thumbnails, ...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int,
+            default=getattr(settings, 'JOB_WORKER_CONCURRENCY', 2),
+            help='Jobs run at the same time',
+        )
+        parser.add_argument('--poll', type=float, default=2.0, help='Seconds between polls when idle')
+        parser.add_argument('--once', action='store_true', help='Exit when no due jobs are left')
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        stopping = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write('Stopping after running jobs finish...')
+            stopping.set()
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        self.stdout.write(f'Worker {worker} running up to {concurrency} job(s) at a time')
+        counts = {Job.DONE: 0, Job.PENDING: 0, Job.FAILED: 0}
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while not stopping.is_set():
+                released = jobs.release_stale()
+                if released:
+                    self.stdout.write(self.style.WARNING(f'Re-queued {released} job(s) from dead workers'))
+
+                free = concurrency - len(running)
+                if free:
+                    for job in jobs.claim(worker, free):
+                        running[pool.submit(self.run_job, job)] = job
+
+                if not running:
+                    if options['once']:
+                        break
+                    stopping.wait(options['poll'])
+                    continue
+
+                done, _ = wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = running.pop(future)
+                    outcome = future.result()
+                    counts[outcome] += 1
+                    self.report(job, outcome)
+
+            for future in wait(running).done:
+                job = running.pop(future)
+                outcome = future.result()
+                counts[outcome] += 1
+                self.report(job, outcome)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {counts[Job.DONE]} done, {counts[Job.PENDING]} retrying, {counts[Job.FAILED]} failed'
+        ))
+
+    def run_job(self, job):
+        try:
+            return jobs.run(job)
+        finally:
+            # Connections are per thread; close this pool thread's one
+            connections.close_all()
+
+    def report(self, job, outcome):
+        if outcome == Job.DONE:
+            self.stdout.write(self.style.SUCCESS(f'✓ {job.kind} #{job.pk}'))
+        elif outcome == Job.PENDING:
+            self.stdout.write(self.style.WARNING(f'↻ {job.kind} #{job.pk} failed attempt {job.attempts}, will retry'))
+        else:
+            self.stdout.write(self.style.ERROR(f'✗ {job.kind} #{job.pk} failed after {job.attempts} attempt(s)'))
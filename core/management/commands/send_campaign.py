@@ -0,0 +1,215 @@
+"""
+Management command to send a newsletter campaign
+
+First records a pending Delivery for every active subscriber: subscribers
+are streamed with iterator() and inserted with bulk_create(ignore_conflicts),
+so a later run only adds people who subscribed since. Pending deliveries
+are then sent in batches on a small thread pool; each batch opens one
+connection to the mail server and reuses it for all its messages, and a
+shared rate limiter keeps the total under --rate messages per second.
+
+A delivery is claimed (pending -> sending) right before its message goes
+out and marked sent right after. Running the command again after a crash
+or Ctrl-C carries on with the pending ones and mails nobody twice;
+deliveries left "sending" were interrupted mid-send and are reported
+rather than retried. --retry-failed queues failed deliveries again.
+
+Usage: python manage.py send_campaign <campaign id> [--rate 10] [--workers 4] [--batch-size 50] [--retry-failed]
+"""
+import smtplib
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from core.models import Campaign, Delivery, NewsletterSubscriber
+
+
+class RateLimiter:
+    """Spaces wait() calls at least 1/rate seconds apart, across threads"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        time.sleep(slot - now)
+
+
+class SendAborted(Exception):
+    """The mail server connection failed; the rest of the batch stays pending"""
+
+    def __init__(self, message, sent=0, failed=0):
+        super().__init__(message)
+        self.sent = sent
+        self.failed = failed
+
+
+def build_message(campaign, email, mail_connection):
+    message = EmailMultiAlternatives(
+        subject=campaign.subject,
+        body=campaign.body_text,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[email],
+        connection=mail_connection,
+    )
+    if campaign.body_html:
+        message.attach_alternative(campaign.body_html, 'text/html')
+    return message
+
+
+def send_batch(campaign, batch, limiter):
+    """
+    Runs on a pool thread: send [(delivery pk, email), ...] over one connection
+
+    Returns (sent, failed). Raises SendAborted if the server goes away.
+    """
+    sent = failed = 0
+    try:
+        with get_connection(fail_silently=False) as mail_connection:
+            for pk, email in batch:
+                # Losing the claim means another run has this delivery
+                if not Delivery.objects.filter(pk=pk, status=Delivery.PENDING).update(status=Delivery.SENDING):
+                    continue
+                limiter.wait()
+                try:
+                    mail_connection.send_messages([build_message(campaign, email, mail_connection)])
+                except smtplib.SMTPRecipientsRefused as exc:
+                    Delivery.objects.filter(pk=pk).update(status=Delivery.FAILED, error=str(exc))
+                    failed += 1
+                    continue
+                except (smtplib.SMTPException, OSError) as exc:
+                    # May or may not have gone out; only --retry-failed sends it again
+                    Delivery.objects.filter(pk=pk).update(status=Delivery.FAILED, error=str(exc))
+                    raise SendAborted(f'{email}: {exc}', sent, failed + 1) from exc
+                Delivery.objects.filter(pk=pk).update(status=Delivery.SENT, error='', sent_at=timezone.now())
+                sent += 1
+    except (smtplib.SMTPException, OSError) as exc:
+        raise SendAborted(str(exc), sent, failed) from exc  # Could not connect, or lost the connection
+    finally:
+        connection.close()
+    return sent, failed
+
+
+class Command(BaseCommand):
+    help = 'Sends a newsletter campaign to all active subscribers, resumably'
+
+    def add_arguments(self, parser):
+        parser.add_argument('campaign', type=int, help='Campaign id')
+        parser.add_argument(
+            '--rate', type=float, default=getattr(settings, 'NEWSLETTER_SEND_RATE', 10),
+            help='Messages per second at most (0 for no limit)',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=getattr(settings, 'NEWSLETTER_SEND_WORKERS', 4),
+            help='Batches sent at the same time, each over its own connection',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=getattr(settings, 'NEWSLETTER_BATCH_SIZE', 50),
+            help='Messages per connection',
+        )
+        parser.add_argument('--retry-failed', action='store_true', help='Send failed deliveries again')
+
+    def handle(self, *args, **options):
+        campaign = Campaign.objects.filter(pk=options['campaign']).first()
+        if campaign is None:
+            raise CommandError(f'No campaign with id {options["campaign"]}')
+        if campaign.status == Campaign.SENT and not options['retry_failed']:
+            raise CommandError('Campaign already sent; pass --retry-failed to resend its failed deliveries')
+        batch_size = max(1, options['batch_size'])
+
+        # A finished campaign is not sent to people who subscribed after it
+        if campaign.status != Campaign.SENT:
+            added = self.add_recipients(campaign, batch_size)
+            self.stdout.write(f'{added} new recipient(s)')
+        if options['retry_failed']:
+            retried = campaign.deliveries.filter(status=Delivery.FAILED).update(status=Delivery.PENDING, error='')
+            self.stdout.write(f'Retrying {retried} failed delivery(ies)')
+        self.stdout.write(f'{campaign.deliveries.filter(status=Delivery.PENDING).count()} message(s) to send')
+
+        Campaign.objects.filter(pk=campaign.pk).update(
+            status=Campaign.SENDING, started_at=campaign.started_at or timezone.now(),
+        )
+        sent, failed, aborted = self.send(campaign, options, batch_size)
+
+        if not campaign.deliveries.filter(status=Delivery.PENDING).exists():
+            Campaign.objects.filter(pk=campaign.pk).update(status=Campaign.SENT, finished_at=timezone.now())
+        unconfirmed = campaign.deliveries.filter(status=Delivery.SENDING).count()
+        if unconfirmed:
+            self.stdout.write(self.style.WARNING(
+                f'{unconfirmed} delivery(ies) were interrupted mid-send and are not retried'
+            ))
+        if aborted:
+            self.stdout.write(self.style.ERROR(f'✗ Stopped: {aborted}. Run again to resume.'))
+        self.stdout.write(self.style.SUCCESS(f'✓ Sent {sent} message(s), {failed} failed'))
+
+    def add_recipients(self, campaign, batch_size):
+        """Pending deliveries for active subscribers not yet recorded; returns how many"""
+        before = campaign.deliveries.count()
+        subscribers = NewsletterSubscriber.objects.filter(is_active=True).values_list('pk', 'email')
+        chunk = []
+        for pk, email in subscribers.iterator(chunk_size=batch_size * 20):
+            chunk.append(Delivery(campaign=campaign, subscriber_id=pk, email=email))
+            if len(chunk) >= batch_size * 20:
+                Delivery.objects.bulk_create(chunk, ignore_conflicts=True)
+                chunk = []
+        Delivery.objects.bulk_create(chunk, ignore_conflicts=True)
+        return campaign.deliveries.count() - before
+
+    def pending_batches(self, campaign, batch_size):
+        """
+        Pending deliveries in batches, paged by id
+
+        Each page is read in full rather than through an open cursor, which
+        on SQLite would block the pool threads' writes.
+        """
+        last = 0
+        while True:
+            batch = list(
+                campaign.deliveries.filter(status=Delivery.PENDING, pk__gt=last)
+                .order_by('pk').values_list('pk', 'email')[:batch_size]
+            )
+            if not batch:
+                return
+            last = batch[-1][0]
+            yield batch
+
+    def send(self, campaign, options, batch_size):
+        limiter = RateLimiter(options['rate'])
+        workers = max(1, options['workers'])
+        sent = failed = 0
+        aborted = None
+        batches = self.pending_batches(campaign, batch_size)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            running = set()
+            while True:
+                # Keep a couple of batches queued per worker, no more
+                while aborted is None and len(running) < workers * 2:
+                    batch = next(batches, None)
+                    if batch is None:
+                        break
+                    running.add(pool.submit(send_batch, campaign, batch, limiter))
+                if not running:
+                    break
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        batch_sent, batch_failed = future.result()
+                    except SendAborted as exc:
+                        aborted = aborted or str(exc)
+                        batch_sent, batch_failed = exc.sent, exc.failed
+                    sent += batch_sent
+                    failed += batch_failed
+                    self.stdout.write(f'  {sent} sent, {failed} failed')
+        return sent, failed, aborted
@@ -0,0 +1,69 @@
+# Full-text search index for essays (SQLite FTS5 only)
+
+from django.db import migrations
+
+
+FTS_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS core_article_fts USING fts5(
+        title, excerpt, content, tags,
+        tokenize = 'porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_article_fts_ai AFTER INSERT ON core_article BEGIN
+        INSERT INTO core_article_fts(rowid, title, excerpt, content, tags)
+        VALUES (new.id, new.title, new.excerpt, new.content, new.tags);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_article_fts_ad AFTER DELETE ON core_article BEGIN
+        DELETE FROM core_article_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_article_fts_au AFTER UPDATE OF title, excerpt, content, tags
+    ON core_article BEGIN
+        DELETE FROM core_article_fts WHERE rowid = old.id;
+        INSERT INTO core_article_fts(rowid, title, excerpt, content, tags)
+        VALUES (new.id, new.title, new.excerpt, new.content, new.tags);
+    END
+    """,
+    """
+    INSERT INTO core_article_fts(rowid, title, excerpt, content, tags)
+    SELECT id, title, excerpt, content, tags FROM core_article
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS core_article_fts_au",
+    "DROP TRIGGER IF EXISTS core_article_fts_ad",
+    "DROP TRIGGER IF EXISTS core_article_fts_ai",
+    "DROP TABLE IF EXISTS core_article_fts",
+]
+
+
+def create_fts(apps, schema_editor):
+    # Other databases keep using the icontains search path
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in FTS_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_article_content_html"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
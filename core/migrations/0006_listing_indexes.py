@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_article_fts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['status', '-published_date', '-id'], name='article_listing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='galleryitem',
+            index=models.Index(fields=['is_visible', 'order', '-created_at', '-id'], name='gallery_listing_idx'),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def normalize_tech(tech_stack):
+    """Same rules as core.models.normalize_tech, frozen for this migration"""
+    keys = {" ".join(str(tech).split()).lower()[:100].rstrip() for tech in tech_stack or []}
+    keys.discard("")
+    return keys
+
+
+def backfill_related_projects(apps, schema_editor):
+    Experience = apps.get_model("core", "Experience")
+    RelatedProject = apps.get_model("core", "RelatedProject")
+
+    projects = [
+        (project.pk, normalize_tech(project.tech_stack))
+        for project in Experience.objects.filter(type="project")
+    ]
+    links = []
+    for i, (pk, stack) in enumerate(projects):
+        for other_pk, other_stack in projects[i + 1 :]:
+            overlap = len(stack & other_stack)
+            if overlap:
+                links.append(
+                    RelatedProject(project_id=pk, related_id=other_pk, overlap=overlap)
+                )
+                links.append(
+                    RelatedProject(project_id=other_pk, related_id=pk, overlap=overlap)
+                )
+    RelatedProject.objects.bulk_create(links, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_listing_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RelatedProject",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("overlap", models.PositiveIntegerField()),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="related_links",
+                        to="core.experience",
+                    ),
+                ),
+                (
+                    "related",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="core.experience",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["project", "-overlap"], name="related_project_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("project", "related"), name="unique_related_project"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_related_projects, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,232 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:20
+
+from importlib import import_module
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def normalize(name):
+    return " ".join(str(name).split()).lower()[:100].rstrip()
+
+
+def copy_json_tags(apps, schema_editor):
+    """Fill the Tag tables from the existing JSON tags/tech_stack fields"""
+    Tag = apps.get_model("core", "Tag")
+    sources = [
+        ("Experience", "tech_stack", "ExperienceTag", "experience_id"),
+        ("Article", "tags", "ArticleTag", "article_id"),
+        ("GalleryItem", "tags", "GalleryItemTag", "gallery_item_id"),
+    ]
+
+    tags = {}
+    links = {through: set() for _, _, through, _ in sources}
+    for model_name, field, through, fk in sources:
+        model = apps.get_model("core", model_name)
+        for pk, names in model.objects.values_list("pk", field):
+            for name in names or []:
+                key = normalize(name)
+                if not key:
+                    continue
+                if key not in tags:
+                    tags[key] = Tag(name=" ".join(str(name).split())[:100].rstrip(), key=key)
+                links[through].add((pk, key))
+
+    Tag.objects.bulk_create(tags.values(), batch_size=500)
+    tag_ids = dict(Tag.objects.values_list("key", "pk"))
+
+    for _, _, through, fk in sources:
+        model = apps.get_model("core", through)
+        model.objects.bulk_create(
+            [model(**{fk: pk, "tag_id": tag_ids[key]}) for pk, key in links[through]],
+            batch_size=500,
+        )
+
+
+def restore_fts_triggers(apps, schema_editor):
+    """
+    Re-create 0005's FTS triggers and re-index every article
+
+    Adding or removing Article.normalized_tags makes SQLite rebuild
+    core_article, which drops the triggers on it.
+    """
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    fts = import_module("core.migrations.0005_article_fts")
+    schema_editor.execute(fts.FTS_SQL[0])
+    schema_editor.execute("DELETE FROM core_article_fts")
+    for sql in fts.FTS_SQL[1:]:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_relatedproject"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        help_text="Display name, as first entered", max_length=100
+                    ),
+                ),
+                (
+                    "key",
+                    models.CharField(
+                        help_text="Lowercased name used for case-insensitive lookups",
+                        max_length=100,
+                        unique=True,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["name"],
+            },
+        ),
+        migrations.CreateModel(
+            name="GalleryItemTag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "gallery_item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="core.galleryitem",
+                    ),
+                ),
+                (
+                    "tag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="core.tag"
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ExperienceTag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "experience",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="core.experience",
+                    ),
+                ),
+                (
+                    "tag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="core.tag"
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ArticleTag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "article",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="core.article"
+                    ),
+                ),
+                (
+                    "tag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="core.tag"
+                    ),
+                ),
+            ],
+        ),
+        # Run backwards after RemoveField has rebuilt the table
+        migrations.RunPython(migrations.RunPython.noop, restore_fts_triggers),
+        migrations.AddField(
+            model_name="article",
+            name="normalized_tags",
+            field=models.ManyToManyField(
+                blank=True,
+                related_name="articles",
+                through="core.ArticleTag",
+                to="core.tag",
+            ),
+        ),
+        migrations.RunPython(restore_fts_triggers, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name="experience",
+            name="normalized_tags",
+            field=models.ManyToManyField(
+                blank=True,
+                related_name="experiences",
+                through="core.ExperienceTag",
+                to="core.tag",
+            ),
+        ),
+        migrations.AddField(
+            model_name="galleryitem",
+            name="normalized_tags",
+            field=models.ManyToManyField(
+                blank=True,
+                related_name="gallery_items",
+                through="core.GalleryItemTag",
+                to="core.tag",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="galleryitemtag",
+            constraint=models.UniqueConstraint(
+                fields=("tag", "gallery_item"), name="unique_gallery_item_tag"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="experiencetag",
+            constraint=models.UniqueConstraint(
+                fields=("tag", "experience"), name="unique_experience_tag"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="articletag",
+            constraint=models.UniqueConstraint(
+                fields=("tag", "article"), name="unique_article_tag"
+            ),
+        ),
+        migrations.RunPython(copy_json_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_tags"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="article",
+            name="related_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="Hash of the text related essays were last computed from",
+                max_length=64,
+            ),
+        ),
+        migrations.CreateModel(
+            name="RelatedArticle",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "score",
+                    models.FloatField(help_text="Cosine similarity of TF-IDF vectors"),
+                ),
+                ("rank", models.PositiveSmallIntegerField()),
+                (
+                    "article",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="related_links",
+                        to="core.article",
+                    ),
+                ),
+                (
+                    "related",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="core.article",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["article", "rank"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("article", "rank"), name="unique_related_article_rank"
+                    )
+                ],
+            },
+        ),
+    ]
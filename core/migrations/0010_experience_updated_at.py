@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_relatedarticle"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="experience",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_imagevariant"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="article",
+            name="featured_image_color",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="Dominant colour, #rrggbb",
+                max_length=7,
+            ),
+        ),
+        migrations.AddField(
+            model_name="article",
+            name="featured_image_height",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="article",
+            name="featured_image_lqip",
+            field=models.TextField(
+                blank=True, editable=False, help_text="Tiny base64 blur placeholder"
+            ),
+        ),
+        migrations.AddField(
+            model_name="article",
+            name="featured_image_orientation",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("landscape", "Landscape"),
+                    ("portrait", "Portrait"),
+                    ("square", "Square"),
+                ],
+                editable=False,
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="article",
+            name="featured_image_width",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="galleryitem",
+            name="image_color",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="Dominant colour, #rrggbb",
+                max_length=7,
+            ),
+        ),
+        migrations.AddField(
+            model_name="galleryitem",
+            name="image_height",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="galleryitem",
+            name="image_lqip",
+            field=models.TextField(
+                blank=True, editable=False, help_text="Tiny base64 blur placeholder"
+            ),
+        ),
+        migrations.AddField(
+            model_name="galleryitem",
+            name="image_orientation",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("landscape", "Landscape"),
+                    ("portrait", "Portrait"),
+                    ("square", "Square"),
+                ],
+                editable=False,
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="galleryitem",
+            name="image_width",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
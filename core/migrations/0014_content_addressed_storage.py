@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:50
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_image_metadata"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="article",
+            name="featured_image",
+            field=models.ImageField(
+                blank=True,
+                help_text="Main image shown at top of article",
+                null=True,
+                storage=core.storage.ContentAddressedStorage(),
+                upload_to="articles/images/",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="galleryitem",
+            name="image",
+            field=models.ImageField(
+                storage=core.storage.ContentAddressedStorage(), upload_to="gallery/"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="galleryitem",
+            name="thumbnail",
+            field=models.ImageField(
+                blank=True,
+                help_text="Optional thumbnail (will use main image if not provided)",
+                null=True,
+                storage=core.storage.ContentAddressedStorage(),
+                upload_to="gallery/thumbnails/",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="resume",
+            name="resume_file",
+            field=models.FileField(
+                help_text="Upload PDF resume",
+                storage=core.storage.ContentAddressedStorage(),
+                upload_to="resume/",
+            ),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_content_addressed_storage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="article",
+            name="views",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, help_text="Total page views"
+            ),
+        ),
+        migrations.CreateModel(
+            name="ArticleViewDay",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("views", models.PositiveIntegerField(default=0)),
+                (
+                    "article",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="view_days",
+                        to="core.article",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["article", "-date"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("article", "date"), name="unique_article_view_day"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_article_views"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="article",
+            name="popularity",
+            field=models.FloatField(
+                default=0,
+                editable=False,
+                help_text="Time-decayed views relative to core.popularity.EPOCH (update_popularity)",
+            ),
+        ),
+        migrations.AddField(
+            model_name="articleviewday",
+            name="folded",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Views already added to Article.popularity"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(
+                fields=["status", "-popularity", "-id"], name="article_popular_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:34
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def date_published_articles(apps, schema_editor):
+    """Published rows saved without a date (e.g. by queryset.update) get their creation time"""
+    Article = apps.get_model("core", "Article")
+    Article.objects.filter(status="published", published_date__isnull=True).update(
+        published_date=F("created_at")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0017_campaign"),
+    ]
+
+    operations = [
+        migrations.RunPython(date_published_articles, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name="galleryitem",
+            name="gallery_listing_idx",
+        ),
+        migrations.AddIndex(
+            model_name="galleryitem",
+            index=models.Index(
+                condition=models.Q(("is_visible", True)),
+                fields=["order", "-created_at", "-id"],
+                name="gallery_listing_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="article",
+            constraint=models.CheckConstraint(
+                condition=models.Q(
+                    models.Q(("status", "published"), _negated=True),
+                    ("published_date__isnull", False),
+                    _connector="OR",
+                ),
+                name="article_published_has_date",
+            ),
+        ),
+    ]
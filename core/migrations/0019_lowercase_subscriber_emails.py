@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:52
+
+from django.db import migrations
+from django.db.models import F
+from django.db.models.functions import Lower
+
+
+def lowercase_emails(apps, schema_editor):
+    """Store addresses lowercased, merging subscribers that differ only in case"""
+    NewsletterSubscriber = apps.get_model("core", "NewsletterSubscriber")
+    Delivery = apps.get_model("core", "Delivery")
+
+    mixed_case = (
+        NewsletterSubscriber.objects.annotate(lowercased=Lower("email"))
+        .exclude(email=F("lowercased"))
+        .order_by("subscribed_at", "pk")
+    )
+    for subscriber in mixed_case:
+        email = subscriber.email.strip().lower()
+        kept = NewsletterSubscriber.objects.filter(email=email).first()
+        if kept is None:
+            subscriber.email = email
+            subscriber.save(update_fields=["email"])
+            continue
+        # Keep the delivery history, except for campaigns both addresses got
+        Delivery.objects.filter(subscriber=subscriber).exclude(
+            campaign__in=Delivery.objects.filter(subscriber=kept).values("campaign")
+        ).update(subscriber=kept)
+        if subscriber.is_active and not kept.is_active:
+            kept.is_active = True
+            kept.save(update_fields=["is_active"])
+        subscriber.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0018_keyset_seek_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_emails, migrations.RunPython.noop),
+    ]
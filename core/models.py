@@ -4,6 +4,29 @@ from django.db import models
 from django.utils import timezone
 from django.utils.text import slugify
 from django.urls import reverse
+from django.utils.safestring import mark_safe
+
+from .rendering import render_markdown, render_markdown_cached, markdown_hash
+from .popularity import popularity_floor
+from .storage import content_addressed_storage
+
+
+# Shape of an uploaded image once EXIF rotation is applied (core.images.describe)
+IMAGE_ORIENTATIONS = [
+    ('landscape', 'Landscape'),
+    ('portrait', 'Portrait'),
+    ('square', 'Square'),
+]
+
+
+def normalize_email(email):
+    """
+    How a subscriber's address is stored
+    
+    Lowercased whole, so the unique constraint on email also catches
+    Foo@example.com against foo@example.com
+    """
+    return email.strip().lower()
 
 
 class NewsletterSubscriber(models.Model):
@@ -16,6 +39,93 @@ class NewsletterSubscriber(models.Model):
     
     def __str__(self):
         return self.email
+    
+    def save(self, *args, **kwargs):
+        self.email = normalize_email(self.email)
+        super().save(*args, **kwargs)
+
+
+class Campaign(models.Model):
+    """
+    A newsletter issue sent to every active subscriber
+    
+    Delivered by the send_campaign command, which records each recipient
+    as a Delivery so an interrupted send can resume.
+    """
+    
+    DRAFT = 'draft'
+    SENDING = 'sending'
+    SENT = 'sent'
+    STATUS_CHOICES = [
+        (DRAFT, 'Draft'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+    ]
+    
+    subject = models.CharField(max_length=200)
+    body_text = models.TextField(help_text="Plain-text body")
+    body_html = models.TextField(blank=True, help_text="Optional HTML body, sent as an alternative")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=DRAFT, editable=False)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True, editable=False)
+    finished_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return self.subject
+
+
+class Delivery(models.Model):
+    """
+    One campaign email to one subscriber
+    
+    Marked sending before the SMTP call and sent after it, so a crash
+    in between leaves it sending: unconfirmed, and not sent again.
+    """
+    
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+    
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name='deliveries')
+    subscriber = models.ForeignKey(NewsletterSubscriber, on_delete=models.CASCADE, related_name='deliveries')
+    email = models.EmailField(help_text="Address at the time of sending")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['campaign', 'id']
+        verbose_name_plural = 'deliveries'
+        constraints = [
+            # One email per subscriber per campaign, however often the send restarts
+            models.UniqueConstraint(fields=['campaign', 'subscriber'], name='unique_campaign_delivery'),
+        ]
+        indexes = [
+            models.Index(fields=['campaign', 'status'], name='delivery_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.campaign_id} → {self.email} ({self.status})"
+
+
+class ExperienceQuerySet(models.QuerySet):
+    # Only shown on detail/about/resume pages, never on project cards
+    HEAVY_FIELDS = ('achievements',)
+    
+    def listing(self):
+        """Card-sized rows for listings (home, small bets, related projects)"""
+        return self.defer(*self.HEAVY_FIELDS)
 
 
 class Experience(models.Model):
@@ -38,12 +148,112 @@ class Experience(models.Model):
     tech_stack = models.JSONField(default=list, blank=True)
     link = models.URLField(blank=True)
     order = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    # Indexed mirror of tech_stack, kept in sync on save
+    normalized_tags = models.ManyToManyField(
+        'Tag', through='ExperienceTag', related_name='experiences', blank=True
+    )
+    
+    objects = ExperienceQuerySet.as_manager()
     
     class Meta:
         ordering = ['-start_date', 'order']
     
     def __str__(self):
         return f"{self.title} at {self.organization}"
+    
+    def related_projects(self, limit=3):
+        """
+        Top projects by tech-stack overlap, from the RelatedProject table
+        
+        Ties go to the more recent project, then the lower id.
+        """
+        links = self.related_links.select_related('related').defer(
+            *[f'related__{field}' for field in ExperienceQuerySet.HEAVY_FIELDS]
+        )
+        return [
+            link.related
+            for link in links.order_by('-overlap', '-related__start_date', 'related_id')[:limit]
+        ]
+
+
+TAG_MAX_LENGTH = 100
+
+
+def normalize_tag(name):
+    """
+    Case- and whitespace-insensitive key for a tag or technology name
+    
+    Cut to the length of Tag.key, so over-long names still fit
+    """
+    return ' '.join(str(name).split()).lower()[:TAG_MAX_LENGTH].rstrip()
+
+
+def normalize_tech(tech_stack):
+    """Case-insensitive set of technologies in a tech_stack list"""
+    return {normalize_tag(tech) for tech in tech_stack or [] if normalize_tag(tech)}
+
+
+class RelatedProject(models.Model):
+    """
+    Materialized tech-stack overlap between two projects
+    
+    Stored in both directions and only for pairs that share at least one
+    technology; kept current by the Experience save/delete signals.
+    """
+    project = models.ForeignKey(Experience, on_delete=models.CASCADE, related_name='related_links')
+    related = models.ForeignKey(Experience, on_delete=models.CASCADE, related_name='+')
+    overlap = models.PositiveIntegerField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'related'], name='unique_related_project'),
+        ]
+        indexes = [
+            models.Index(fields=['project', '-overlap'], name='related_project_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.project_id} ↔ {self.related_id} ({self.overlap})"
+    
+    @classmethod
+    def rebuild_for(cls, project):
+        """Recompute every pair involving one project"""
+        cls.objects.filter(models.Q(project=project) | models.Q(related=project)).delete()
+        if project.type != 'project':
+            return
+        
+        stack = normalize_tech(project.tech_stack)
+        if not stack:
+            return
+        
+        links = []
+        others = Experience.objects.filter(type='project').exclude(pk=project.pk).only('id', 'tech_stack')
+        for other in others:
+            overlap = len(stack & normalize_tech(other.tech_stack))
+            if overlap:
+                links.append(cls(project=project, related=other, overlap=overlap))
+                links.append(cls(project=other, related=project, overlap=overlap))
+        cls.objects.bulk_create(links)
+    
+    @classmethod
+    def rebuild_all(cls):
+        """Recompute the whole table; returns the number of rows written"""
+        projects = [
+            (project.pk, normalize_tech(project.tech_stack))
+            for project in Experience.objects.filter(type='project').only('id', 'tech_stack')
+        ]
+        links = []
+        for i, (pk, stack) in enumerate(projects):
+            for other_pk, other_stack in projects[i + 1:]:
+                overlap = len(stack & other_stack)
+                if overlap:
+                    links.append(cls(project_id=pk, related_id=other_pk, overlap=overlap))
+                    links.append(cls(project_id=other_pk, related_id=pk, overlap=overlap))
+        cls.objects.all().delete()
+        cls.objects.bulk_create(links, batch_size=1000)
+        return len(links)
 
 
 class NowItem(models.Model):
@@ -86,6 +296,24 @@ class Skill(models.Model):
 # NEW: ARTICLE MODEL FOR BLOG/ESSAYS
 # ============================================
 
+class ArticleQuerySet(models.QuerySet):
+    # Full bodies and per-article assets, only needed on the detail page
+    HEAVY_FIELDS = ('content', 'content_html', 'custom_css', 'custom_javascript')
+    
+    def published(self):
+        # Always true (article_published_has_date); spelled out so
+        # keyset_paginate can treat published_date as NOT NULL
+        return self.filter(status='published', published_date__isnull=False)
+    
+    def listing(self):
+        """Rows for listing pages: everything except the heavy text columns"""
+        return self.defer(*self.HEAVY_FIELDS)
+    
+    def popular(self):
+        """Most read lately first; leaves out essays nobody has read for a while"""
+        return self.filter(popularity__gte=popularity_floor()).order_by('-popularity', '-id')
+
+
 class Article(models.Model):
     """
     Model for blog posts, essays, and visual/data essays
@@ -114,16 +342,43 @@ class Article(models.Model):
     
     # Content
     content = models.TextField(help_text="Main article content (supports HTML)")
+    content_html = models.TextField(
+        blank=True,
+        editable=False,
+        help_text="Rendered HTML of content, filled on save"
+    )
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        help_text="Hash of the content/renderer used for content_html"
+    )
+    related_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        help_text="Hash of the text related essays were last computed from"
+    )
     
     # Visual Content
     featured_image = models.ImageField(
         upload_to='articles/images/',
+        storage=content_addressed_storage,
         blank=True,
         null=True,
         help_text="Main image shown at top of article"
     )
     image_caption = models.CharField(max_length=200, blank=True)
     
+    # Featured image layout metadata, filled in by the images.variants job
+    featured_image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    featured_image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    featured_image_orientation = models.CharField(
+        max_length=10, choices=IMAGE_ORIENTATIONS, blank=True, editable=False
+    )
+    featured_image_color = models.CharField(max_length=7, blank=True, editable=False, help_text="Dominant colour, #rrggbb")
+    featured_image_lqip = models.TextField(blank=True, editable=False, help_text="Tiny base64 blur placeholder")
+    
     # Data Essay Specific (for charts, visualizations)
     has_interactive_content = models.BooleanField(
         default=False,
@@ -144,6 +399,9 @@ class Article(models.Model):
         blank=True,
         help_text='Tags as list, e.g., ["product", "design", "AI"]'
     )
+    normalized_tags = models.ManyToManyField(
+        'Tag', through='ArticleTag', related_name='articles', blank=True
+    )
     read_time = models.IntegerField(
         default=5,
         help_text="Estimated reading time in minutes"
@@ -168,10 +426,35 @@ class Article(models.Model):
         help_text="Show in featured section on home page"
     )
     
+    # Statistics, flushed in batches by core.counters
+    views = models.PositiveIntegerField(default=0, editable=False, help_text="Total page views")
+    popularity = models.FloatField(
+        default=0,
+        editable=False,
+        help_text="Time-decayed views relative to core.popularity.EPOCH (update_popularity)"
+    )
+    
+    objects = ArticleQuerySet.as_manager()
+    
+    # Left out of save() unless named in update_fields
+    COUNTER_FIELDS = ('views', 'popularity')
+    
     class Meta:
         ordering = ['-published_date', '-created_at']
         verbose_name = "Article/Essay"
         verbose_name_plural = "Articles/Essays"
+        indexes = [
+            # Keyset pagination of the essays listing
+            models.Index(fields=['status', '-published_date', '-id'], name='article_listing_idx'),
+            # Popular section and ?sort=popular
+            models.Index(fields=['status', '-popularity', '-id'], name='article_popular_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=~models.Q(status='published') | models.Q(published_date__isnull=False),
+                name='article_published_has_date',
+            ),
+        ]
     
     def __str__(self):
         return self.title
@@ -185,14 +468,109 @@ class Article(models.Model):
         if self.status == 'published' and not self.published_date:
             self.published_date = timezone.now()
         
+        # Re-render markdown only when the content actually changed (a row
+        # loaded without its content, e.g. from a listing, can't have)
+        if 'content' not in self.get_deferred_fields():
+            self.refresh_content_html()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            # The counters are only written by core.counters and
+            # update_popularity; saving an instance loaded before their last
+            # flush must not roll them back. Name them to write them.
+            skipped = set(self.COUNTER_FIELDS) | self.get_deferred_fields()
+            kwargs['update_fields'] = update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped
+            ]
+        if update_fields is not None and 'content' in update_fields:
+            kwargs['update_fields'] = update_fields = set(update_fields) | {'content_html', 'content_hash'}
+        if update_fields is not None and 'status' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'published_date'}
+        
         super().save(*args, **kwargs)
     
+    def refresh_content_html(self, force=False):
+        """
+        Render content into content_html if the stored hash is stale
+        
+        Returns True when the HTML was (re)rendered
+        """
+        current_hash = markdown_hash(self.content)
+        if not force and self.content_hash == current_hash:
+            return False
+        self.content_html = render_markdown(self.content)
+        self.content_hash = current_hash
+        return True
+    
+    @property
+    def rendered_content(self):
+        """
+        HTML for the article body
+        
+        Serves the stored HTML, falling back to a live render when the
+        hash no longer matches (e.g. rows written with queryset.update())
+        """
+        if self.content_hash and self.content_hash == markdown_hash(self.content):
+            return mark_safe(self.content_html)
+        return mark_safe(render_markdown_cached(self.content))
+    
     def get_absolute_url(self):
         return reverse('article_detail', kwargs={'slug': self.slug})
     
     @property
     def is_published(self):
         return self.status == 'published'
+    
+    def related_articles(self, limit=3):
+        """Precomputed TF-IDF neighbours (see compute_related_articles)"""
+        links = self.related_links.filter(related__status='published').select_related('related')
+        links = links.defer(*[f'related__{field}' for field in ArticleQuerySet.HEAVY_FIELDS])
+        return [link.related for link in links.order_by('rank')[:limit]]
+
+
+class RelatedArticle(models.Model):
+    """
+    Top-k content-similar essays for an article
+    
+    Written in batch by the compute_related_articles command.
+    """
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='related_links')
+    related = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField(help_text="Cosine similarity of TF-IDF vectors")
+    rank = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        ordering = ['article', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'rank'], name='unique_related_article_rank'),
+        ]
+    
+    def __str__(self):
+        return f"{self.article_id} → {self.related_id} ({self.score:.3f})"
+
+
+class ArticleViewDay(models.Model):
+    """
+    Page views of an article on one day
+    
+    Written in batches by core.counters; feeds the admin's 7-day trend.
+    """
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='view_days')
+    date = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    folded = models.PositiveIntegerField(
+        default=0,
+        help_text="Views already added to Article.popularity"
+    )
+    
+    class Meta:
+        ordering = ['article', '-date']
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'date'], name='unique_article_view_day'),
+        ]
+    
+    def __str__(self):
+        return f"{self.article_id} on {self.date}: {self.views}"
 
 
 # ============================================
@@ -214,16 +592,27 @@ class GalleryItem(models.Model):
     
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
-    image = models.ImageField(upload_to='gallery/')
+    image = models.ImageField(upload_to='gallery/', storage=content_addressed_storage)
     thumbnail = models.ImageField(
         upload_to='gallery/thumbnails/',
+        storage=content_addressed_storage,
         blank=True,
         null=True,
         help_text="Optional thumbnail (will use main image if not provided)"
     )
     
+    # Image layout metadata, filled in by the images.variants job
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_orientation = models.CharField(max_length=10, choices=IMAGE_ORIENTATIONS, blank=True, editable=False)
+    image_color = models.CharField(max_length=7, blank=True, editable=False, help_text="Dominant colour, #rrggbb")
+    image_lqip = models.TextField(blank=True, editable=False, help_text="Tiny base64 blur placeholder")
+    
     gallery_type = models.CharField(max_length=20, choices=GALLERY_TYPES, default='photo')
     tags = models.JSONField(default=list, blank=True)
+    normalized_tags = models.ManyToManyField(
+        'Tag', through='GalleryItemTag', related_name='gallery_items', blank=True
+    )
     
     # Optional link (e.g., to full project, Behance, etc.)
     external_link = models.URLField(blank=True)
@@ -238,6 +627,15 @@ class GalleryItem(models.Model):
         ordering = ['order', '-created_at']
         verbose_name = "Gallery Item"
         verbose_name_plural = "Gallery Items"
+        indexes = [
+            # Keyset pagination of the gallery grid
+            # Partial: SQLite can't seek a leading boolean column filtered as a bare "is_visible"
+            models.Index(
+                fields=['order', '-created_at', '-id'],
+                name='gallery_listing_idx',
+                condition=models.Q(is_visible=True),
+            ),
+        ]
     
     def __str__(self):
         return self.title
@@ -299,6 +697,7 @@ class Resume(models.Model):
     # Resume file
     resume_file = models.FileField(
         upload_to='resume/',
+        storage=content_addressed_storage,
         help_text="Upload PDF resume"
     )
     
@@ -340,4 +739,191 @@ class ContactMessage(models.Model):
         verbose_name_plural = "Contact Messages"
 
     def __str__(self):
-        return f"{self.name} ({self.email}) - {self.submitted_at.strftime('%Y-%m-%d')}"
\ No newline at end of file
+        return f"{self.name} ({self.email}) - {self.submitted_at.strftime('%Y-%m-%d')}"
+
+
+# ============================================
+# TAGS (normalized tech_stack / tags)
+# ============================================
+
+class Tag(models.Model):
+    """
+    A tag or technology shared by projects, articles and gallery items
+    
+    The JSON tags/tech_stack fields stay the editing source; these tables
+    mirror them so tag filters can be an indexed join.
+    """
+    name = models.CharField(max_length=TAG_MAX_LENGTH, help_text="Display name, as first entered")
+    key = models.CharField(
+        max_length=TAG_MAX_LENGTH,
+        unique=True,
+        help_text="Lowercased name used for case-insensitive lookups"
+    )
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+    
+    @classmethod
+    def for_names(cls, names):
+        """Return Tag rows for a list of names, creating any that are missing"""
+        wanted = {}
+        for name in names or []:
+            key = normalize_tag(name)
+            if key and key not in wanted:
+                wanted[key] = ' '.join(str(name).split())[:TAG_MAX_LENGTH].rstrip()
+        if not wanted:
+            return []
+        
+        existing = {tag.key: tag for tag in cls.objects.filter(key__in=wanted)}
+        missing = [cls(name=name, key=key) for key, name in wanted.items() if key not in existing]
+        if missing:
+            cls.objects.bulk_create(missing, ignore_conflicts=True)
+            existing.update({tag.key: tag for tag in cls.objects.filter(key__in=wanted)})
+        return [existing[key] for key in wanted]
+    
+    @staticmethod
+    def sync(instance, names):
+        """Point instance.normalized_tags at exactly the given names"""
+        instance.normalized_tags.set(Tag.for_names(names))
+
+
+class ExperienceTag(models.Model):
+    experience = models.ForeignKey(Experience, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'experience'], name='unique_experience_tag'),
+        ]
+
+
+class ArticleTag(models.Model):
+    article = models.ForeignKey(Article, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'article'], name='unique_article_tag'),
+        ]
+
+
+class GalleryItemTag(models.Model):
+    gallery_item = models.ForeignKey(GalleryItem, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'gallery_item'], name='unique_gallery_item_tag'),
+        ]
+
+
+# ============================================
+# RESPONSIVE IMAGE VARIANTS (see core.images)
+# ============================================
+
+class ImageVariantQuerySet(models.QuerySet):
+    def for_files(self, files):
+        """{source name: [variants, widest first]} for a list of FieldFiles"""
+        names = {f.name for f in files if f}
+        grouped = {name: [] for name in names}
+        for variant in self.filter(source__in=names).order_by('source', '-width'):
+            grouped[variant.source].append(variant)
+        return grouped
+    
+    def attach(self, objects, field):
+        """Set obj.<field>_variants on each object with one query"""
+        grouped = self.for_files([getattr(obj, field) for obj in objects])
+        for obj in objects:
+            setattr(obj, f'{field}_variants', grouped.get(getattr(obj, field).name, []))
+        return objects
+
+
+class ImageVariant(models.Model):
+    """
+    A resized, re-encoded copy of an uploaded image
+    
+    Keyed by the storage name of the original, so gallery images and
+    article featured images share one table. Generated in the background
+    worker (core.tasks.image_variants).
+    """
+    
+    FORMAT_CHOICES = [
+        ('avif', 'AVIF'),
+        ('webp', 'WebP'),
+        ('jpeg', 'JPEG'),
+    ]
+    
+    source = models.CharField(max_length=255, help_text="Storage name of the original image")
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    file = models.FileField(upload_to='variants/', max_length=255)
+    size = models.PositiveIntegerField(help_text="Bytes")
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    objects = ImageVariantQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['source', '-width']
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'format', 'width'], name='unique_image_variant'),
+        ]
+    
+    def __str__(self):
+        return f"{self.source} @ {self.width}w {self.format}"
+    
+    @property
+    def mime_type(self):
+        return f"image/{self.format}"
+
+
+# ============================================
+# BACKGROUND JOBS (see core.jobs, runworker)
+# ============================================
+
+class Job(models.Model):
+    """
+    A unit of background work, queued in the database
+    
+    Request code enqueues; the runworker command claims, runs and retries.
+    """
+    
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    
+    kind = models.CharField(max_length=100, help_text="Registered handler name, e.g. gallery.thumbnail")
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now, help_text="Not claimed before this time (retry backoff)")
+    last_error = models.TextField(blank=True)
+    
+    locked_by = models.CharField(max_length=100, blank=True, help_text="Worker running the job")
+    locked_at = models.DateTimeField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Workers poll for due pending jobs
+            models.Index(fields=['status', 'run_after'], name='job_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
@@ -0,0 +1,104 @@
+"""
+CSV export and import of newsletter subscribers (used by the admin)
+
+Export streams rows straight from a database iterator into the response,
+so memory stays flat however many subscribers there are. Import reads the
+upload line by line, drops duplicates and invalid addresses in memory and
+inserts in batches with bulk_create(ignore_conflicts=True): addresses
+already subscribed are skipped by the unique constraint, not looked up one
+by one. Addresses are stored lowercased (normalize_email), so that
+constraint also catches a different case.
+
+A large file takes longer than a request may, so the admin only stores the
+upload (queue_import) and the newsletter.import job imports it.
+"""
+import csv
+import io
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import FileSystemStorage
+from django.core.validators import validate_email
+from django.db import transaction
+
+from . import jobs
+from .models import NewsletterSubscriber, normalize_email
+
+
+EXPORT_COLUMNS = ('email', 'subscribed_at', 'is_active')
+
+
+class Echo:
+    """File-like object whose write() returns the line, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset, chunk_size=2000):
+    """CSV lines (header first) for a queryset of subscribers"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for email, subscribed_at, is_active in queryset.values_list(*EXPORT_COLUMNS).iterator(chunk_size=chunk_size):
+        yield writer.writerow([email, subscribed_at.isoformat(), 'yes' if is_active else 'no'])
+
+
+def import_subscribers(upload, batch_size=5000):
+    """
+    Add the addresses in an uploaded CSV as active subscribers
+
+    The email column is the one headed "email", else the first. Returns a
+    dict of counts: added, duplicates (repeated in the file or already
+    subscribed), invalid, plus the first few invalid line numbers.
+    """
+    lines = io.TextIOWrapper(upload, encoding='utf-8-sig', errors='replace', newline='')
+    reader = csv.reader(lines)
+    seen = set()
+    batch = []
+    result = {'added': 0, 'duplicates': 0, 'invalid': 0, 'invalid_lines': []}
+    column = 0
+
+    with transaction.atomic():
+        before = NewsletterSubscriber.objects.count()
+        for row in reader:
+            if reader.line_num == 1:
+                header = [cell.strip().lower() for cell in row]
+                if 'email' in header:
+                    column = header.index('email')
+                    continue
+            if not row or not any(cell.strip() for cell in row):
+                continue
+            email = row[column].strip() if column < len(row) else ''
+            try:
+                validate_email(email)
+            except ValidationError:
+                result['invalid'] += 1
+                if len(result['invalid_lines']) < 10:
+                    result['invalid_lines'].append(reader.line_num)
+                continue
+            email = normalize_email(email)
+            if email in seen:
+                result['duplicates'] += 1
+                continue
+            seen.add(email)
+            batch.append(NewsletterSubscriber(email=email))
+            if len(batch) >= batch_size:
+                NewsletterSubscriber.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        NewsletterSubscriber.objects.bulk_create(batch, ignore_conflicts=True)
+        result['added'] = NewsletterSubscriber.objects.count() - before
+
+    # Unique addresses the database already had
+    result['duplicates'] += len(seen) - result['added']
+    return result
+
+
+def import_storage():
+    """Where uploads wait for their import job; outside MEDIA_ROOT, never served"""
+    return FileSystemStorage(location=getattr(settings, 'SUBSCRIBER_IMPORT_DIR', settings.BASE_DIR / '.imports'))
+
+
+def queue_import(upload):
+    """Keep an uploaded CSV for the worker and queue its import; returns the Job"""
+    name = import_storage().save('subscribers.csv', upload)
+    return jobs.enqueue('newsletter.import', name=name)
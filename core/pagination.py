@@ -0,0 +1,173 @@
+"""
+Keyset (cursor) pagination
+
+Instead of OFFSET, each page remembers the sort key of its last row and
+the next page asks for rows strictly after it. With an index on the sort
+columns page N costs the same as page 1: the database seeks the index to
+the cursor and reads forward. That only holds for NOT NULL sort columns
+(or ones the queryset filters with `isnull=False`); nullable ones need
+NULLS LAST and IS NULL branches that no index can serve.
+
+    page = keyset_paginate(articles, ('-published_date', '-id'), request.GET.get('cursor'))
+"""
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from django.db.models.lookups import IsNull
+from django.db.models.sql.where import AND
+
+
+class KeysetPage:
+    """One page of results plus the cursor for the page after it"""
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def next_query(self, request):
+        """Querystring for the next page, keeping the current filters"""
+        params = request.GET.copy()
+        params.pop('fragment', None)
+        params['cursor'] = self.next_cursor
+        return params.urlencode()
+
+
+def encode_cursor(values):
+    payload = json.dumps([
+        value.isoformat() if isinstance(value, (datetime.date, datetime.datetime)) else value
+        for value in values
+    ], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """Return the list of key values in cursor, or None if it is missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, binascii.Error):
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    return values
+
+
+def _parse_ordering(ordering):
+    return [(key.lstrip('-'), key.startswith('-')) for key in ordering]
+
+
+def clean_cursor_values(queryset, ordering, values):
+    """
+    Convert decoded cursor values with their fields' to_python()
+
+    Returns None when any value doesn't fit its column, so a tampered
+    cursor reads as no cursor instead of failing in the query.
+    """
+    cleaned = []
+    for (name, _), value in zip(_parse_ordering(ordering), values):
+        if name in queryset.query.annotations:
+            field = queryset.query.annotations[name].output_field
+        else:
+            field = queryset.model._meta.get_field(name)
+        try:
+            cleaned.append(None if value is None else field.to_python(value))
+        except (ValidationError, TypeError, ValueError):
+            return None
+    return cleaned
+
+
+def nullable_keys(queryset, ordering):
+    """Names of the sort keys that can be NULL in queryset's rows"""
+    where = queryset.query.where
+    filtered = set()
+    if where.connector == AND and not where.negated:
+        filtered = {
+            child.lhs.target.name for child in where.children
+            if isinstance(child, IsNull) and child.rhs is False and hasattr(child.lhs, 'target')
+        }
+    nullable = set()
+    for name, _ in _parse_ordering(ordering):
+        if name in queryset.query.annotations:
+            null = queryset.query.annotations[name].output_field.null
+        else:
+            null = queryset.model._meta.get_field(name).null
+        if null and name not in filtered:
+            nullable.add(name)
+    return nullable
+
+
+def keyset_filter(ordering, values, nullable=()):
+    """
+    Q matching rows that sort strictly after `values`
+
+    Keys in `nullable` sort NULLs last in either direction (see
+    keyset_paginate), so a NULL cursor value only admits rows that tie on
+    it. Otherwise this is the plain row comparison, led by a range on the
+    first key that lets the database seek its index to the cursor.
+    """
+    keys = _parse_ordering(ordering)
+    condition = Q(pk__in=[])
+    prefix = Q()
+    for (field, descending), value in zip(keys, values):
+        if value is not None:
+            lookup = 'lt' if descending else 'gt'
+            after = Q(**{f'{field}__{lookup}': value})
+            if field in nullable:
+                after |= Q(**{f'{field}__isnull': True})
+            condition |= prefix & after
+            prefix &= Q(**{field: value})
+        else:
+            prefix &= Q(**{f'{field}__isnull': True})
+
+    (first, descending), value = keys[0], values[0]
+    if value is not None and first not in nullable:
+        condition = Q(**{f'{first}__{"lte" if descending else "gte"}': value}) & condition
+    return condition
+
+
+def keyset_paginate(queryset, ordering, cursor=None, per_page=20):
+    """
+    Return a KeysetPage of queryset sorted by `ordering`
+
+    `ordering` must end in a unique column (normally the id) so every row
+    has a distinct position.
+    """
+    nullable = nullable_keys(queryset, ordering)
+    order_by = []
+    for field, descending in _parse_ordering(ordering):
+        options = {'nulls_last': True} if field in nullable else {}
+        order_by.append(F(field).desc(**options) if descending else F(field).asc(**options))
+    queryset = queryset.order_by(*order_by)
+
+    values = decode_cursor(cursor, len(ordering))
+    if values is not None:
+        values = clean_cursor_values(queryset, ordering, values)
+    if values is not None:
+        queryset = queryset.filter(keyset_filter(ordering, values, nullable))
+
+    items = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, field) for field, _ in _parse_ordering(ordering)])
+    return KeysetPage(items, next_cursor)
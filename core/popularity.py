@@ -0,0 +1,51 @@
+"""
+Time-decayed article popularity
+
+A view counts less the older it gets: its weight halves every
+POPULARITY_HALF_LIFE_DAYS. An article's score on day T is
+
+    sum over its daily buckets of views(d) * 2 ** -((T - d) / half_life)
+
+Article.popularity stores that score relative to a fixed EPOCH instead,
+
+    sum of views(d) * 2 ** ((d - EPOCH) / half_life)
+
+which is the score on day T times 2 ** ((T - EPOCH) / half_life), the same
+factor for every article. Ordering by the column therefore ranks articles
+exactly as by their decayed score on any day, but a row only changes when
+it gets new views: the update_popularity command adds the views counted
+since its last run (ArticleViewDay.views - folded) and never has to decay
+every row. Requests just ORDER BY the indexed column.
+
+Changing the half-life changes every weight, so run
+`update_popularity --full` afterwards. A float holds weights for about
+1000 half-lives (some 20 years at 7 days); move EPOCH forward and run
+--full long before then.
+"""
+import datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+
+EPOCH = datetime.date(2025, 1, 1)
+
+
+def half_life():
+    return getattr(settings, 'POPULARITY_HALF_LIFE_DAYS', 7)
+
+
+def weight(day):
+    """What one view on `day` adds to Article.popularity"""
+    return 2 ** ((day - EPOCH).days / half_life())
+
+
+def decayed(popularity, today=None):
+    """An article's score as of today: views, each discounted by its age"""
+    return popularity / weight(today or timezone.localdate())
+
+
+def popularity_floor(today=None):
+    """Smallest stored score still worth listing: one view POPULARITY_WINDOW_DAYS ago"""
+    today = today or timezone.localdate()
+    return weight(today - datetime.timedelta(days=getattr(settings, 'POPULARITY_WINDOW_DAYS', 30)))
@@ -0,0 +1,167 @@
+"""
+Markdown rendering helpers
+
+Shared by the `markdown` template filter and by Article, which stores
+pre-rendered HTML so essay pages don't re-parse Markdown on every view
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+import markdown2
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+
+# Markdown extras for better formatting
+MARKDOWN_EXTRAS = [
+    'fenced-code-blocks',  # ```python code ```
+    'tables',              # GitHub-style tables
+    'code-friendly',       # Better handling of underscores
+    'break-on-newline',    # Convert \n to <br>
+    'cuddled-lists',       # Better list handling
+    'header-ids',          # Add IDs to headers for linking
+    'footnotes',           # [^1] footnote syntax
+    'strike',              # ~~strikethrough~~
+    'task_list',           # - [ ] task items
+]
+
+
+def render_markdown(text, extras=None):
+    """Convert markdown text to an HTML string"""
+    if not text:
+        return ''
+    return markdown2.markdown(text, extras=MARKDOWN_EXTRAS if extras is None else extras)
+
+
+def markdown_hash(text, extras=None):
+    """
+    Hash of the source text plus the extras used to render it
+
+    Changing either the text or the extras list produces a new hash, so
+    stored HTML is treated as stale after a renderer config change too.
+    """
+    extras = MARKDOWN_EXTRAS if extras is None else extras
+    digest = hashlib.sha256()
+    digest.update('\x1f'.join(extras).encode('utf-8'))
+    digest.update(b'\x1e')
+    digest.update((text or '').encode('utf-8'))
+    return digest.hexdigest()
+
+
+class MarkdownRenderCache:
+    """
+    Byte-bounded LRU cache of rendered markdown, keyed by markdown_hash
+
+    Lives per worker process. When `cache_alias` names a Django cache,
+    misses fall through to it before rendering, so gunicorn workers can
+    share rendered HTML. `timeout` is passed to cache.set() as is: leave it
+    unset for the cache's own TIMEOUT, None never expires.
+    """
+
+    def __init__(self, max_bytes, cache_alias=None, timeout=DEFAULT_TIMEOUT):
+        self.max_bytes = max_bytes
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.shared_hits = 0
+
+    def render(self, text, extras=None):
+        """Return rendered HTML for text, rendering at most once per key"""
+        if not text:
+            return ''
+
+        key = markdown_hash(text, extras)
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return html
+            self.misses += 1
+
+        html = None
+        shared = caches[self.cache_alias] if self.cache_alias else None
+        if shared is not None:
+            html = shared.get(f'markdown:{key}')
+            if html is not None:
+                with self._lock:
+                    self.shared_hits += 1
+
+        if html is None:
+            html = render_markdown(text, extras)
+            if shared is not None:
+                shared.set(f'markdown:{key}', html, self.timeout)
+
+        self._store(key, html)
+        return html
+
+    def _store(self, key, html):
+        cost = len(key) + len(html.encode('utf-8'))
+        if cost > self.max_bytes:
+            # Larger than the whole budget, don't let it flush everything else
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = html
+            self._size += cost
+            while self._size > self.max_bytes:
+                old_key, old_html = self._entries.popitem(last=False)
+                self._size -= len(old_key) + len(old_html.encode('utf-8'))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = self.misses = self.evictions = self.shared_hits = 0
+
+    def stats(self):
+        """Counters for monitoring / the shell"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'shared_hits': self.shared_hits,
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+            }
+
+
+_render_cache = None
+_render_cache_lock = threading.Lock()
+
+
+def get_render_cache():
+    """Process-wide MarkdownRenderCache built from settings"""
+    global _render_cache
+    if _render_cache is None:
+        with _render_cache_lock:
+            if _render_cache is None:
+                _render_cache = MarkdownRenderCache(
+                    max_bytes=getattr(settings, 'MARKDOWN_CACHE_MAX_BYTES', 4 * 1024 * 1024),
+                    cache_alias=getattr(settings, 'MARKDOWN_CACHE_ALIAS', None),
+                    timeout=getattr(settings, 'MARKDOWN_CACHE_TIMEOUT', DEFAULT_TIMEOUT),
+                )
+    return _render_cache
+
+
+def reset_render_cache():
+    """Drop the process-wide cache so it is rebuilt from current settings"""
+    global _render_cache
+    with _render_cache_lock:
+        _render_cache = None
+
+
+def render_markdown_cached(text, extras=None):
+    """render_markdown through the process-wide LRU cache"""
+    return get_render_cache().render(text, extras)
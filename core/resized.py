@@ -0,0 +1,125 @@
+"""
+On-demand resized images with a bounded disk cache
+
+/media/r/<w>x<h>/<path> fits a stored gallery or article image inside an
+allowlisted box (IMAGE_RESIZE_SIZES) on first request. The result is kept
+under IMAGE_RESIZE_CACHE_DIR, whose total size is capped at
+IMAGE_RESIZE_CACHE_MAX_BYTES by evicting the least recently used files
+(a hit refreshes the file's mtime).
+
+Concurrent first requests for the same variant, from any thread or worker
+process, wait on one flock()ed lock file, so only one of them resizes.
+
+In production the front server must hand /media/r/ to Django rather than
+serving it from MEDIA_ROOT.
+"""
+import fcntl
+import hashlib
+import os
+import posixpath
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from .images import make_resized
+
+
+# Only originals uploaded through these fields can be resized
+RESIZABLE_PREFIXES = ('gallery/', 'articles/images/')
+
+_evict_lock = threading.Lock()
+_written_since_scan = 0
+
+
+def cache_dir():
+    return Path(getattr(settings, 'IMAGE_RESIZE_CACHE_DIR', settings.BASE_DIR / '.resized'))
+
+
+def allowed_size(width, height):
+    return f'{width}x{height}' in getattr(settings, 'IMAGE_RESIZE_SIZES', ())
+
+
+def clean_path(path):
+    """The storage name for a requested path, or None if it may not be resized"""
+    name = posixpath.normpath(path)
+    if name.startswith(('/', '..')) or '/../' in f'/{name}/' or not name.startswith(RESIZABLE_PREFIXES):
+        return None
+    return name
+
+
+def cache_path(name, width, height, fmt):
+    """Cache file for one variant; includes the original's mtime so edits miss"""
+    modified = default_storage.get_modified_time(name).timestamp()
+    digest = hashlib.sha256(f'{name}:{modified}:{width}x{height}:{fmt}'.encode('utf-8')).hexdigest()
+    return cache_dir() / digest[:2] / f'{digest}.{fmt}'
+
+
+def get_resized(name, width, height, fmt):
+    """
+    Path of the cached variant, resizing it first if needed
+
+    Raises FileNotFoundError if the original does not exist.
+    """
+    if not default_storage.exists(name):
+        raise FileNotFoundError(name)
+    path = cache_path(name, width, height, fmt)
+    if path.exists():
+        os.utime(path)  # Mark as recently used
+        return path
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_suffix('.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            # Someone else may have finished it while we waited
+            if not path.exists():
+                with default_storage.open(name, 'rb') as original:
+                    data = make_resized(original, (width, height), fmt)
+                tmp = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+                tmp.write_bytes(data)
+                os.replace(tmp, path)
+                note_written(len(data))
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    return path
+
+
+def note_written(size):
+    """Evict once enough has been written since the last scan"""
+    global _written_since_scan
+    limit = getattr(settings, 'IMAGE_RESIZE_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+    with _evict_lock:
+        _written_since_scan += size
+        if _written_since_scan < limit // 20:
+            return
+        _written_since_scan = 0
+    evict(limit)
+
+
+def evict(limit):
+    """Delete least recently used variants until the cache is under 90% of limit"""
+    files = []
+    total = 0
+    for path in cache_dir().glob('*/*'):
+        if path.suffix in ('.lock', '.tmp'):
+            continue
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+    if total <= limit:
+        return 0
+
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= limit * 0.9:
+            break
+        path.unlink(missing_ok=True)
+        path.with_suffix('.lock').unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    return removed
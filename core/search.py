@@ -0,0 +1,240 @@
+"""
+Essay search
+
+Engines, picked with settings.ESSAY_SEARCH_ENGINE:
+- 'fts': the SQLite FTS5 table created in migration 0005 (kept in sync by
+  triggers), ranked with bm25 and with highlighted snippets
+- 'inverted': the in-process BM25 index in core.inverted_index, which
+  works on any database
+- 'icontains': the unindexed LIKE scan
+
+'fts' falls back to 'inverted' on databases without the FTS table or
+its sync triggers, since an index nothing keeps up to date would quietly
+miss new and edited essays.
+"""
+import logging
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, CharField, IntegerField, Q, Value, When
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'core_article_fts'
+
+# bm25 column weights: title, excerpt, content, tags
+FTS_WEIGHTS = (10.0, 4.0, 1.0, 6.0)
+
+# Private-use markers so snippets can be HTML-escaped before highlighting
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Keep the FTS table in sync with core_article (as created in migration 0005).
+# SQLite drops them whenever a migration rebuilds core_article, so
+# restore_fts_triggers() puts them back after every migrate.
+FTS_TRIGGERS = {
+    'core_article_fts_ai': f'''
+        CREATE TRIGGER IF NOT EXISTS core_article_fts_ai AFTER INSERT ON core_article BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, title, excerpt, content, tags)
+            VALUES (new.id, new.title, new.excerpt, new.content, new.tags);
+        END
+    ''',
+    'core_article_fts_ad': f'''
+        CREATE TRIGGER IF NOT EXISTS core_article_fts_ad AFTER DELETE ON core_article BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        END
+    ''',
+    'core_article_fts_au': f'''
+        CREATE TRIGGER IF NOT EXISTS core_article_fts_au AFTER UPDATE OF title, excerpt, content, tags
+        ON core_article BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+            INSERT INTO {FTS_TABLE}(rowid, title, excerpt, content, tags)
+            VALUES (new.id, new.title, new.excerpt, new.content, new.tags);
+        END
+    ''',
+}
+
+_fts_available = None
+
+
+def fts_available():
+    """True when the default database has the FTS5 article table and its sync triggers"""
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+        missing = missing_fts_triggers() if _fts_available else []
+        if missing:
+            logger.warning(
+                'FTS sync triggers missing (%s); searching with the in-process index. '
+                'Run manage.py migrate to restore them.', ', '.join(missing),
+            )
+            _fts_available = False
+    return _fts_available
+
+
+def build_fts_query(query):
+    """
+    Turn free text into a safe FTS5 MATCH expression
+
+    Every word is quoted (so FTS operators in user input are inert) and
+    the last one is prefix-matched. Returns '' when there is nothing to
+    search for.
+    """
+    tokens = TOKEN_RE.findall(query.lower())
+    if not tokens:
+        return ''
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def fts_search(articles, query, limit=None):
+    """
+    Restrict an Article queryset to FTS matches, best match first
+
+    The MATCH runs against the FTS table only, restricted to the ids of
+    `articles`, and keeps the `limit` best bm25 scores. Rows gain
+    `search_rank` (position in the ranking, lower is better) and
+    `search_snippet` (raw snippet text, see highlight_snippet).
+    """
+    match = build_fts_query(query)
+    if not match:
+        return articles.none()
+
+    limit = limit or getattr(settings, 'SEARCH_RESULT_LIMIT', 200)
+    weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+    id_sql, id_params = articles.order_by().values('id').query.sql_with_params()
+    sql = (
+        f"SELECT rowid, snippet({FTS_TABLE}, -1, '{SNIPPET_START}', '{SNIPPET_END}', '…', 24) "
+        f'FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s AND rowid IN ({id_sql}) '
+        f'ORDER BY bm25({FTS_TABLE}, {weights}), rowid '
+        f'LIMIT %s'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, *id_params, limit])
+        hits = cursor.fetchall()
+
+    return rank_articles(articles, hits)
+
+
+def icontains_search(articles, query):
+    """Unindexed LIKE '%q%' scan, kept for databases without FTS"""
+    return articles.filter(
+        Q(title__icontains=query) |
+        Q(excerpt__icontains=query) |
+        Q(content__icontains=query)
+    )
+
+
+def inverted_search(articles, query, limit=None):
+    """
+    Restrict an Article queryset to in-process index matches, best first
+
+    Rows gain `search_rank` (position in the ranking, lower is better)
+    """
+    from .inverted_index import get_article_index
+
+    limit = limit or getattr(settings, 'SEARCH_RESULT_LIMIT', 200)
+    hits = get_article_index().search(query, limit=limit)
+    return rank_articles(articles, [(doc_id, None) for doc_id, _ in hits])
+
+
+def rank_articles(articles, hits):
+    """
+    Filter to the ids in hits, a best-first list of (id, snippet) pairs
+
+    Annotates `search_rank` with each row's position so the ranking can be
+    ordered and keyset-paginated like any other column.
+    """
+    if not hits:
+        return articles.none()
+
+    ids = [doc_id for doc_id, _ in hits]
+    annotations = {
+        'search_rank': Case(
+            *[When(pk=doc_id, then=Value(position)) for position, doc_id in enumerate(ids)],
+            output_field=IntegerField(),
+        ),
+    }
+    if any(snippet for _, snippet in hits):
+        annotations['search_snippet'] = Case(
+            *[When(pk=doc_id, then=Value(snippet)) for doc_id, snippet in hits if snippet],
+            default=Value(''),
+            output_field=CharField(),
+        )
+    return articles.filter(pk__in=ids).annotate(**annotations).order_by('search_rank', 'id')
+
+
+def is_ranked(articles):
+    """True when a queryset came back from a relevance-ranked engine"""
+    return 'search_rank' in articles.query.annotations
+
+
+def search_articles(articles, query):
+    """Filter an Article queryset by a search query using the configured engine"""
+    engine = getattr(settings, 'ESSAY_SEARCH_ENGINE', 'fts')
+    if engine == 'inverted':
+        return inverted_search(articles, query)
+    if engine == 'fts':
+        return fts_search(articles, query) if fts_available() else inverted_search(articles, query)
+    return icontains_search(articles, query)
+
+
+def highlight_snippet(raw):
+    """Escape an FTS snippet and wrap matched terms in <mark>"""
+    if not raw:
+        return ''
+    html = escape(raw)
+    html = html.replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>')
+    return mark_safe(html)
+
+
+def missing_fts_triggers():
+    """Names of the FTS sync triggers not present in the database"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'core_article'")
+        present = {name for name, in cursor.fetchall()}
+    return [name for name in FTS_TRIGGERS if name not in present]
+
+
+def restore_fts_triggers():
+    """
+    Re-create missing FTS sync triggers and re-index every article
+
+    Articles written while the triggers were gone are missing from (or
+    stale in) the index, hence the full rebuild. Returns the names of the
+    triggers that had to be restored.
+    """
+    global _fts_available
+    if connection.vendor != 'sqlite' or FTS_TABLE not in connection.introspection.table_names():
+        return []
+    missing = missing_fts_triggers()
+    if missing:
+        with connection.cursor() as cursor:
+            for name in missing:
+                cursor.execute(FTS_TRIGGERS[name])
+        rebuild_fts_index()
+        _fts_available = None
+    return missing
+
+
+def rebuild_fts_index():
+    """Repopulate the FTS table from core_article and merge its b-trees"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, title, excerpt, content, tags) '
+            f'SELECT id, title, excerpt, content, tags FROM core_article'
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT count(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
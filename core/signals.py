@@ -1,74 +1,146 @@
 """
 Django signals for automatic processing
 
-Handles automatic thumbnail generation for gallery images
+Queues thumbnail and responsive variant generation for uploaded images,
+and keeps derived data (search index, related projects, tags, page cache)
+in step with edits
 """
-from django.db.models.signals import post_save
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
 from django.dispatch import receiver
-from PIL import Image
-from io import BytesIO
-from django.core.files.uploadedfile import InMemoryUploadedFile
-import sys
-import os
 
-from .models import GalleryItem
+from .models import (
+    Article,
+    ArticleViewDay,
+    Campaign,
+    ContactMessage,
+    Delivery,
+    Experience,
+    GalleryItem,
+    ImageVariant,
+    Job,
+    NewsletterSubscriber,
+    RelatedProject,
+    Tag,
+)
+from .cache import bump_content_version
+from .rendering import reset_render_cache
+from .search import restore_fts_triggers
+from . import inverted_index, jobs, tasks
 
 
+@receiver(setting_changed)
+def reset_markdown_cache(sender, setting, **kwargs):
+    """Rebuild the markdown render cache when its settings are overridden"""
+    if setting.startswith('MARKDOWN_CACHE_'):
+        reset_render_cache()
+
+
+@receiver(post_migrate)
+def repair_fts_triggers(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Put back the FTS sync triggers a migration's table rebuild dropped"""
+    if sender.label == 'core' and using == DEFAULT_DB_ALIAS:
+        restore_fts_triggers()
+
+
+@receiver(post_save, sender=Article)
+def index_article(sender, instance, **kwargs):
+    """Keep this worker's in-process search index in step with edits"""
+    inverted_index.update_article(instance)
+
+
+@receiver(post_delete, sender=Article)
+def unindex_article(sender, instance, **kwargs):
+    inverted_index.remove_article(instance)
+
+
+@receiver(post_save, sender=Experience)
+def update_related_projects(sender, instance, raw=False, **kwargs):
+    """
+    Refresh the RelatedProject rows for a saved experience
+
+    Also clears them when an experience stops being a project; deletes
+    are handled by the foreign keys' CASCADE.
+    """
+    if raw:
+        return
+    RelatedProject.rebuild_for(instance)
+
+
+TAG_SOURCES = {
+    Experience: 'tech_stack',
+    Article: 'tags',
+    GalleryItem: 'tags',
+}
+
+
+@receiver(post_save, sender=Experience)
+@receiver(post_save, sender=Article)
 @receiver(post_save, sender=GalleryItem)
-def create_thumbnail(sender, instance, created, **kwargs):
+def sync_normalized_tags(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Mirror the JSON tags/tech_stack field into the indexed Tag tables"""
+    field = TAG_SOURCES[sender]
+    if raw or (update_fields is not None and field not in update_fields):
+        return
+    Tag.sync(instance, getattr(instance, field))
+
+
+@receiver(post_save, sender=GalleryItem)
+def create_thumbnail(sender, instance, raw=False, **kwargs):
     """
-    Automatically generate thumbnail for gallery items
+    Queue thumbnail generation for gallery items without one
 
-    Creates a 400x400px thumbnail if one doesn't exist
-    Triggered after GalleryItem is saved
+    Only enqueues; the runworker command decodes and resizes the image
+    (core.tasks.gallery_thumbnail) so the admin request returns at once.
     """
-    # Only generate if main image exists and no thumbnail
-    if instance.image and not instance.thumbnail:
-        try:
-            # Open the image
-            img = Image.open(instance.image.path)
-
-            # Convert RGBA to RGB if necessary (for PNG with transparency)
-            if img.mode in ('RGBA', 'LA', 'P'):
-                # Create a white background
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-
-            # Calculate thumbnail size (400x400 max, maintain aspect ratio)
-            img.thumbnail((400, 400), Image.Resampling.LANCZOS)
-
-            # Save thumbnail to BytesIO
-            thumb_io = BytesIO()
-            img_format = 'JPEG'
-
-            # Save with optimization
-            img.save(thumb_io, format=img_format, quality=85, optimize=True)
-            thumb_io.seek(0)
-
-            # Generate thumbnail filename
-            original_name = os.path.basename(instance.image.name)
-            name_without_ext = os.path.splitext(original_name)[0]
-            thumb_filename = f"{name_without_ext}_thumb.jpg"
-
-            # Create InMemoryUploadedFile
-            thumb_file = InMemoryUploadedFile(
-                thumb_io,
-                None,
-                thumb_filename,
-                'image/jpeg',
-                sys.getsizeof(thumb_io),
-                None
-            )
-
-            # Save thumbnail to model
-            # Use update to avoid triggering signal again
-            instance.thumbnail.save(thumb_filename, thumb_file, save=False)
-            GalleryItem.objects.filter(pk=instance.pk).update(thumbnail=instance.thumbnail)
-
-            print(f"✓ Thumbnail generated for: {instance.title}")
-
-        except Exception as e:
-            print(f"✗ Error generating thumbnail for {instance.title}: {str(e)}")
+    if raw or not instance.image or instance.thumbnail:
+        return
+    transaction.on_commit(lambda: jobs.enqueue('gallery.thumbnail', pk=instance.pk))
+
+
+IMAGE_SOURCES = {
+    GalleryItem: 'image',
+    Article: 'featured_image',
+}
+
+
+@receiver(post_save, sender=GalleryItem)
+@receiver(post_save, sender=Article)
+def queue_image_variants(sender, instance, raw=False, **kwargs):
+    """
+    Queue responsive variants for an uploaded image that has none yet
+
+    A duplicate upload is stored under the same name (core.storage), so it
+    finds the variants already made and copies the recorded metadata.
+    """
+    field = IMAGE_SOURCES[sender]
+    image = getattr(instance, field)
+    if raw or not image:
+        return
+    name = image.name
+    if ImageVariant.objects.filter(source=name).exists():
+        if getattr(instance, f'{field}_width') is None:
+            metadata = tasks.known_metadata(name)
+            if metadata is not None:
+                # update() skips save(), so this receiver does not run again
+                sender.objects.filter(pk=instance.pk).update(
+                    **{f'{field}_{key}': value for key, value in metadata.items()}
+                )
+        return
+    transaction.on_commit(lambda: jobs.enqueue('images.variants', source=name))
+
+
+# Form submissions, mailings, queue bookkeeping and statistics never appear on public pages
+PAGE_CACHE_EXEMPT = (
+    ContactMessage, NewsletterSubscriber, Campaign, Delivery, Job, ImageVariant, ArticleViewDay,
+)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_page_cache(sender, raw=False, **kwargs):
+    """Bump the content version whenever a core model is saved or deleted"""
+    if raw or sender._meta.app_label != 'core' or issubclass(sender, PAGE_CACHE_EXEMPT):
+        return
+    bump_content_version()
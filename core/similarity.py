@@ -0,0 +1,119 @@
+"""
+TF-IDF content similarity for related essays
+
+Batch-only (see the compute_related_articles command): articles are
+vectorized into a sparse TF-IDF matrix held as CSR/CSC NumPy arrays, and
+cosine neighbours are found one row at a time by gathering the postings of
+that row's terms and summing them with np.bincount. Request handling never
+imports this module; the detail page reads the stored RelatedArticle rows.
+"""
+import hashlib
+import json
+import math
+from collections import Counter
+
+import numpy as np
+
+from .inverted_index import tokenize
+
+
+def similarity_text(article):
+    """The text an article is compared on: title, tags and body"""
+    return ' '.join([article.title, ' '.join(str(tag) for tag in article.tags or []), article.content])
+
+
+def similarity_hash(article):
+    """Changes whenever anything that feeds the article's vector changes"""
+    payload = json.dumps([article.content_hash, article.title, article.tags], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class TfidfMatrix:
+    """
+    L2-normalized TF-IDF vectors for a list of documents
+
+    Stored twice: CSR (row -> terms) to read a document's vector and CSC
+    (term -> rows) to find every document sharing those terms.
+    """
+
+    def __init__(self, documents, max_features=20000, min_df=1, max_df=0.9):
+        counts = [Counter(tokenize(text)) for text in documents]
+        n_docs = len(counts)
+
+        df = Counter()
+        for doc in counts:
+            df.update(doc.keys())
+        # Terms in nearly every document carry no signal; keep the rest by df
+        max_count = max(1, math.floor(max_df * n_docs)) if n_docs > 2 else n_docs
+        terms = [term for term, n in df.items() if min_df <= n <= max_count]
+        terms.sort(key=lambda term: (-df[term], term))
+        self.vocabulary = {term: i for i, term in enumerate(terms[:max_features])}
+
+        idf = np.array(
+            [math.log((1 + n_docs) / (1 + df[term])) + 1 for term in self.vocabulary],
+            dtype=np.float32,
+        )
+
+        indptr = [0]
+        indices = []
+        data = []
+        for doc in counts:
+            row = sorted(
+                (self.vocabulary[term], 1 + math.log(n))
+                for term, n in doc.items()
+                if term in self.vocabulary
+            )
+            indices.extend(i for i, _ in row)
+            data.extend(tf for _, tf in row)
+            indptr.append(len(indices))
+
+        self.n_docs = n_docs
+        self.indptr = np.array(indptr, dtype=np.int64)
+        self.indices = np.array(indices, dtype=np.int32)
+        self.data = np.array(data, dtype=np.float32) * idf[self.indices] if indices else np.zeros(0, np.float32)
+
+        # L2-normalize each row so dot products are cosines
+        row_ids = np.repeat(np.arange(n_docs), np.diff(self.indptr))
+        norms = np.sqrt(np.bincount(row_ids, weights=self.data ** 2, minlength=n_docs))
+        norms[norms == 0] = 1
+        self.data = (self.data / norms[row_ids]).astype(np.float32)
+
+        # CSC copy: entries grouped by term
+        order = np.argsort(self.indices, kind='stable')
+        self.csc_rows = row_ids[order].astype(np.int32)
+        self.csc_data = self.data[order]
+        self.csc_indptr = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.indices, minlength=len(self.vocabulary)), out=self.csc_indptr[1:])
+
+    def similarities(self, row):
+        """Cosine similarity of one row against every row (itself set to 0)"""
+        start, end = self.indptr[row], self.indptr[row + 1]
+        terms = self.indices[start:end]
+        weights = self.data[start:end]
+
+        col_starts = self.csc_indptr[terms]
+        lengths = self.csc_indptr[terms + 1] - col_starts
+        total = int(lengths.sum())
+        if not total:
+            return np.zeros(self.n_docs, dtype=np.float64)
+
+        # Positions of every posting for these terms, without a Python loop
+        offsets = np.repeat(col_starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        positions = offsets + np.arange(total)
+        values = self.csc_data[positions] * np.repeat(weights, lengths)
+
+        sims = np.bincount(self.csc_rows[positions], weights=values, minlength=self.n_docs)
+        sims[row] = 0
+        return sims
+
+    def top_k(self, row, k, sims=None):
+        """[(other_row, score), ...] best first, ties broken by row number"""
+        if sims is None:
+            sims = self.similarities(row)
+        candidates = np.flatnonzero(sims > 0)
+        if len(candidates) > k:
+            # Keep the k best plus anything tied with the k-th, then sort exactly
+            kth = np.partition(sims[candidates], len(candidates) - k)[len(candidates) - k]
+            candidates = candidates[sims[candidates] >= kth]
+        ranked = sorted(candidates.tolist(), key=lambda other: (-sims[other], other))
+        return [(other, float(sims[other])) for other in ranked[:k]]
@@ -0,0 +1,75 @@
+"""
+Content-addressed media storage
+
+Uploads are stored as <upload_to>/<h[:2]>/<h>.<ext>, where h is the SHA-256
+of the file's bytes. The hash is computed while the upload is streamed to
+a temporary file in the destination directory; if a blob with that hash
+already exists the temporary file is dropped and the existing name is
+returned, so re-uploading the same photo costs no disk space.
+
+Derivatives are keyed by the original's storage name (generated
+thumbnails, ImageVariant rows, the /media/r/ cache), so a duplicate upload
+also finds them already made.
+
+Blobs are shared between rows and never deleted on save or delete; the
+gc_media command removes the ones nothing references any more.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+
+# <upload_to>/ab/abcdef....ext
+BLOB_NAME = re.compile(r'(?:^|/)(?P<prefix>[0-9a-f]{2})/(?P=prefix)[0-9a-f]{62}(?:\.\w+)?$')
+
+
+def is_blob_name(name):
+    return bool(BLOB_NAME.search(name))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage naming every saved file by the hash of its contents"""
+
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content in _save, and a taken
+        # name is the same file, so never append a suffix
+        return name
+
+    def _save(self, name, content):
+        directory, basename = posixpath.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        full_directory = self.path(directory)
+        os.makedirs(full_directory, exist_ok=True)
+
+        digest = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=full_directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as output:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode('utf-8')
+                    digest.update(chunk)
+                    output.write(chunk)
+            hexdigest = digest.hexdigest()
+            name = posixpath.join(directory, hexdigest[:2], f'{hexdigest}{extension}')
+            path = self.path(name)
+            if os.path.exists(path):
+                os.unlink(tmp)  # Duplicate upload: keep the existing blob
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Two identical uploads racing here write the same bytes
+                os.replace(tmp, path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        return name
+
+
+content_addressed_storage = ContentAddressedStorage()
@@ -0,0 +1,171 @@
+"""
+Background job handlers (run by the runworker command)
+
+Imported from CoreConfig.ready so every process knows the handlers.
+
+The render_* helpers only touch storage and return what the database
+should record, so the regenerate_images command can run them in worker
+processes and batch the writes itself.
+"""
+import logging
+import os
+import re
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from .cache import bump_content_version
+from .images import ImageTooLarge, describe, make_thumbnail, make_variants, thumbnail_name, variant_name
+from .jobs import PermanentJobError, register
+from .models import Article, GalleryItem, ImageVariant
+from .newsletter_csv import import_storage, import_subscribers
+
+
+THUMBNAIL_DIR = GalleryItem._meta.get_field('thumbnail').upload_to
+
+# Models with layout metadata, and the image field its <field>_* columns describe
+IMAGE_METADATA_FIELDS = (
+    (GalleryItem, 'image'),
+    (Article, 'featured_image'),
+)
+METADATA_KEYS = ('width', 'height', 'orientation', 'color', 'lqip')
+
+logger = logging.getLogger(__name__)
+
+
+def generated_thumbnail_name(image_name):
+    """Where the generated thumbnail of an image lives"""
+    return f"{THUMBNAIL_DIR}{thumbnail_name(image_name)}"
+
+
+def is_generated_thumbnail(item):
+    """
+    False for thumbnails uploaded by hand, which must not be overwritten
+
+    Also True for the generated name plus the random suffix storage adds
+    on a name clash (photo_thumb_AbC123x.jpg), which two renders racing
+    for the same name could leave behind.
+    """
+    if not item.thumbnail:
+        return False
+    root, ext = os.path.splitext(generated_thumbnail_name(item.image.name))
+    return re.fullmatch(rf'{re.escape(root)}(_[a-zA-Z0-9]{{7}})?{re.escape(ext)}', item.thumbnail.name) is not None
+
+
+def render_thumbnail(image_name):
+    """Write the thumbnail of a stored image; returns its storage name"""
+    with default_storage.open(image_name, 'rb') as source:
+        data = make_thumbnail(source)
+    name = generated_thumbnail_name(image_name)
+    default_storage.delete(name)
+    return default_storage.save(name, ContentFile(data))
+
+
+def render_variants(source):
+    """Write the variant files of a stored image; returns unsaved ImageVariant rows"""
+    variants = []
+    with default_storage.open(source, 'rb') as original:
+        for fmt, width, height, data in make_variants(original):
+            name = variant_name(source, width, fmt)
+            default_storage.delete(name)
+            variants.append(ImageVariant(
+                source=source,
+                format=fmt,
+                width=width,
+                height=height,
+                file=default_storage.save(name, ContentFile(data)),
+                size=len(data),
+            ))
+    return variants
+
+
+def save_variants(variants_by_source):
+    """Replace the ImageVariant rows of each source, deleting files no longer used"""
+    kept = {variant.file.name for variants in variants_by_source.values() for variant in variants}
+    old = ImageVariant.objects.filter(source__in=list(variants_by_source))
+    for variant in old:
+        if variant.file.name not in kept:
+            variant.file.delete(save=False)
+    old.delete()
+    ImageVariant.objects.bulk_create(
+        [variant for variants in variants_by_source.values() for variant in variants],
+        batch_size=500,
+    )
+
+
+def read_metadata(source):
+    """describe() a stored image"""
+    with default_storage.open(source, 'rb') as original:
+        return describe(original)
+
+
+def known_metadata(source):
+    """Metadata already recorded on any row showing `source`, or None"""
+    for model, field in IMAGE_METADATA_FIELDS:
+        columns = [f'{field}_{key}' for key in METADATA_KEYS]
+        row = model.objects.filter(**{field: source, f'{field}_width__isnull': False}).values(*columns).first()
+        if row is not None:
+            return {key: row[f'{field}_{key}'] for key in METADATA_KEYS}
+    return None
+
+
+def save_metadata(source, metadata):
+    """Copy describe() output onto every row whose image is `source`; returns rows updated"""
+    updated = 0
+    for model, field in IMAGE_METADATA_FIELDS:
+        # update() skips save(), so no signals and no re-queued jobs
+        updated += model.objects.filter(**{field: source}).update(
+            **{f'{field}_{key}': value for key, value in metadata.items()}
+        )
+    return updated
+
+
+@register('gallery.thumbnail')
+def gallery_thumbnail(pk):
+    """Generate the 400x400 thumbnail for a gallery item that has none"""
+    item = GalleryItem.objects.filter(pk=pk).first()
+    if item is None or not item.image or item.thumbnail:
+        return  # Deleted, or a thumbnail was uploaded meanwhile
+
+    # A duplicate upload (core.storage) shares the original's thumbnail
+    name = generated_thumbnail_name(item.image.name)
+    if not default_storage.exists(name):
+        try:
+            name = render_thumbnail(item.image.name)
+        except ImageTooLarge as exc:
+            raise PermanentJobError(str(exc)) from exc
+    # update() avoids re-running the post_save receivers
+    GalleryItem.objects.filter(pk=pk).update(thumbnail=name)
+    bump_content_version()
+
+
+@register('images.variants')
+def image_variants(source):
+    """(Re)generate the variants and layout metadata of a stored image"""
+    if not default_storage.exists(source):
+        return  # Replaced or deleted since the job was queued
+
+    try:
+        metadata = read_metadata(source)
+        variants = render_variants(source)
+    except ImageTooLarge as exc:
+        raise PermanentJobError(str(exc)) from exc
+    save_metadata(source, metadata)
+    save_variants({source: variants})
+    bump_content_version()
+
+
+@register('newsletter.import')
+def newsletter_import(name):
+    """Import a subscriber CSV stored by newsletter_csv.queue_import"""
+    storage = import_storage()
+    if not storage.exists(name):
+        return  # Imported by an earlier attempt
+    with storage.open(name, 'rb') as upload:
+        result = import_subscribers(upload.file)
+    storage.delete(name)
+    logger.info(
+        'Imported %s: %d subscriber(s) added, %d duplicate(s) skipped, %d invalid address(es)%s',
+        name, result['added'], result['duplicates'], result['invalid'],
+        f" (lines {', '.join(map(str, result['invalid_lines']))})" if result['invalid_lines'] else '',
+    )
@@ -0,0 +1,81 @@
+"""
+Custom template tags for responsive images
+
+Variants come from the ImageVariant table (core.tasks.image_variants).
+Pass a prefetched list (see ImageVariant.objects.attach) in loops; without
+one each tag looks the variants up itself.
+"""
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from core.models import ImageVariant
+
+register = template.Library()
+
+# Listed in <picture> in this order; browsers take the first type they support
+SOURCE_FORMATS = ('avif', 'webp')
+
+
+def _variants(image, variants):
+    if variants is None:
+        variants = ImageVariant.objects.for_files([image]).get(image.name, [])
+    return variants
+
+
+def _srcset(variants, fmt):
+    return ', '.join(f'{variant.file.url} {variant.width}w' for variant in variants if variant.format == fmt)
+
+
+@register.simple_tag
+def srcset(image, variants=None, fmt='webp'):
+    """
+    srcset attribute value for one format, falling back to JPEG
+
+    Usage in templates:
+        {% srcset item.image item.image_variants %}
+    """
+    if not image:
+        return ''
+    variants = _variants(image, variants)
+    return _srcset(variants, fmt) or _srcset(variants, 'jpeg')
+
+
+@register.simple_tag
+def picture(image, variants=None, sizes='100vw', alt='', css_class='', loading='lazy', picture_class='',
+            width=None, height=None, color='', placeholder=''):
+    """
+    <picture> with AVIF/WebP sources and a JPEG srcset fallback
+
+    Usage in templates:
+        {% picture article.featured_image sizes="(min-width: 768px) 768px, 100vw" alt=article.title %}
+
+    width/height reserve the layout box before the image loads; color and
+    placeholder (a data URI) paint behind it meanwhile. Without generated
+    variants this is a plain <img> of the original.
+    """
+    if not image:
+        return ''
+    variants = _variants(image, variants)
+    fallback = _srcset(variants, 'jpeg')
+    attributes = []
+    if fallback:
+        attributes.append(format_html(' srcset="{}" sizes="{}"', fallback, sizes))
+    if width and height:
+        attributes.append(format_html(' width="{}" height="{}"', width, height))
+    if color or placeholder:
+        background = ' '.join(filter(None, [color, f'url({placeholder})' if placeholder else '']))
+        attributes.append(format_html(
+            ' style="background: {} center / cover no-repeat"', background,
+        ))
+    img = format_html(
+        '<img src="{}"{} alt="{}" class="{}" loading="{}" decoding="async">',
+        image.url, format_html_join('', '{}', ((attribute,) for attribute in attributes)),
+        alt, css_class, loading,
+    )
+    sources = format_html_join(
+        '', '<source type="image/{}" srcset="{}" sizes="{}">',
+        ((fmt, _srcset(variants, fmt), sizes) for fmt in SOURCE_FORMATS if _srcset(variants, fmt)),
+    )
+    if picture_class:
+        return format_html('<picture class="{}">{}{}</picture>', picture_class, sources, img)
+    return format_html('<picture>{}{}</picture>', sources, img)
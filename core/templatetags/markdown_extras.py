@@ -3,7 +3,8 @@ Custom template tags for markdown rendering
 """
 from django import template
 from django.utils.safestring import mark_safe
-import markdown2
+
+from core.rendering import render_markdown_cached
 
 register = template.Library()
 
@@ -25,22 +26,14 @@ def markdown_filter(text):
     - Code blocks ```code```
     - Lists (- item)
     - Blockquotes (> quote)
+
+    Output is memoised in a byte-bounded LRU keyed by a hash of the text
+    (see core.rendering.MarkdownRenderCache), so repeated blocks render
+    once per worker. For Article bodies prefer
+    `{{ article.rendered_content }}`, which serves the HTML stored at save
+    time.
     """
     if not text:
         return ''
 
-    # Markdown extras for better formatting
-    extras = [
-        'fenced-code-blocks',  # ```python code ```
-        'tables',              # GitHub-style tables
-        'code-friendly',       # Better handling of underscores
-        'break-on-newline',    # Convert \n to <br>
-        'cuddled-lists',       # Better list handling
-        'header-ids',          # Add IDs to headers for linking
-        'footnotes',           # [^1] footnote syntax
-        'strike',              # ~~strikethrough~~
-        'task_list',           # - [ ] task items
-    ]
-
-    html = markdown2.markdown(text, extras=extras)
-    return mark_safe(html)
+    return mark_safe(render_markdown_cached(text))
@@ -0,0 +1,19 @@
+"""
+Custom template tags for search results
+"""
+from django import template
+
+from core.search import highlight_snippet
+
+register = template.Library()
+
+
+@register.filter(name='highlight')
+def highlight_filter(snippet):
+    """
+    Renders an FTS snippet with matched terms wrapped in <mark>
+
+    Usage in templates:
+        {{ article.search_snippet|highlight }}
+    """
+    return highlight_snippet(snippet)
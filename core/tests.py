@@ -1,3 +1,1393 @@
-from django.test import TestCase
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import zlib
+from importlib import import_module
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from PIL import Image
+
+from . import images, inverted_index, jobs, resized, search, tasks
+from .cache import (
+    CONTENT_VERSION_KEY,
+    CSRF_INPUT_RE,
+    CSRF_PLACEHOLDER,
+    bump_content_version,
+    get_content_version,
+    page_cache_key,
+    stale_while_revalidate,
+)
+from .counters import view_counter
+from .newsletter_csv import export_rows, import_subscribers
+from .pagination import clean_cursor_values, encode_cursor, keyset_paginate
+from .rendering import MarkdownRenderCache, markdown_hash, render_markdown
+from .templatetags.image_extras import picture, srcset
+from .models import (
+    Article,
+    ArticleQuerySet,
+    ArticleViewDay,
+    Campaign,
+    Delivery,
+    Experience,
+    GalleryItem,
+    ImageVariant,
+    Job,
+    NewsletterSubscriber,
+    RelatedArticle,
+    RelatedProject,
+    Resume,
+    TAG_MAX_LENGTH,
+    Tag,
+)
+
+
+# The page, microcache and version keys live in the default cache; tests
+# must not clear or fill the real one in BASE_DIR/.cache
+test_caches = override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'core-tests'},
+})
+
+
+def setUpModule():
+    test_caches.enable()
+
+
+def tearDownModule():
+    test_caches.disable()
+    # Hits buffered by other tests must not be flushed at exit into the real database
+    view_counter.discard()
+
+
+class StoredMarkdownTests(TestCase):
+    def test_save_stores_rendered_html(self):
+        article = Article.objects.create(title='Stored', content='Some **bold** text')
+        self.assertIn('<strong>bold</strong>', article.content_html)
+        self.assertEqual(article.content_hash, markdown_hash(article.content))
+
+    def test_stale_hash_falls_back_to_a_live_render(self):
+        article = Article.objects.create(title='Stale', content='Old text')
+        # update() skips save(), leaving the stored HTML behind
+        Article.objects.filter(pk=article.pk).update(content='*New* text')
+        article.refresh_from_db()
+        self.assertIn('Old text', article.content_html)
+        self.assertIn('<em>New</em>', article.rendered_content)
+
+    def test_render_articles_rewrites_only_stale_rows(self):
+        fresh = Article.objects.create(title='Fresh', content='Fresh text')
+        stale = Article.objects.create(title='Stale', content='Old text')
+        Article.objects.filter(pk=stale.pk).update(content='*New* text')
+
+        output = StringIO()
+        call_command('render_articles', stdout=output)
+        self.assertIn('Rendered 1 article(s)', output.getvalue())
+        stale.refresh_from_db()
+        self.assertIn('<em>New</em>', stale.content_html)
+        self.assertEqual(stale.content_hash, markdown_hash(stale.content))
+
+        call_command('render_articles', '--force', stdout=output)
+        self.assertIn('Rendered 2 article(s)', output.getvalue())
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.content_hash, markdown_hash(fresh.content))
+
+class MarkdownRenderCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def cost(self, text):
+        return len(markdown_hash(text)) + len(render_markdown(text).encode('utf-8'))
+
+    def test_evicts_least_recently_used_within_the_byte_budget(self):
+        texts = ['first paragraph', 'second paragraph', 'third paragraph']
+        render_cache = MarkdownRenderCache(max_bytes=self.cost(texts[0]) + self.cost(texts[1]))
+        render_cache.render(texts[0])
+        render_cache.render(texts[1])
+        render_cache.render(texts[0])  # Now the most recent
+        render_cache.render(texts[2])  # Evicts texts[1]
+
+        stats = render_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (1, 3, 1))
+        self.assertLessEqual(stats['bytes'], stats['max_bytes'])
+        render_cache.render(texts[0])
+        self.assertEqual(render_cache.stats()['hits'], 2)
+        render_cache.render(texts[1])
+        self.assertEqual(render_cache.stats()['misses'], 4)
+
+    def test_entry_larger_than_the_budget_is_not_kept(self):
+        render_cache = MarkdownRenderCache(max_bytes=self.cost('small'))
+        render_cache.render('small')
+        render_cache.render('x' * 1000)
+        self.assertEqual(render_cache.stats()['entries'], 1)
+        self.assertEqual(render_cache.stats()['evictions'], 0)
+
+    def test_misses_fall_through_to_the_shared_cache(self):
+        text = 'Shared *render*'
+        render_cache = MarkdownRenderCache(max_bytes=1024 * 1024, cache_alias='default')
+        render_cache.render(text)
+        self.assertEqual(cache.get(f'markdown:{markdown_hash(text)}'), render_markdown(text))
+
+        other_worker = MarkdownRenderCache(max_bytes=1024 * 1024, cache_alias='default')
+        with mock.patch('core.rendering.render_markdown') as render:
+            self.assertIn('<em>render</em>', other_worker.render(text))
+        render.assert_not_called()
+        self.assertEqual(other_worker.stats()['shared_hits'], 1)
+
+    def test_unset_timeout_uses_the_cache_default(self):
+        render_cache = MarkdownRenderCache(max_bytes=1024, cache_alias='default')
+        with mock.patch.object(cache, 'set') as set_:
+            render_cache.render('Timed')
+        self.assertIs(set_.call_args.args[2], DEFAULT_TIMEOUT)
+
+class FtsSearchTests(TestCase):
+    """bm25 ranking, snippets and trigger sync of the SQLite FTS5 engine"""
+
+    def setUp(self):
+        if not search.fts_available():
+            self.skipTest('FTS5 is SQLite only')
+        self.in_title = Article.objects.create(
+            title='Pricing strategy', slug='in-title', content='How to set prices.', status='published',
+        )
+        self.in_body = Article.objects.create(
+            title='Notes', slug='in-body', content='A word on <b>strategy</b> and more.', status='published',
+        )
+
+    def search(self, query):
+        return list(search.fts_search(Article.objects.all(), query))
+
+    def test_title_matches_rank_above_body_matches(self):
+        self.assertEqual(self.search('strategy'), [self.in_title, self.in_body])
+        self.assertEqual(self.search('strat'), [self.in_title, self.in_body])  # Last word is a prefix
+
+    def test_snippet_is_escaped_and_highlighted(self):
+        hit = self.search('strategy')[1]
+        snippet = search.highlight_snippet(hit.search_snippet)
+        self.assertIn('&lt;b&gt;<mark>strategy</mark>&lt;/b&gt;', snippet)
+
+    def test_operators_in_the_query_are_literal(self):
+        self.assertEqual(self.search('strategy OR "'), [])
+        self.assertEqual(self.search('NEAR('), [])
+        self.assertEqual(self.search('   '), [])
+
+    def test_index_follows_inserts_updates_and_deletes(self):
+        self.in_body.content = 'Nothing relevant'
+        self.in_body.save()
+        self.assertEqual(self.search('strategy'), [self.in_title])
+        Article.objects.filter(pk=self.in_title.pk).update(title='Pricing')
+        self.assertEqual(self.search('strategy'), [])
+        self.assertEqual(self.search('pricing'), [self.in_title])
+        self.in_title.delete()
+        self.assertEqual(self.search('pricing'), [])
+
+    def test_missing_triggers_fall_back_to_the_inverted_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER core_article_fts_au')
+        with mock.patch.object(search, '_fts_available', None), self.assertLogs('core.search', 'WARNING'):
+            self.assertFalse(search.fts_available())
+            results = search.search_articles(Article.objects.all(), 'strategy')
+        self.assertNotIn('search_snippet', results.query.annotations)
+        self.assertEqual(set(results), {self.in_title, self.in_body})
+
+    def test_rebuild_command_restores_missing_triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER core_article_fts_au')
+        output = StringIO()
+        with mock.patch.object(search, '_fts_available', None):
+            call_command('rebuild_search_index', stdout=output)
+            self.assertTrue(search.fts_available())
+        self.assertIn('Restored missing sync trigger(s): core_article_fts_au', output.getvalue())
+        self.assertIn('Indexed 2 article(s)', output.getvalue())
+        self.assertEqual(search.missing_fts_triggers(), [])
+
+
+class FtsTriggerTests(TestCase):
+    """The FTS index must survive migrations that rebuild core_article"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_migrated_database_has_the_sync_triggers(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('FTS5 is SQLite only')
+        self.assertEqual(search.missing_fts_triggers(), [])
+
+    def test_new_article_is_found_through_essay_search(self):
+        Article.objects.create(title='Pricing strategy', slug='pricing', content='Body', status='published')
+        response = self.client.get(reverse('kiota') + '?q=strategy')
+        self.assertEqual([article.slug for article in response.context['articles']], ['pricing'])
+
+    def test_restores_dropped_triggers_and_reindexes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('FTS5 is SQLite only')
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER core_article_fts_ai')
+        article = Article.objects.create(title='Unindexed strategy', slug='unindexed', status='published')
+        self.assertEqual(search.restore_fts_triggers(), ['core_article_fts_ai'])
+        self.assertEqual(list(search.search_articles(Article.objects.all(), 'unindexed')), [article])
+
+class InvertedIndexTests(TestCase):
+    """The in-process BM25 engine, used where FTS5 is unavailable"""
+
+    def setUp(self):
+        self.in_title = Article.objects.create(
+            title='Designing pricing', slug='in-title', content='Notes on margins.', status='published',
+        )
+        self.in_body = Article.objects.create(
+            title='Notes', slug='in-body', content='The designer said pricing designs vary.', status='published',
+        )
+        inverted_index.load_article_index()
+
+    def tearDown(self):
+        # Rebuilt from the database on next use
+        inverted_index.get_article_index().clear()
+
+    def search(self, query):
+        return [doc_id for doc_id, _ in inverted_index.get_article_index().search(query)]
+
+    def test_tokenize_drops_stopwords_and_stems(self):
+        self.assertEqual(inverted_index.tokenize('The designs, designed and designing'), ['design'] * 3)
+        self.assertEqual(inverted_index.tokenize('Running stories'), ['run', 'story'])
+
+    def test_title_hits_rank_first(self):
+        self.assertEqual(self.search('design'), [self.in_title.pk, self.in_body.pk])
+        self.assertEqual(self.search('margins'), [self.in_title.pk])
+        self.assertEqual(self.search('the and'), [])
+
+    def test_follows_saves_unpublishing_and_deletes(self):
+        self.in_body.content = 'Nothing relevant'
+        self.in_body.save()
+        self.assertEqual(self.search('pricing'), [self.in_title.pk])
+        self.in_title.status = 'draft'
+        self.in_title.save()
+        self.assertEqual(self.search('pricing'), [])
+        self.in_body.delete()
+        self.assertEqual(len(inverted_index.get_article_index()), 0)
+
+    @override_settings(ESSAY_SEARCH_ENGINE='inverted')
+    def test_essay_search_ranks_with_the_index(self):
+        cache.clear()
+        response = self.client.get(reverse('kiota'), {'q': 'designs'})
+        self.assertEqual([article.slug for article in response.context['articles']], ['in-title', 'in-body'])
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        start = timezone.now()
+        for i in range(5):
+            Article.objects.create(
+                title=f'Essay {i}', slug=f'essay-{i}', status='published',
+                published_date=start - datetime.timedelta(days=i // 2),  # Ties broken by id
+            )
+        GalleryItem.objects.create(title='Photo', image='gallery/photo.jpg')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_cover_every_row_once(self):
+        articles = Article.objects.all()
+        slugs, cursor = [], None
+        while True:
+            page = keyset_paginate(articles, ('-published_date', '-id'), cursor, per_page=2)
+            slugs += [article.slug for article in page]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(slugs, [article.slug for article in articles.order_by('-published_date', '-id')])
+
+    def test_malformed_cursor_serves_the_first_page(self):
+        cursors = [
+            'not base64!', encode_cursor(['abc', 'x']), encode_cursor([{'a': 1}, 1]),
+            encode_cursor(['abc', 'x', 'y']), encode_cursor([[1], {'a': 1}, 'x']),
+        ]
+        for url in ['kiota', 'gallery', 'gallery_api']:
+            for query in ['', '&q=essay']:
+                for cursor in cursors:
+                    with self.subTest(url=url, query=query, cursor=cursor):
+                        response = self.client.get(f'{reverse(url)}?cursor={cursor}{query}')
+                        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(clean_cursor_values(Article.objects.all(), ('-published_date', '-id'), [1, 2]))
+
+    def query_plan(self, queryset, ordering):
+        page = keyset_paginate(queryset, ordering, per_page=2)
+        with CaptureQueriesContext(connection) as queries:
+            keyset_paginate(queryset, ordering, page.next_cursor, per_page=2)
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {queries.captured_queries[-1]['sql']}")
+            return ' / '.join(row[-1] for row in cursor.fetchall())
+
+    def test_later_pages_seek_the_listing_index(self):
+        for i in range(4):
+            GalleryItem.objects.create(title=f'Photo {i}', image=f'gallery/photo-{i}.jpg', order=i // 2)
+        plans = {
+            'article_listing_idx': self.query_plan(Article.objects.published(), ('-published_date', '-id')),
+            'gallery_listing_idx': self.query_plan(
+                GalleryItem.objects.filter(is_visible=True), ('order', '-created_at', '-id'),
+            ),
+        }
+        for index, plan in plans.items():
+            with self.subTest(index=index):
+                self.assertRegex(plan, rf'SEARCH \S+ USING INDEX {index} \(.*[<>]\?\)')
+                self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_published_articles_always_have_a_date(self):
+        draft = Article.objects.create(title='Draft', slug='draft')
+        self.assertIsNone(draft.published_date)
+        draft.status = 'published'
+        draft.save(update_fields=['status'])
+        self.assertIsNotNone(Article.objects.get(pk=draft.pk).published_date)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Article.objects.filter(pk=draft.pk).update(published_date=None)
+
+
+class RelatedProjectTests(TestCase):
+    def project(self, title, tech_stack):
+        return Experience.objects.create(
+            type='project', title=title, organization='Personal', start_date='2024-01-01',
+            description='A project', tech_stack=tech_stack,
+        )
+
+    def links(self):
+        return set(RelatedProject.objects.values_list('project__title', 'related__title', 'overlap'))
+
+    def test_overlap_ignores_case_and_whitespace(self):
+        self.project('A', ['Python', ' Django ', ''])
+        self.project('B', ['python', 'DJANGO', 'React'])
+        self.project('C', ['Go'])
+        self.assertEqual(self.links(), {('A', 'B', 2), ('B', 'A', 2)})
+
+    def test_links_follow_edits_and_deletes(self):
+        a = self.project('A', ['Python'])
+        b = self.project('B', ['Go'])
+        b.tech_stack = ['Go', 'python']
+        b.save()
+        self.assertEqual(a.related_projects(), [b])
+        b.delete()
+        self.assertEqual(self.links(), set())
+
+    def test_migration_backfill_matches_rebuild_all(self):
+        self.project('A', ['Python', 'Django  REST', ''])
+        self.project('B', ['python', 'django rest', ' '])
+        self.project('C', ['', 'Rust'])
+        self.project('D', ['  ', 'rust'])
+        RelatedProject.rebuild_all()
+        live = self.links()
+        RelatedProject.objects.all().delete()
+        migration = import_module('core.migrations.0007_relatedproject')
+        migration.backfill_related_projects(django_apps, None)
+        self.assertEqual(self.links(), live)
+        self.assertIn(('A', 'B', 2), live)
+        self.assertNotIn(('A', 'C', 1), live)
+
+class TagTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_names_share_a_tag_regardless_of_case_and_spacing(self):
+        first, = Tag.for_names(['Machine  Learning'])
+        self.assertEqual(Tag.for_names(['machine learning', ' ', 'MACHINE LEARNING']), [first])
+        self.assertEqual((first.name, first.key), ('Machine Learning', 'machine learning'))
+
+    def test_over_long_names_are_cut_to_the_column_length(self):
+        long_name = 'Very ' + 'long ' * 40 + 'tag'
+        tag, = Tag.for_names([long_name])
+        tag.full_clean()
+        self.assertEqual(len(tag.key), len(tag.name))
+        self.assertLessEqual(len(tag.key), TAG_MAX_LENGTH)
+
+        Article.objects.create(title='Tagged', slug='tagged', status='published', tags=[long_name])
+        response = self.client.get(reverse('kiota'), {'tag': long_name.upper()})
+        self.assertEqual([article.slug for article in response.context['articles']], ['tagged'])
+
+class RelatedArticleTests(TestCase):
+    TEXTS = {
+        'garden': 'Tomatoes, compost and soil in a small vegetable garden',
+        'compost': 'Compost heaps feed the soil for garden vegetables',
+        'sql': 'Indexes make database queries and joins fast',
+        'postgres': 'Database indexes, queries and query planners',
+        'bread': 'Sourdough bread needs flour, water and patience',
+    }
+
+    def setUp(self):
+        self.articles = {
+            slug: Article.objects.create(title=slug.title(), slug=slug, content=text, status='published')
+            for slug, text in self.TEXTS.items()
+        }
+
+    def compute(self, *args):
+        output = StringIO()
+        call_command('compute_related_articles', '--top-k', '2', *args, stdout=output)
+        return output.getvalue()
+
+    def neighbours(self, slug):
+        return [article.slug for article in self.articles[slug].related_articles()]
+
+    def stored(self):
+        return list(RelatedArticle.objects.order_by('article_id', 'rank').values_list('article_id', 'related_id', 'rank'))
+
+    def test_closest_articles_come_first(self):
+        self.compute()
+        self.assertEqual(self.neighbours('garden')[0], 'compost')
+        self.assertEqual(self.neighbours('sql')[0], 'postgres')
+        self.assertNotIn('bread', self.neighbours('garden'))
+
+    def test_incremental_runs_match_a_full_run(self):
+        self.compute()
+        self.assertIn('Recomputed neighbours for 0 article(s)', self.compute())
+
+        bread = self.articles['bread']
+        bread.content = 'Database indexes for a bakery: queries about flour'
+        bread.save()
+        self.articles['compost'].status = 'draft'
+        self.articles['compost'].save()
+        self.compute()
+        incremental = self.stored()
+        self.assertFalse(RelatedArticle.objects.filter(article=self.articles['compost']).exists())
+
+        self.compute('--full')
+        self.assertEqual(self.stored(), incremental)
+
+class ListingProjectionTests(TestCase):
+    """Listing pages must never select the heavy Article/Experience columns"""
+
+    HEAVY_COLUMNS = [
+        f'"core_article"."{field}"' for field in ArticleQuerySet.HEAVY_FIELDS
+    ] + ['"core_experience"."achievements"']
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(4):
+            Article.objects.create(
+                title=f'Essay {i} on product strategy',
+                slug=f'essay-{i}',
+                excerpt='A short excerpt',
+                content='# Body\n\n' + 'product strategy ' * 2000,
+                custom_css='body { color: red; }',
+                custom_javascript='console.log("hi");',
+                status='published',
+                tags=['product'],
+            )
+        for i in range(3):
+            Experience.objects.create(
+                type='project',
+                title=f'Project {i}',
+                organization='Personal',
+                start_date='2024-01-01',
+                description='A project',
+                achievements=['Shipped it'] * 50,
+                tech_stack=['Python', 'Django'],
+            )
+
+    def setUp(self):
+        # Measure real renders, not page-cache hits
+        cache.clear()
+
+    def assertNoHeavyColumns(self, url, allowed=0):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        heavy = [
+            query['sql'] for query in queries.captured_queries
+            if any(column in query['sql'] for column in self.HEAVY_COLUMNS)
+        ]
+        self.assertLessEqual(len(heavy), allowed, '\n\n'.join(heavy))
+
+    def test_home(self):
+        self.assertNoHeavyColumns(reverse('home'))
+
+    def test_kiota(self):
+        self.assertNoHeavyColumns(reverse('kiota'))
+        self.assertNoHeavyColumns(reverse('kiota') + '?fragment=1')
+
+    def test_kiota_search(self):
+        self.assertNoHeavyColumns(reverse('kiota') + '?q=strategy')
+        cache.clear()
+        response = self.client.get(reverse('kiota') + '?q=strategy')
+        self.assertEqual(len(response.context['articles']), 4)
+
+    def test_kiota_tag_filter(self):
+        self.assertNoHeavyColumns(reverse('kiota') + '?tag=Product')
+
+    def test_small_bets(self):
+        self.assertNoHeavyColumns(reverse('small_bets'))
+        self.assertNoHeavyColumns(reverse('small_bets') + '?category=python')
+
+    def test_article_detail_related(self):
+        # Only the article being read may load its body
+        self.assertNoHeavyColumns(reverse('article_detail', args=['essay-0']), allowed=1)
+
+    def test_project_detail_related(self):
+        project = Experience.objects.first()
+        self.assertNoHeavyColumns(reverse('project_detail', args=[project.pk]), allowed=1)
+
+    def test_admin_changelists(self):
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+        self.assertNoHeavyColumns(reverse('admin:core_article_changelist'))
+        self.assertNoHeavyColumns(reverse('admin:core_experience_changelist'))
+
+
+class PageCacheTests(TestCase):
+    """Anonymous pages are cached per URL until any public content changes"""
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url, **kwargs):
+        return self.client.get(url, **kwargs).get('X-Page-Cache')
+
+    def test_keyed_by_full_path(self):
+        url = reverse('about')
+        self.assertEqual(self.get(url), 'miss')
+        self.assertEqual(self.get(url), 'hit')
+        self.assertEqual(self.get(url + '?utm=x'), 'miss')
+        self.assertEqual(self.get(url + '?utm=x'), 'hit')
+
+    def test_lost_version_never_revives_cached_pages(self):
+        url = reverse('about')
+        self.get(url)
+        seen = {get_content_version(), bump_content_version()}
+        self.get(url)
+        # Culled or cleared; the pages cached under earlier versions may still be there
+        cache.delete(CONTENT_VERSION_KEY)
+        self.assertNotIn(get_content_version(), seen)
+        self.assertEqual(self.get(url), 'miss')
+        cache.delete(CONTENT_VERSION_KEY)
+        self.assertNotIn(bump_content_version(), seen)
+
+    def test_only_anonymous_gets_are_cached(self):
+        url = reverse('about')
+        self.get(url)
+        self.client.force_login(get_user_model().objects.create_user('reader', password='password'))
+        self.assertIsNone(self.get(url))
+        self.client.logout()
+        self.client.cookies.pop(settings.SESSION_COOKIE_NAME, None)
+        self.assertEqual(self.get(url), 'hit')
+        self.assertIsNone(self.client.post(url).get('X-Page-Cache'))
+
+    def test_saves_and_deletes_invalidate(self):
+        url = reverse('kiota')
+        self.get(url)
+        article = Article.objects.create(title='New', slug='new', status='published')
+        self.assertEqual(self.get(url), 'miss')
+        self.assertEqual(self.get(url), 'hit')
+        article.delete()
+        self.assertEqual(self.get(url), 'miss')
+        # Rows that never appear on public pages leave the cache alone
+        NewsletterSubscriber.objects.create(email='reader@example.com')
+        self.assertEqual(self.get(url), 'hit')
+
+    def test_admin_bulk_actions_invalidate(self):
+        article = Article.objects.create(title='Draft', slug='draft', status='draft')
+        admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        anonymous = self.client_class()
+        anonymous.get(reverse('kiota'))
+
+        self.client.force_login(admin)
+        self.client.post(reverse('admin:core_article_changelist'), {
+            'action': 'make_published', '_selected_action': [article.pk],
+        })
+        response = anonymous.get(reverse('kiota'))
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Draft')
+
+    def test_csrf_token_is_per_visitor(self):
+        url = reverse('about')
+        first = self.client.get(url)
+        entry = cache.get(page_cache_key(RequestFactory().get(url)))
+        self.assertIn(f'value="{CSRF_PLACEHOLDER}"', entry['content'])
+
+        second = self.client_class().get(url)
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        tokens = [
+            CSRF_INPUT_RE.search(response.content.decode()).group(0)
+            for response in (first, second)
+        ]
+        self.assertNotIn(CSRF_PLACEHOLDER, ''.join(tokens))
+        self.assertNotEqual(tokens[0], tokens[1])
+
+class ConditionalGetTests(TestCase):
+    """Detail pages answer revalidations with 304 before rendering"""
+
+    def setUp(self):
+        cache.clear()
+        self.project = Experience.objects.create(
+            type='project', title='Project', organization='Personal', start_date='2024-01-01',
+            description='A project',
+        )
+        self.url = reverse('project_detail', args=[self.project.pk])
+
+    def test_etag_and_last_modified_revalidate(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        with self.assertNumQueries(1):
+            self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_edits_change_the_validators(self):
+        etag = self.client.get(self.url)['ETag']
+        self.project.title = 'Renamed'
+        self.project.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Renamed')
+
+        # The page also lists other projects, so any content edit counts
+        etag = response['ETag']
+        bump_content_version()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_missing_rows_have_no_validators(self):
+        response = self.client.get(reverse('project_detail', args=[self.project.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(self.client.get(reverse('resume')).has_header('ETag'))
+
+    def test_resume_revalidates(self):
+        Resume.objects.create(resume_file='resume/cv.pdf', is_active=True)
+        response = self.client.get(reverse('resume'))
+        self.assertEqual(self.client.get(reverse('resume'), HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+class StaleWhileRevalidateTests(TestCase):
+    """Expired copies are served while one background render replaces them"""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.renders = []
+
+        @stale_while_revalidate(soft_ttl=30, hard_ttl=600, name='test-view')
+        def view(request):
+            self.renders.append(threading.current_thread())
+            return HttpResponse(f'render {len(self.renders)}')
+        self.view = view
+
+    def get(self):
+        request = self.factory.get('/swr/')
+        request._messages = []
+        return self.view(request)
+
+    @property
+    def key(self):
+        return f'swr:test-view:GET:{hashlib.md5(b"/swr/").hexdigest()}'
+
+    def age_entry(self, seconds):
+        entry = cache.get(self.key)
+        entry['created'] -= seconds
+        cache.set(self.key, entry)
+
+    def wait_for_regeneration(self):
+        for thread in threading.enumerate():
+            if thread.name == 'microcache-regenerate':
+                thread.join(timeout=5)
+
+    def test_fresh_then_stale_then_regenerated(self):
+        self.assertEqual(self.get()['X-Microcache'], 'miss')
+        self.assertEqual(self.get()['X-Microcache'], 'fresh')
+        self.assertEqual(len(self.renders), 1)
+
+        self.age_entry(60)
+        response = self.get()
+        self.assertEqual(response['X-Microcache'], 'stale')
+        self.assertEqual(response.content, b'render 1')
+        self.wait_for_regeneration()
+        self.assertEqual(len(self.renders), 2)
+        self.assertIsNot(self.renders[1], threading.main_thread())
+
+        response = self.get()
+        self.assertEqual(response['X-Microcache'], 'fresh')
+        self.assertEqual(response.content, b'render 2')
+
+    def test_single_flight(self):
+        self.get()
+        self.age_entry(60)
+        cache.add(self.key + ':lock', 1)
+        for _ in range(5):
+            self.assertEqual(self.get()['X-Microcache'], 'stale')
+        self.wait_for_regeneration()
+        self.assertEqual(len(self.renders), 1)
+
+    def test_content_edit_renders_inline(self):
+        self.get()
+        bump_content_version()
+        response = self.get()
+        self.assertEqual(response['X-Microcache'], 'miss')
+        self.assertEqual(response.content, b'render 2')
+        self.assertEqual(self.renders[1], threading.main_thread())
+
+    def regenerating_inline(self):
+        """A regeneration thread could not read past this test's transaction"""
+        real_thread = threading.Thread
+
+        def thread(*args, **kwargs):
+            if kwargs.get('name') != 'microcache-regenerate':
+                return real_thread(*args, **kwargs)
+            return mock.Mock(start=lambda: kwargs['target'](*kwargs['args']))
+        patches = [mock.patch('threading.Thread', thread), mock.patch('core.cache.close_old_connections')]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def age_article(self, slug, seconds):
+        path = hashlib.md5(reverse('article_detail', args=[slug]).encode('utf-8')).hexdigest()
+        key = f'swr:article_detail:GET:{path}'
+        entry = cache.get(key)
+        entry['created'] -= seconds
+        cache.set(key, entry)
+
+    def test_stale_article_page_carries_no_validators(self):
+        Article.objects.create(title='Draft one', slug='essay', content='Body', status='published')
+        url = reverse('article_detail', args=['essay'])
+        self.assertIn('ETag', self.client.get(url))
+
+        # An edit that skips the signals, so the content version is unchanged
+        Article.objects.filter(slug='essay').update(title='Final title', updated_at=timezone.now())
+        self.age_article('essay', 10 * 60)
+        self.regenerating_inline()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Microcache'], 'stale')
+        self.assertContains(response, 'Draft one')
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        response = self.client.get(url)
+        self.assertEqual(response['X-Microcache'], 'fresh')
+        self.assertContains(response, 'Final title')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_unpublished_and_deleted_essays_leave_the_cache(self):
+        unpublished = Article.objects.create(title='Secret', slug='secret', content='Body', status='published')
+        deleted = Article.objects.create(title='Gone', slug='gone', content='Body', status='published')
+        for article in (unpublished, deleted):
+            self.assertEqual(self.client.get(reverse('article_detail', args=[article.slug])).status_code, 200)
+
+        unpublished.status = 'draft'
+        unpublished.save()
+        deleted.delete()
+        for article in (unpublished, deleted):
+            for _ in range(3):
+                self.assertEqual(self.client.get(reverse('article_detail', args=[article.slug])).status_code, 404)
+
+    def test_regeneration_drops_a_page_that_is_gone(self):
+        Article.objects.create(title='Secret', slug='secret', content='Body', status='published')
+        url = reverse('article_detail', args=['secret'])
+        self.client.get(url)
+
+        # Unpublished without signals: only the regeneration can notice
+        Article.objects.filter(slug='secret').update(status='draft')
+        self.age_article('secret', 10 * 60)
+        self.regenerating_inline()
+        self.assertEqual(self.client.get(url)['X-Microcache'], 'stale')
+        for _ in range(3):
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@override_settings(ESSAYS_PER_PAGE=2, GALLERY_PER_PAGE=2)
+class ExportStaticSiteTests(TestCase):
+    """The exported tree works without the app: no cursors, lightbox data on disk"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(3):
+            Article.objects.create(title=f'Essay {i}', slug=f'essay-{i}', content='Body', status='published')
+            GalleryItem.objects.create(title=f'Photo {i}', image=f'gallery/photo-{i}.jpg', order=i)
+        Article.objects.create(title='Unpublished', slug='draft', status='draft')
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.output = Path(self.tmp.name)
+
+    def export(self):
+        output = StringIO()
+        call_command('export_static_site', output=str(self.output), base_url='https://example.com', stdout=output)
+        return output.getvalue()
+
+    def page(self, *parts):
+        return self.output.joinpath(*parts, 'index.html').read_text(encoding='utf-8')
+
+    def test_exported_tree(self):
+        self.export()
+        essays = self.page('essays')
+        for i in range(3):
+            self.assertIn(f'Essay {i}', essays)
+            self.assertTrue(self.output.joinpath('essays', f'essay-{i}', 'index.html.gz').exists())
+        self.assertNotIn('cursor=', essays)
+        self.assertFalse(self.output.joinpath('essays', 'draft').exists())
+
+        gallery = self.page('gallery')
+        self.assertNotIn('cursor=', gallery)
+        self.assertIn(f"apiUrl: '{reverse('gallery_api')}", gallery)
+        api = json.loads(self.page(*reverse('gallery_api').strip('/').split('/')))
+        self.assertEqual([item['title'] for item in api['items']], ['Photo 0', 'Photo 1', 'Photo 2'])
+        self.assertIsNone(api['next'])
+        self.assertNotRegex(self.page('about'), r'name="csrfmiddlewaretoken" value="[^"]')
+
+    def test_incremental_run_renders_only_changes(self):
+        self.export()
+        self.assertIn('Rendered 0 page(s)', self.export())
+
+        Article.objects.filter(slug='essay-0').update(status='draft')
+        output = self.export()
+        self.assertIn('removed 1', output)
+        self.assertFalse(self.output.joinpath('essays', 'essay-0').exists())
+        self.assertNotIn('Essay 0', self.page('essays'))
+
+    def test_listings_follow_the_database_not_the_cache(self):
+        self.export()
+        # No signal and no version bump, then the cache (and its version) is lost
+        GalleryItem.objects.filter(title='Photo 1').update(title='Retitled photo')
+        cache.clear()
+        self.assertNotIn('Rendered 0 page(s)', self.export())
+        self.assertIn('Retitled photo', self.page('gallery'))
+
+        cache.clear()
+        self.assertIn('Rendered 0 page(s)', self.export())
+
+
+class JobQueueTests(TestCase):
+    """Jobs are claimed once, retried with backoff and finally marked failed"""
+
+    def setUp(self):
+        self.calls = []
+
+        def flaky(value):
+            self.calls.append(value)
+            raise RuntimeError('boom')
+        def ok(value):
+            self.calls.append(value)
+        jobs.register('test.flaky')(flaky)
+        jobs.register('test.ok')(ok)
+        self.addCleanup(jobs.HANDLERS.pop, 'test.flaky')
+        self.addCleanup(jobs.HANDLERS.pop, 'test.ok')
+
+    def test_enqueue_deduplicates_pending_jobs(self):
+        first = jobs.enqueue('test.ok', value=1)
+        self.assertEqual(jobs.enqueue('test.ok', value=1), first)
+        self.assertNotEqual(jobs.enqueue('test.ok', value=2), first)
+
+    def test_claimed_job_is_not_handed_out_twice(self):
+        jobs.enqueue('test.ok', value=1)
+        self.assertEqual(len(jobs.claim('worker-a', 5)), 1)
+        self.assertEqual(jobs.claim('worker-b', 5), [])
+
+    def test_success(self):
+        jobs.enqueue('test.ok', value=1)
+        job, = jobs.claim('worker', 1)
+        self.assertEqual(jobs.run(job), Job.DONE)
+        self.assertEqual(self.calls, [1])
+
+    def test_retry_then_fail(self):
+        job = jobs.enqueue('test.flaky', value=1)
+        Job.objects.filter(pk=job.pk).update(max_attempts=2)
+
+        job, = jobs.claim('worker', 1)
+        self.assertEqual(jobs.run(job), Job.PENDING)
+        job.refresh_from_db()
+        self.assertIn('boom', job.last_error)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertEqual(jobs.claim('worker', 1), [])  # Backing off
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        job, = jobs.claim('worker', 1)
+        self.assertEqual(jobs.run(job), Job.FAILED)
+        self.assertEqual(self.calls, [1, 1])
+
+    def test_stale_lock_is_released(self):
+        jobs.enqueue('test.ok', value=1)
+        job, = jobs.claim('dead-worker', 1)
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - datetime.timedelta(hours=1))
+        self.assertEqual(jobs.release_stale(), 1)
+        self.assertEqual(len(jobs.claim('worker', 1)), 1)
+
+
+@override_settings(IMAGE_VARIANT_WIDTHS=(320, 640, 1280), IMAGE_VARIANT_FORMATS=('webp', 'jpeg'))
+class ResponsiveVariantTests(TestCase):
+    """Uploads get width/format variants, served through <picture> and srcset"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        overrides = override_settings(MEDIA_ROOT=self.tmp.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def upload(self):
+        output = BytesIO()
+        Image.new('RGB', (1000, 500), (90, 20, 160)).save(output, format='JPEG')
+        with self.captureOnCommitCallbacks(execute=True):
+            return GalleryItem.objects.create(title='Wide', image=ContentFile(output.getvalue(), name='wide.jpg'))
+
+    def test_widths_never_upscale(self):
+        item = self.upload()
+        with default_storage.open(item.image.name, 'rb') as source:
+            sizes = [(fmt, width, height) for fmt, width, height, _ in images.make_variants(source)]
+        self.assertEqual(sizes, [
+            ('webp', 1000, 500), ('jpeg', 1000, 500),
+            ('webp', 640, 320), ('jpeg', 640, 320),
+            ('webp', 320, 160), ('jpeg', 320, 160),
+        ])
+
+    def test_upload_queues_variants_and_rerun_replaces_them(self):
+        item = self.upload()
+        job = Job.objects.get(kind='images.variants')
+        self.assertEqual(job.payload, {'source': item.image.name})
+
+        tasks.image_variants(item.image.name)
+        tasks.image_variants(item.image.name)
+        variants = ImageVariant.objects.filter(source=item.image.name)
+        self.assertEqual(variants.count(), 6)
+        for variant in variants:
+            self.assertTrue(default_storage.exists(variant.file.name))
+        self.assertEqual(len(default_storage.listdir(f'variants/{Path(item.image.name).parent}')[1]), 6)
+
+    def test_picture_lists_sources_by_format(self):
+        item = self.upload()
+        tasks.image_variants(item.image.name)
+        html = picture(item.image, sizes='50vw', alt='Wide')
+        self.assertIn('<source type="image/webp" srcset="', html)
+        self.assertIn('_320w.webp 320w', html)
+        self.assertRegex(html, r'<img src="[^"]+" srcset="[^"]+_320w\.jpg 320w[^"]*" sizes="50vw"')
+        self.assertIn('_1000w.webp 1000w', srcset(item.image))
+
+
+class ImagePipelineTests(TestCase):
+    """Large uploads are decoded near the output size, or refused"""
+
+    def make_jpeg(self, size):
+        output = BytesIO()
+        Image.new('RGB', size, (200, 60, 20)).save(output, format='JPEG')
+        output.seek(0)
+        return output
+
+    def test_thumbnail_fits_box(self):
+        with Image.open(BytesIO(images.make_thumbnail(self.make_jpeg((4000, 3000))))) as thumb:
+            self.assertEqual(thumb.size, (400, 300))
+
+    def test_jpeg_is_decoded_with_draft(self):
+        with images.open_checked(self.make_jpeg((4000, 3000))) as img:
+            decoded = images.decode_at(img, (400, 300))
+            self.assertLess(decoded.width, 4000)
+            self.assertGreaterEqual(decoded.width, 800)
+
+    def test_describe_applies_exif_orientation(self):
+        img = Image.new('RGB', (1200, 800), (200, 30, 30))
+        exif = img.getexif()
+        exif[0x0112] = 6  # Rotated 90° clockwise, as phones store portraits
+        output = BytesIO()
+        img.save(output, format='JPEG', exif=exif)
+        output.seek(0)
+
+        metadata = images.describe(output)
+        self.assertEqual((metadata['width'], metadata['height']), (800, 1200))
+        self.assertEqual(metadata['orientation'], 'portrait')
+        self.assertRegex(metadata['color'], r'^#[0-9a-f]{6}$')
+        self.assertTrue(metadata['lqip'].startswith('data:image/jpeg;base64,'))
+
+    @override_settings(IMAGE_MAX_PIXELS=1000 * 1000)
+    def test_pixel_ceiling(self):
+        with self.assertRaises(images.ImageTooLarge):
+            images.make_thumbnail(self.make_jpeg((2000, 1000)))
+
+    def make_png_header(self, size):
+        """A huge PNG's header and an empty IDAT: enough for Image.open, nothing to decode"""
+        def chunk(kind, data):
+            return len(data).to_bytes(4, 'big') + kind + data + zlib.crc32(kind + data).to_bytes(4, 'big')
+        ihdr = size[0].to_bytes(4, 'big') + size[1].to_bytes(4, 'big') + bytes([8, 2, 0, 0, 0])
+        return BytesIO(b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr) + chunk(b'IDAT', b'') + chunk(b'IEND', b''))
+
+    def test_pillow_bomb_check_is_too_large(self):
+        self.assertEqual(Image.MAX_IMAGE_PIXELS, settings.IMAGE_MAX_PIXELS)
+        with self.assertRaises(images.ImageTooLarge):
+            images.open_checked(self.make_png_header((15000, 15000)))
+
+    def test_bomb_is_refused_everywhere(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        with override_settings(MEDIA_ROOT=tmp.name, IMAGE_RESIZE_CACHE_DIR=Path(tmp.name) / 'resized'):
+            name = default_storage.save('gallery/bomb.png', ContentFile(self.make_png_header((15000, 15000)).read()))
+            self.assertEqual(self.client.get(f'/media/r/400x400/{name}').status_code, 404)
+            with self.assertRaises(jobs.PermanentJobError):
+                tasks.image_variants(name)
+
+
+@override_settings(IMAGE_VARIANT_WIDTHS=(320,), IMAGE_VARIANT_FORMATS=('jpeg',))
+class RegenerateImagesTests(TransactionTestCase):
+    """regenerate_images renders each stored image once, however many rows show it"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        overrides = override_settings(MEDIA_ROOT=self.tmp.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        checkpoint = mock.patch(
+            'core.management.commands.regenerate_images.CHECKPOINT', Path(self.tmp.name) / 'checkpoint.json',
+        )
+        checkpoint.start()
+        self.addCleanup(checkpoint.stop)
+
+        output = BytesIO()
+        Image.new('RGB', (800, 600), (30, 120, 60)).save(output, format='JPEG')
+        self.items = [
+            GalleryItem.objects.create(title=title, image=ContentFile(output.getvalue(), name=f'{title}.jpg'))
+            for title in ('first', 'second', 'third')
+        ]
+
+    def regenerate(self, *args):
+        output = StringIO()
+        call_command('regenerate_images', '--workers', '2', '--restart', *args, stdout=output)
+        return output.getvalue()
+
+    def test_shared_upload_is_one_task(self):
+        self.assertEqual(len({item.image.name for item in self.items}), 1)
+        self.assertIn('1 image(s) to process: 1 thumbnail(s), 1 variant set(s)', self.regenerate('--dry-run'))
+
+    def test_rows_sharing_an_upload_get_one_thumbnail(self):
+        source = self.items[0].image.name
+        # A clash-suffixed name, as left by two workers racing for the same file
+        GalleryItem.objects.filter(pk=self.items[1].pk).update(
+            thumbnail=tasks.generated_thumbnail_name(source).replace('_thumb.jpg', '_thumb_AbC123x.jpg'),
+        )
+        self.regenerate()
+
+        self.assertEqual(
+            set(GalleryItem.objects.values_list('thumbnail', flat=True)), {tasks.generated_thumbnail_name(source)},
+        )
+        self.assertEqual(default_storage.listdir(tasks.THUMBNAIL_DIR)[1], [Path(tasks.generated_thumbnail_name(source)).name])
+        self.assertEqual(ImageVariant.objects.filter(source=source).count(), 1)
+        self.assertEqual(len(default_storage.listdir(f'variants/{Path(source).parent}')[1]), 1)
+
+    def test_a_failing_image_does_not_stop_the_run(self):
+        broken = GalleryItem.objects.create(title='broken', image=ContentFile(b'not a photo', name='broken.jpg'))
+        render_thumbnail = tasks.render_thumbnail
+
+        def render(image_name):
+            if image_name == broken.image.name:
+                raise RuntimeError('unexpected')
+            return render_thumbnail(image_name)
+        with mock.patch('core.management.commands.regenerate_images.render_thumbnail', render):
+            output = self.regenerate()
+        self.assertIn('RuntimeError: unexpected', output)
+        self.assertIn('Regenerated 1 image(s), 1 failed', output)
+        self.assertTrue(GalleryItem.objects.get(pk=self.items[0].pk).thumbnail)
+
+    def test_hand_uploaded_thumbnail_is_kept(self):
+        GalleryItem.objects.filter(pk=self.items[2].pk).update(thumbnail='gallery/thumbnails/custom.jpg')
+        self.regenerate()
+        self.assertEqual(GalleryItem.objects.get(pk=self.items[2].pk).thumbnail.name, 'gallery/thumbnails/custom.jpg')
+
+
+class ResizedImageTests(TestCase):
+    """/media/r/ serves allowlisted sizes of uploaded images from a disk cache"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        root = Path(self.tmp.name)
+        overrides = override_settings(
+            MEDIA_ROOT=root / 'media',
+            IMAGE_RESIZE_CACHE_DIR=root / 'resized',
+            IMAGE_RESIZE_SIZES=('400x400',),
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        output = BytesIO()
+        Image.new('RGB', (1600, 1200), (20, 60, 200)).save(output, format='JPEG')
+        default_storage.save('gallery/photo.jpg', ContentFile(output.getvalue()))
+
+    def test_resizes_and_caches(self):
+        url = '/media/r/400x400/gallery/photo.jpg'
+        response = self.client.get(url, HTTP_ACCEPT='image/webp,*/*')
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as img:
+            self.assertEqual(img.size, (400, 300))
+
+        with mock.patch.object(resized, 'make_resized') as make_resized:
+            self.client.get(url, HTTP_ACCEPT='image/webp').close()
+        make_resized.assert_not_called()
+
+    def test_rejects_unlisted_sizes_and_paths(self):
+        self.assertEqual(self.client.get('/media/r/401x400/gallery/photo.jpg').status_code, 404)
+        self.assertEqual(self.client.get('/media/r/400x400/gallery/../settings.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/r/400x400/gallery/missing.jpg').status_code, 404)
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Identical uploads share one blob; gc_media removes unreferenced ones"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        overrides = override_settings(MEDIA_ROOT=self.tmp.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def upload(self, title, name):
+        output = BytesIO()
+        Image.new('RGB', (64, 48), (20, 160, 90)).save(output, format='JPEG')
+        return GalleryItem.objects.create(title=title, image=ContentFile(output.getvalue(), name=name))
+
+    def test_duplicate_upload_reuses_blob(self):
+        first = self.upload('First', 'first.jpg')
+        second = self.upload('Second', 'copy of first.JPG')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r'^gallery/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+
+        first.delete()
+        call_command('gc_media', min_age=0, stdout=StringIO())
+        self.assertTrue(default_storage.exists(second.image.name))
+
+        second.delete()
+        call_command('gc_media', min_age=0, stdout=StringIO())
+        self.assertFalse(default_storage.exists(second.image.name))
+
+
+class GalleryApiTests(TestCase):
+    """The lightbox pages through /gallery/api/ by cursor, revalidating by ETag"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(5):
+            GalleryItem.objects.create(title=f'Photo {i}', image=f'gallery/photo-{i}.jpg', order=i)
+        GalleryItem.objects.create(title='Hidden', image='gallery/hidden.jpg', is_visible=False)
+        GalleryItem.objects.create(title='Art', image='gallery/art.jpg', gallery_type='art')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_pages_cover_every_item_once(self):
+        titles = []
+        cursor = None
+        while True:
+            params = {'limit': 2, 'type': 'photo'}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.client.get(reverse('gallery_api'), params).json()
+            titles += [item['title'] for item in data['items']]
+            cursor = data['next']
+            if cursor is None:
+                break
+        self.assertEqual(titles, [f'Photo {i}' for i in range(5)])
+
+    def test_etag_revalidation(self):
+        response = self.client.get(reverse('gallery_api'))
+        self.assertEqual(len(response.json()['items']), 6)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(reverse('gallery_api'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        GalleryItem.objects.filter(title='Art').first().save()
+        self.assertEqual(self.client.get(reverse('gallery_api'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ArticleViewCounterTests(TestCase):
+    """Views are buffered per process and written in one batch"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.article = Article.objects.create(title='Counted', slug='counted', content='Body', status='published')
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(view_counter.discard)
+
+    def test_page_views_are_buffered_then_flushed(self):
+        for _ in range(3):
+            self.client.get(reverse('article_detail', args=['counted']))
+        self.client.get(reverse('article_detail', args=['missing']))
+        self.assertEqual(view_counter.pending(), {('counted', timezone.localdate()): 3})
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.views, 0)
+
+        self.assertEqual(view_counter.flush(), 3)
+        view_counter.hit('counted')
+        view_counter.flush()
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.views, 4)
+        self.assertEqual(ArticleViewDay.objects.get(article=self.article).views, 4)
+
+    def test_full_save_keeps_flushed_counters(self):
+        stale = Article.objects.get(pk=self.article.pk)
+        for _ in range(5):
+            view_counter.hit('counted')
+        view_counter.flush()
+        Article.objects.filter(pk=self.article.pk).update(popularity=2.5)
+
+        stale.title = 'Recounted'
+        stale.save()
+        self.article.refresh_from_db()
+        self.assertEqual((self.article.title, self.article.views, self.article.popularity), ('Recounted', 5, 2.5))
+
+        stale.views = 0
+        stale.save(update_fields=['views'])
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.views, 0)
+
+
+class PopularityTests(TestCase):
+    """Recent views outrank older ones, and new views are folded in incrementally"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.old = Article.objects.create(title='Old hit', slug='old-hit', content='Body', status='published')
+        cls.new = Article.objects.create(title='New hit', slug='new-hit', content='Body', status='published')
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        ArticleViewDay.objects.create(article=self.old, date=self.today - datetime.timedelta(days=21), views=10)
+        ArticleViewDay.objects.create(article=self.new, date=self.today, views=3)
+
+    def update(self, *args):
+        call_command('update_popularity', *args, stdout=StringIO())
+        return list(Article.objects.popular().values_list('slug', flat=True))
+
+    def test_decay_then_incremental_fold(self):
+        self.assertEqual(self.update(), ['new-hit', 'old-hit'])
+        ArticleViewDay.objects.create(article=self.old, date=self.today, views=4)
+        self.assertEqual(self.update(), ['old-hit', 'new-hit'])
+
+        scores = dict(Article.objects.values_list('slug', 'popularity'))
+        self.update('--full')
+        for slug, score in Article.objects.values_list('slug', 'popularity'):
+            self.assertAlmostEqual(score, scores[slug])
+
+
+class SendCampaignTests(TransactionTestCase):
+    """Campaigns reach each active subscriber once, even across restarts"""
+
+    def setUp(self):
+        self.subscribers = [
+            NewsletterSubscriber.objects.create(email=f'reader{i}@example.com') for i in range(3)
+        ]
+        NewsletterSubscriber.objects.create(email='gone@example.com', is_active=False)
+        self.campaign = Campaign.objects.create(subject='Issue 1', body_text='Hello', body_html='<p>Hello</p>')
+
+    def send(self, *args):
+        output = StringIO()
+        call_command('send_campaign', self.campaign.pk, '--rate', '0', '--batch-size', '2', *args, stdout=output)
+        return output.getvalue()
+
+    def test_sends_to_active_subscribers(self):
+        self.send()
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [
+            'reader0@example.com', 'reader1@example.com', 'reader2@example.com',
+        ])
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, Campaign.SENT)
+
+    def test_resume_after_crash_sends_no_duplicates(self):
+        # An earlier run delivered one message and died while sending another
+        Delivery.objects.create(campaign=self.campaign, subscriber=self.subscribers[0],
+                                email=self.subscribers[0].email, status=Delivery.SENT)
+        Delivery.objects.create(campaign=self.campaign, subscriber=self.subscribers[1],
+                                email=self.subscribers[1].email, status=Delivery.SENDING)
+
+        output = self.send()
+        self.assertEqual([message.to for message in mail.outbox], [['reader2@example.com']])
+        self.assertIn('1 delivery(ies) were interrupted', output)
+        with self.assertRaises(CommandError):
+            self.send()
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class SubscriberCsvTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        overrides = override_settings(SUBSCRIBER_IMPORT_DIR=self.tmp.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_import_skips_duplicates_and_invalid_rows(self):
+        NewsletterSubscriber.objects.create(email='old@example.com')
+        upload = BytesIO(
+            b'Name,Email\r\nAda,ada@example.com\r\nAda again,ADA@example.com\r\n'
+            b'Bad,not-an-address\r\nOld,old@example.com\r\n,\r\nGrace,grace@example.com\r\n'
+        )
+        result = import_subscribers(upload, batch_size=1)
+        self.assertEqual(result, {'added': 2, 'duplicates': 2, 'invalid': 1, 'invalid_lines': [4]})
+        self.assertEqual(NewsletterSubscriber.objects.count(), 3)
+
+    def test_addresses_are_unique_whatever_their_case(self):
+        NewsletterSubscriber.objects.create(email='Old@Example.com')
+        self.assertEqual(NewsletterSubscriber.objects.get().email, 'old@example.com')
+        result = import_subscribers(BytesIO(b'email\r\nOLD@example.com\r\nNew@Example.com\r\n'))
+        self.assertEqual((result['added'], result['duplicates']), (1, 1))
+        self.assertEqual(
+            sorted(NewsletterSubscriber.objects.values_list('email', flat=True)), ['new@example.com', 'old@example.com'],
+        )
+        response = self.client.post(reverse('newsletter_subscribe'), {'email': 'NEW@example.com'}, follow=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(NewsletterSubscriber.objects.count(), 2)
+
+    def test_migration_merges_addresses_differing_in_case(self):
+        campaign = Campaign.objects.create(subject='Issue 1', body_text='Hello')
+        # As stored before addresses were normalized
+        NewsletterSubscriber.objects.bulk_create([
+            NewsletterSubscriber(email='ada@example.com', is_active=False),
+            NewsletterSubscriber(email='Ada@example.com'),
+            NewsletterSubscriber(email='Grace@Example.com'),
+        ])
+        mixed = NewsletterSubscriber.objects.get(email='Ada@example.com')
+        Delivery.objects.create(campaign=campaign, subscriber=mixed, email=mixed.email, status=Delivery.SENT)
+
+        migration = import_module('core.migrations.0019_lowercase_subscriber_emails')
+        migration.lowercase_emails(django_apps, None)
+        self.assertEqual(
+            sorted(NewsletterSubscriber.objects.values_list('email', 'is_active')),
+            [('ada@example.com', True), ('grace@example.com', True)],
+        )
+        self.assertEqual(Delivery.objects.get().subscriber.email, 'ada@example.com')
+
+    def test_export_and_admin_views(self):
+        NewsletterSubscriber.objects.create(email='ada@example.com')
+        lines = list(export_rows(NewsletterSubscriber.objects.all()))
+        self.assertEqual(lines[0], 'email,subscribed_at,is_active\r\n')
+        self.assertTrue(lines[1].startswith('ada@example.com,'))
+
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+        response = self.client.post(
+            reverse('admin:core_newslettersubscriber_changelist'),
+            {'action': 'export_csv', '_selected_action': [NewsletterSubscriber.objects.get().pk]},
+        )
+        self.assertEqual(b''.join(response.streaming_content).count(b'\r\n'), 2)
+        response = self.client.post(
+            reverse('admin:core_newslettersubscriber_import'),
+            {'csv_file': ContentFile(b'email\nGrace@example.com\n', name='list.csv')},
+        )
+        self.assertRedirects(response, reverse('admin:core_newslettersubscriber_changelist'))
+        # The request only queues the import
+        self.assertFalse(NewsletterSubscriber.objects.filter(email='grace@example.com').exists())
+        job = Job.objects.get(kind='newsletter.import')
+        self.assertEqual(len(os.listdir(self.tmp.name)), 1)
+
+        jobs.run(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertTrue(NewsletterSubscriber.objects.filter(email='grace@example.com').exists())
+        self.assertEqual(os.listdir(self.tmp.name), [])
@@ -15,6 +15,8 @@ urlpatterns = [
     path('projects/', views.small_bets, name='small_bets'),
     path('projects/<int:pk>/', views.project_detail, name='project_detail'),
     path('gallery/', views.gallery, name='gallery'),
+    path('gallery/api/', views.gallery_api, name='gallery_api'),
+    path('media/r/<int:width>x<int:height>/<path:path>', views.resized_image, name='resized_image'),
     
     # Optional/Other pages
     path('tlw/', views.tlw_studio, name='tlw'),
@@ -1,9 +1,13 @@
 # core/views.py
 
+from django.conf import settings
+from django.http import FileResponse, Http404, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.utils.cache import patch_vary_headers
 from django.contrib import messages
-from django.views.decorators.http import require_http_methods
-from django.db.models import Q
+from django.urls import reverse
+from django.views.decorators.http import condition, require_http_methods
+from PIL import UnidentifiedImageError
 from .models import (
     NewsletterSubscriber,
     Experience,
@@ -11,13 +15,44 @@ from .models import (
     Skill,
     Article,
     GalleryItem,
+    ImageVariant,
     RecentActivity,
     Resume,
-    ContactMessage
+    ContactMessage,
+    normalize_tag,
 )
+from .counters import count_article_view
+from .cache import cache_public_page, conditional_page, content_etag, stale_while_revalidate
 from .forms import NewsletterForm, ContactForm
+from .pagination import keyset_paginate
+from .images import ImageTooLarge
+from .resized import allowed_size, clean_path, get_resized
+from .search import search_articles, is_ranked
+from .templatetags.image_extras import srcset
 
 
+# Conditional GET lookups: one indexed query for the row's updated_at
+def article_timestamp(request, slug):
+    return Article.objects.published().filter(slug=slug).values_list('updated_at', flat=True).first()
+
+
+def project_timestamp(request, pk):
+    return Experience.objects.filter(pk=pk, type='project').values_list('updated_at', flat=True).first()
+
+
+def resume_timestamp(request):
+    return Resume.objects.filter(is_active=True).values_list('updated_at', flat=True).first()
+
+
+# Keyset pagination orderings; each must end in a unique column
+ESSAY_ORDERING = ('-published_date', '-id')
+POPULAR_ORDERING = ('-popularity', '-id')
+SEARCH_ORDERING = ('search_rank', 'id')
+GALLERY_ORDERING = ('order', '-created_at', '-id')
+
+
+# Homepage changes on every edit anywhere; keep it warm and re-render behind
+@stale_while_revalidate(soft_ttl=60, hard_ttl=60 * 60)
 def home(request):
     """
     Enhanced homepage with:
@@ -31,19 +66,21 @@ def home(request):
         'now_items': NowItem.objects.filter(is_active=True)[:3],
 
         # Recent projects
-        'recent_projects': Experience.objects.filter(type='project').order_by('-start_date')[:3],
+        'recent_projects': Experience.objects.listing().filter(type='project').order_by('-start_date')[:3],
 
         # Recent articles
-        'recent_articles': Article.objects.filter(
-            status='published'
-        ).order_by('-published_date')[:4],
+        'recent_articles': Article.objects.published().listing().order_by('-published_date')[:4],
+
+        # Most read lately (update_popularity); HOME_POPULAR_ARTICLES = 0 hides the section
+        'popular_articles': Article.objects.published().listing().popular()[:settings.HOME_POPULAR_ARTICLES],
 
         # Work experience
-        'recent_experiences': Experience.objects.filter(type='work').order_by('-start_date')[:3],
+        'recent_experiences': Experience.objects.listing().filter(type='work').order_by('-start_date')[:3],
     }
     return render(request, 'home.html', context)
 
 
+@cache_public_page
 def about(request):
     """About page with full professional bio"""
     context = {
@@ -56,49 +93,82 @@ def about(request):
     return render(request, 'about.html', context)
 
 
+@cache_public_page
 def kiota(request):
-    """Essays listing page - all published articles"""
-    articles = Article.objects.filter(status='published').order_by('-published_date')
+    """
+    Essays listing page - all published articles
+
+    Paginated by cursor; `?fragment=1` returns just the next batch of
+    entries for the "Load more" button. `?sort=popular` orders by the
+    decayed popularity score instead of date (or search rank).
+    """
+    articles = Article.objects.published().listing()
     
     # Optional: Filter by type
     article_type = request.GET.get('type')
     if article_type:
         articles = articles.filter(article_type=article_type)
     
+    # Optional: Filter by tag
+    tag = request.GET.get('tag')
+    if tag:
+        articles = articles.filter(normalized_tags__key=normalize_tag(tag))
+    
     # Optional: Search
+    # Ranked by relevance when a full-text index is available
     query = request.GET.get('q')
     if query:
-        articles = articles.filter(
-            Q(title__icontains=query) | 
-            Q(excerpt__icontains=query) |
-            Q(content__icontains=query)
-        )
+        articles = search_articles(articles, query)
+    
+    sort = 'popular' if request.GET.get('sort') == 'popular' else ''
+    if sort:
+        ordering = POPULAR_ORDERING
+    elif query and is_ranked(articles):
+        ordering = SEARCH_ORDERING
+    else:
+        ordering = ESSAY_ORDERING
+    page = keyset_paginate(
+        articles, ordering, request.GET.get('cursor'), settings.ESSAYS_PER_PAGE
+    )
+    
+    # Sort links keep the filters; a cursor only makes sense in its own order
+    sort_params = request.GET.copy()
+    for key in ('cursor', 'fragment', 'sort'):
+        sort_params.pop(key, None)
+    latest_query = sort_params.urlencode()
+    sort_params['sort'] = 'popular'
     
     context = {
-        'articles': articles,
+        'sort': sort,
+        'latest_query': latest_query,
+        'popular_query': sort_params.urlencode(),
+        'articles': page,
+        'page': page,
+        'next_page_query': page.next_query(request) if page.has_next else '',
         'article_types': Article.ARTICLE_TYPES,
         'selected_type': article_type,
         'search_query': query,
+        'selected_tag': tag,
     }
+    if request.GET.get('fragment'):
+        return render(request, 'components/essay_list_items.html', context)
     return render(request, 'kiota.html', context)
 
 
+@count_article_view
+@conditional_page(article_timestamp)
+@stale_while_revalidate(soft_ttl=5 * 60, hard_ttl=24 * 60 * 60)
 def article_detail(request, slug):
     """Individual article/essay page"""
     article = get_object_or_404(Article, slug=slug, status='published')
     
-    # Get related articles (same type or similar tags)
-    related_articles = Article.objects.filter(
-        status='published'
-    ).exclude(id=article.id)
-    
-    # Prioritize same type
-    if article.article_type:
-        related_articles = related_articles.filter(
-            article_type=article.article_type
-        )
-    
-    related_articles = related_articles[:3]
+    # Precomputed TF-IDF neighbours (compute_related_articles); until the
+    # job has run for this article, fall back to the latest of the same type
+    related_articles = article.related_articles(limit=3)
+    if not related_articles:
+        related_articles = Article.objects.published().listing().filter(
+            article_type=article.article_type,
+        ).exclude(id=article.id)[:3]
     
     context = {
         'article': article,
@@ -107,6 +177,7 @@ def article_detail(request, slug):
     return render(request, 'article_detail.html', context)
 
 
+@cache_public_page
 def small_bets(request):
     """
     Projects/Small Bets page
@@ -115,15 +186,15 @@ def small_bets(request):
     Supports filtering by category via tech_stack
     """
     # Get all projects
-    projects = Experience.objects.filter(
+    projects = Experience.objects.listing().filter(
         type='project'
     ).order_by('-start_date')
 
     # Optional: Filter by category (based on tech_stack)
     category = request.GET.get('category')
     if category and category != 'all':
-        # Filter projects that have the category in their tech_stack
-        projects = [p for p in projects if category.lower() in [tech.lower() for tech in p.tech_stack]]
+        # Indexed join through the normalized Tag tables
+        projects = projects.filter(normalized_tags__key=normalize_tag(category))
 
     # Calculate stats
     total_projects = Experience.objects.filter(type='project').count()
@@ -141,6 +212,7 @@ def small_bets(request):
     return render(request, 'small_bets.html', context)
 
 
+@conditional_page(project_timestamp)
 def project_detail(request, pk):
     """
     Project detail page
@@ -149,26 +221,13 @@ def project_detail(request, pk):
     """
     project = get_object_or_404(Experience, pk=pk, type='project')
 
-    # Get related projects (same tech stack or similar)
-    related_projects = Experience.objects.filter(
-        type='project'
-    ).exclude(pk=pk)
-
-    # Try to find projects with overlapping tech stack
+    # Related projects come precomputed from the RelatedProject table
     if project.tech_stack:
-        related_by_tech = []
-        for proj in related_projects:
-            if proj.tech_stack:
-                # Count how many technologies overlap
-                overlap = len(set(project.tech_stack) & set(proj.tech_stack))
-                if overlap > 0:
-                    related_by_tech.append((proj, overlap))
-
-        # Sort by overlap count and take top 3
-        related_by_tech.sort(key=lambda x: x[1], reverse=True)
-        related_projects = [proj for proj, _ in related_by_tech[:3]]
+        related_projects = project.related_projects(limit=3)
     else:
-        related_projects = related_projects[:3]
+        related_projects = Experience.objects.listing().filter(
+            type='project'
+        ).exclude(pk=pk)[:3]
 
     context = {
         'project': project,
@@ -182,8 +241,8 @@ def tlw_studio(request):
     return render(request, 'tlw.html')
 
 
-def gallery(request):
-    """Gallery page with photos/artwork"""
+def visible_gallery_items(request):
+    """Visible gallery items, filtered by the ?type= and ?tag= of the request"""
     gallery_items = GalleryItem.objects.filter(is_visible=True)
     
     # Optional: Filter by type
@@ -191,14 +250,121 @@ def gallery(request):
     if gallery_type:
         gallery_items = gallery_items.filter(gallery_type=gallery_type)
     
+    # Optional: Filter by tag
+    tag = request.GET.get('tag')
+    if tag:
+        gallery_items = gallery_items.filter(normalized_tags__key=normalize_tag(tag))
+    return gallery_items
+
+
+@cache_public_page
+def gallery(request):
+    """
+    Gallery page with photos/artwork
+
+    Paginated by cursor; `?fragment=1` returns just the next batch of
+    grid items for the "Load more" button. The lightbox loads item details
+    from gallery_api as it needs them.
+    """
+    page = keyset_paginate(
+        visible_gallery_items(request), GALLERY_ORDERING, request.GET.get('cursor'), settings.GALLERY_PER_PAGE
+    )
+    ImageVariant.objects.attach(page.items, 'image')
+    
+    # Same filters, minus pagination; the lightbox adds its own cursor
+    api_params = request.GET.copy()
+    for key in ('cursor', 'fragment'):
+        api_params.pop(key, None)
+    
     context = {
-        'gallery_items': gallery_items,
+        'gallery_items': page,
+        'page': page,
+        'next_page_query': page.next_query(request) if page.has_next else '',
         'gallery_types': GalleryItem.GALLERY_TYPES,
-        'selected_type': gallery_type,
+        'selected_type': request.GET.get('type'),
+        'selected_tag': request.GET.get('tag'),
+        'gallery_api_url': f"{reverse('gallery_api')}?{api_params.urlencode()}",
+        'lightbox_cursor': request.GET.get('cursor', ''),
     }
+    if request.GET.get('fragment'):
+        return render(request, 'components/gallery_items.html', context)
     return render(request, 'gallery.html', context)
 
 
+def gallery_item_json(item):
+    """What the lightbox needs to show an item; expects item.image_variants"""
+    return {
+        'id': item.pk,
+        'title': item.title,
+        'description': item.description,
+        'type': item.gallery_type,
+        'external_link': item.external_link,
+        'url': item.image.url,
+        'thumbnail': item.thumbnail.url if item.thumbnail else None,
+        'width': item.image_width,
+        'height': item.image_height,
+        'orientation': item.image_orientation,
+        'color': item.image_color,
+        'srcset': srcset(item.image, item.image_variants),
+        'variants': [
+            {'url': variant.file.url, 'format': variant.format, 'width': variant.width, 'height': variant.height}
+            for variant in item.image_variants
+        ],
+    }
+
+
+@require_http_methods(["GET", "HEAD"])
+@condition(etag_func=content_etag)
+@cache_public_page
+def gallery_api(request):
+    """
+    JSON pages of visible gallery items for the lightbox
+
+    Accepts the gallery page's ?type= and ?tag= filters, ?limit= (at most
+    GALLERY_API_MAX_LIMIT) and ?cursor= taken from the previous page's
+    `next`, which is null on the last page.
+    """
+    try:
+        limit = int(request.GET.get('limit', settings.GALLERY_PER_PAGE))
+    except ValueError:
+        limit = settings.GALLERY_PER_PAGE
+    limit = max(1, min(limit, settings.GALLERY_API_MAX_LIMIT))
+
+    # The blur placeholder is only used by the grid
+    items = visible_gallery_items(request).defer('image_lqip')
+    page = keyset_paginate(items, GALLERY_ORDERING, request.GET.get('cursor'), limit)
+    ImageVariant.objects.attach(page.items, 'image')
+    return JsonResponse({
+        'items': [gallery_item_json(item) for item in page],
+        'next': page.next_cursor,
+    })
+
+
+@require_http_methods(["GET", "HEAD"])
+def resized_image(request, width, height, path):
+    """
+    A gallery/article image fitted inside an allowlisted box
+
+    Resized on first request and cached on disk (see core.resized). WebP
+    for browsers that accept it, JPEG otherwise.
+    """
+    name = clean_path(path)
+    if name is None or not allowed_size(width, height):
+        raise Http404("Unknown image size")
+    fmt = 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'jpeg'
+    try:
+        cached = get_resized(name, width, height, fmt)
+    except (FileNotFoundError, ImageTooLarge, UnidentifiedImageError):
+        raise Http404("Image not found")
+
+    response = FileResponse(open(cached, 'rb'), content_type=f'image/{fmt}')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+@conditional_page(resume_timestamp)
+@cache_public_page
 def resume(request):
     """Resume/CV page"""
     active_resume = Resume.objects.filter(is_active=True).first()
@@ -79,5 +79,68 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# File-based so every gunicorn worker sees the same page cache and content
+# version (core.cache); swap for Redis/Memcached when available
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+
+# Full-page cache for anonymous visitors (core.cache)
+PAGE_CACHE_ALIAS = 'default'
+PAGE_CACHE_TIMEOUT = 60 * 60  # Seconds; edits invalidate immediately via the content version
+
+# Markdown render cache (core.rendering.MarkdownRenderCache)
+MARKDOWN_CACHE_MAX_BYTES = 4 * 1024 * 1024  # Per-worker LRU budget
+MARKDOWN_CACHE_ALIAS = None  # Set to a CACHES alias to share renders across workers
+# MARKDOWN_CACHE_TIMEOUT = 24 * 60 * 60  # Shared cache timeout; unset = the cache's TIMEOUT, None = never expire
+
+# Essay search engine for the kiota page (core.search)
+# 'fts' = SQLite FTS5 with bm25 ranking, 'inverted' = in-process BM25 index
+# (any database), 'icontains' = plain LIKE scan
+ESSAY_SEARCH_ENGINE = 'fts'
+ESSAY_SEARCH_INDEX_MAX_AGE = 300  # Seconds before a worker rebuilds its 'inverted' index
+SEARCH_RESULT_LIMIT = 200  # Best matches kept by the ranked engines
+
+# Background job queue (core.jobs, manage.py runworker)
+JOB_WORKER_CONCURRENCY = 2  # Jobs a worker runs at once
+JOB_MAX_ATTEMPTS = 5  # Retries with exponential backoff before a job is marked failed
+JOB_LOCK_TIMEOUT = 10 * 60  # Seconds before a running job from a dead worker is re-queued
+
+# Image pipeline: responsive variants and decode limits (core.images, run by runworker)
+IMAGE_VARIANT_WIDTHS = (320, 640, 960, 1280, 1920)
+IMAGE_VARIANT_FORMATS = ('avif', 'webp', 'jpeg')  # Formats Pillow cannot encode are skipped
+IMAGE_MAX_PIXELS = 80_000_000  # Uploads above this are refused before decoding
+IMAGE_MAX_BYTES = 50 * 1024 * 1024
+
+# On-demand resizing at /media/r/<w>x<h>/<path> (core.resized)
+IMAGE_RESIZE_SIZES = ('200x200', '400x400', '800x800', '1200x1200', '1600x1600')  # Only these boxes are served
+IMAGE_RESIZE_CACHE_DIR = BASE_DIR / '.resized'
+IMAGE_RESIZE_CACHE_MAX_BYTES = 512 * 1024 * 1024  # Least recently used files are evicted past this
+
+# Article view counters (core.counters): each process buffers hits and
+# writes them in one transaction after this many hits or seconds
+ARTICLE_VIEWS_FLUSH_HITS = 100
+ARTICLE_VIEWS_FLUSH_INTERVAL = 30
+
+# Popular essays (core.popularity, refreshed by update_popularity)
+POPULARITY_HALF_LIFE_DAYS = 7  # A view's weight halves every this many days
+POPULARITY_WINDOW_DAYS = 30  # Essays scoring less than one view this old are not listed
+HOME_POPULAR_ARTICLES = 3  # 0 hides the home page's Popular section
+
+# Keyset pagination page sizes (core.pagination)
+ESSAYS_PER_PAGE = 20
+GALLERY_PER_PAGE = 24
+GALLERY_API_MAX_LIMIT = 60  # Largest ?limit= the lightbox's /gallery/api/ accepts
+
 # Email settings (for newsletter)
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # Change for production
\ No newline at end of file
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # Change for production
+
+# Newsletter delivery (send_campaign command)
+NEWSLETTER_SEND_RATE = 10  # Messages per second across all workers; 0 for no limit
+NEWSLETTER_SEND_WORKERS = 4  # Batches sent at once, each over its own connection
+NEWSLETTER_BATCH_SIZE = 50  # Messages per connection
+SUBSCRIBER_IMPORT_DIR = BASE_DIR / '.imports'  # Admin CSV uploads waiting for the worker; never served
@@ -14,3 +14,17 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portfolio.settings')
 
 application = get_wsgi_application()
+
+
+# Build the in-process search index as each worker starts, rather than on
+# the first search request
+from django.conf import settings  # noqa: E402
+
+if getattr(settings, 'ESSAY_SEARCH_ENGINE', None) == 'inverted':
+    from django.db import DatabaseError  # noqa: E402
+    from core.inverted_index import load_article_index  # noqa: E402
+
+    try:
+        load_article_index()
+    except DatabaseError:
+        pass  # e.g. before migrate; the index is then built on first search